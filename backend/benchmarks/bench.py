@@ -0,0 +1,147 @@
+"""
+Microbenchmarks for the pure-Python hot paths.
+
+Run from backend/:
+
+    python -m benchmarks.bench                          # print timings
+    python -m benchmarks.bench --save baseline.json     # record a baseline
+    python -m benchmarks.bench --compare baseline.json  # exit 1 on regressions
+
+Each case is timed with `timeit` (garbage collection off) in `--repeat`
+rounds of at least `--min-time` seconds; the median of the per-call times
+is reported and compared, which is much steadier across runs than a mean.
+A case regresses when its median exceeds the baseline by more than
+`--threshold` (default 15%). Compare only runs made on the same machine.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+import warnings
+from typing import Callable, Dict, List, Tuple
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+
+from benchmarks.fixtures import FORM_SIZES, load_history, load_html  # noqa: E402
+from models.chatbot import Chatbot, Customization  # noqa: E402
+from routes.chatbots import generate_embed_code  # noqa: E402
+from services.chat_engine import ChatEngine  # noqa: E402
+from services.form_parser import GoogleFormParser  # noqa: E402
+from services.json_bytes import dumps  # noqa: E402
+
+DEFAULT_THRESHOLD = 0.15
+
+
+def build_cases() -> Dict[str, Callable[[], object]]:
+    """Benchmark name -> zero-argument callable, over the committed fixtures"""
+    engine = ChatEngine()
+    parser = GoogleFormParser(client=object())
+    cases: Dict[str, Callable[[], object]] = {}
+
+    for size in FORM_SIZES:
+        html = load_html(size)
+        raw_data = parser.parse_public_data(html)
+        schema = {"title": f"Form {size}", "questions": parser._extract_questions(raw_data), "raw_data_version": "1.0"}
+        history = load_history(size)
+        half = history[:len(history) // 2]
+        choice = next(q for q in schema["questions"] if q["type"] == "multiple_choice")
+        checkboxes = next(q for q in schema["questions"] if q["type"] == "checkboxes")
+        chatbot_fields = dict(
+            chatbot_id="bot_benchmark",
+            google_form_url="https://docs.google.com/forms/d/e/benchmark/viewform",
+            name="Benchmark bot",
+            form_schema=schema
+        )
+
+        cases[f"parse_public_data[{size}]"] = lambda html=html: parser.parse_public_data(html)
+        cases[f"extract_questions[{size}]"] = lambda raw=raw_data: parser._extract_questions(raw)
+        cases[f"get_next_question[{size}]"] = lambda s=schema, h=half: engine.get_next_question(s, h)
+        cases[f"validate_answers[{size}]"] = lambda s=schema, h=history: engine.validate_answers(s, h, require_all=True)
+        cases[f"merge_responses[{size}]"] = lambda h=half, r=history[-1:]: engine.merge_responses(h, r)
+        cases[f"chatbot_dict[{size}]"] = lambda f=chatbot_fields: Chatbot(**f).dict()
+        document = Chatbot(**chatbot_fields).dict()
+        cases[f"chatbot_json[{size}]"] = lambda d=document: dumps(d)
+
+    cases["validate_answer[multiple_choice]"] = lambda: engine.validate_answer(choice, choice["options"][-1])
+    cases["validate_answer[checkboxes]"] = lambda: engine.validate_answer(checkboxes, checkboxes["options"][:2])
+    customization = Customization().dict()
+    cases["generate_embed_code"] = lambda: generate_embed_code("bot_benchmark", "popup", customization)
+    return cases
+
+
+def measure(func: Callable[[], object], repeat: int, min_time: float) -> Dict[str, float]:
+    """Median and min seconds per call over `repeat` rounds of at least `min_time` seconds"""
+    timer = timeit.Timer(func)
+    func()  # warm up caches and lazy imports
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    per_call = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {"median": statistics.median(per_call), "min": min(per_call), "loops": number}
+
+
+def run(selected: List[str], repeat: int, min_time: float) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, func in build_cases().items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        results[name] = measure(func, repeat, min_time)
+        print(f"{name:<40} {results[name]['median'] * 1e6:>12.2f} us  (min {results[name]['min'] * 1e6:.2f})")
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float
+) -> List[Tuple[str, float]]:
+    """(name, ratio) for every case slower than its baseline by more than `threshold`"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["median"] / baseline[name]["median"]
+        if ratio > 1 + threshold:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the backend hot paths")
+    parser.add_argument("cases", nargs="*", help="only run cases whose name contains one of these")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per round")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, 0.15 = 15%%")
+    args = parser.parse_args(argv)
+    # `.dict()` is what the app calls; keep the deprecation notices out of the table
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    results = run(args.cases, args.repeat, args.min_time)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "results": results}, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        for name in results:
+            if name in baseline:
+                ratio = results[name]["median"] / baseline[name]["median"]
+                print(f"{name:<40} {ratio:>6.2f}x baseline")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}:")
+            for name, ratio in regressions:
+                print(f"  {name}: {ratio:.2f}x")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Benchmark fixtures: Google Form pages and conversation histories.
+
+The files in `fixtures/` are committed so every run measures the same
+payloads. They are generated deterministically; regenerate with
+
+    python -m benchmarks.fixtures
+"""
+import json
+import random
+from pathlib import Path
+from typing import Dict, List
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+FORM_SIZES = (10, 500)
+SEED = 20240601
+
+WORDS = (
+    "how would you rate our service delivery team product experience support "
+    "quality price value recommend friend colleague company website checkout "
+    "shipping return policy feedback overall satisfaction likely again improve"
+).split()
+
+
+def _sentence(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize()
+
+
+def build_public_data(size: int, rng: random.Random) -> List:
+    """A FB_PUBLIC_LOAD_DATA_ structure with `size` questions of every type"""
+    items = []
+    for index in range(size):
+        type_id = index % 5
+        options = None
+        if type_id >= 2:
+            options = [[_sentence(rng, 1, 3), None, None, None, 0] for _ in range(rng.randint(3, 12))]
+        entry = [1_000_000 + index, options, rng.randint(0, 1), None, None, None, None, None, None, 0]
+        items.append([
+            900_000 + index,
+            _sentence(rng, 4, 12) + "?",
+            _sentence(rng, 0, 20) or None,
+            type_id,
+            [entry],
+            None, None, None, None, None, None, None, [_sentence(rng, 1, 4)]
+        ])
+    form = [_sentence(rng, 5, 30), items, None, None, None, None, None, None, f"Benchmark form ({size} questions)"]
+    return [None, form, "/forms", f"Benchmark form ({size} questions)", None, None, None, "", None, 0, 0]
+
+
+def build_html(public_data: List, rng: random.Random) -> str:
+    """A form page of realistic size around the embedded form data"""
+    filler = "\n".join(
+        f'<div class="freebirdFormviewerViewItemsItemItem" data-item-id="{i}">{_sentence(rng, 5, 15)}</div>'
+        for i in range(200)
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>Benchmark form</title>"
+        '<script nonce="abc">var _docs_flag_initialData = {"docs-ails":"docs_cold"};</script>'
+        "</head><body>" + filler +
+        f'<script type="text/javascript" nonce="abc">var FB_PUBLIC_LOAD_DATA_ = {json.dumps(public_data)};</script>'
+        "</body></html>"
+    )
+
+
+def build_history(schema: Dict, rng: random.Random) -> List[Dict]:
+    """Answers to every question of `schema`, as the embed sends them"""
+    history = []
+    for question in schema["questions"]:
+        if question["type"] == "checkboxes":
+            answer = rng.sample(question["options"], k=min(2, len(question["options"])))
+        elif question["options"]:
+            answer = rng.choice(question["options"])
+        else:
+            answer = _sentence(rng, 3, 40)
+        history.append({"question_id": question["id"], "question": question["title"], "answer": answer})
+    return history
+
+
+def generate():
+    from services.form_parser import GoogleFormParser
+
+    parser = GoogleFormParser(client=object())
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    for size in FORM_SIZES:
+        rng = random.Random(SEED + size)
+        public_data = build_public_data(size, rng)
+        (FIXTURES_DIR / f"form_{size}.html").write_text(build_html(public_data, rng), encoding="utf-8")
+
+        schema = {
+            "title": public_data[1][8],
+            "questions": parser._extract_questions(public_data),
+            "raw_data_version": "1.0"
+        }
+        (FIXTURES_DIR / f"history_{size}.json").write_text(
+            json.dumps(build_history(schema, rng), indent=1), encoding="utf-8"
+        )
+
+
+def load_html(size: int) -> str:
+    return (FIXTURES_DIR / f"form_{size}.html").read_text(encoding="utf-8")
+
+
+def load_history(size: int) -> List[Dict]:
+    return json.loads((FIXTURES_DIR / f"history_{size}.json").read_text(encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    generate()
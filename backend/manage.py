@@ -0,0 +1,109 @@
+import asyncio
+import os
+from pathlib import Path
+
+import typer
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from services.chatbot_search import chatbot_search
+from services.conversation_responses import conversation_responses
+from services.http_client import http_client
+from services.indexes import collscans, ensure_indexes, index_plan
+from services.schema_store import schema_store
+from services.stats_reconcile import stats_reconciler
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+app = typer.Typer(help="Maintenance commands for the Fobi.io Clone backend")
+
+
+@app.callback()
+def main():
+    """Maintenance commands for the Fobi.io Clone backend"""
+
+
+def run_with_db(task):
+    """Run `task(db)` against the configured database and close the client afterwards"""
+    async def runner():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            return await task(client[os.environ.get('DB_NAME', 'fobi_clone')])
+        finally:
+            await http_client.close()
+            client.close()
+    return asyncio.run(runner())
+
+
+@app.command("migrate-form-schemas")
+def migrate_form_schemas(batch_size: int = typer.Option(500, min=1)):
+    """Move embedded form_schema copies into the shared schema store"""
+    migrated = run_with_db(lambda db: schema_store.migrate_embedded(db, batch_size))
+    typer.echo(f"Migrated {migrated} chatbots")
+
+
+@app.command("reindex-search")
+def reindex_search(batch_size: int = typer.Option(500, min=1)):
+    """Backfill search fields for chatbots created before name search"""
+    indexed = run_with_db(lambda db: chatbot_search.reindex(db, batch_size))
+    typer.echo(f"Indexed {indexed} chatbots")
+
+
+@app.command("compact-conversations")
+def compact_conversations(batch_size: int = typer.Option(500, min=1)):
+    """Rewrite legacy conversation responses into the compact answer format"""
+    migrated = run_with_db(lambda db: conversation_responses.migrate_legacy(db, batch_size))
+    typer.echo(f"Compacted {migrated} conversations")
+
+
+@app.command("index-answers")
+def index_answers(batch_size: int = typer.Option(500, min=1)):
+    """Add answer query tokens to conversations stored before the inbox API"""
+    indexed = run_with_db(lambda db: conversation_responses.backfill_answer_keys(db, batch_size))
+    typer.echo(f"Indexed {indexed} conversations")
+
+
+@app.command("reconcile-stats")
+def reconcile_stats(
+    batch_size: int = typer.Option(500, min=1),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Report drift without writing corrections")
+):
+    """Recompute every chatbot's views, completions and completion rate"""
+    report = run_with_db(lambda db: stats_reconciler.reconcile(db, batch_size, dry_run))
+    action = "Would correct" if dry_run else "Corrected"
+    typer.echo(f"{action} {report['corrected']} of {report['chatbots']} chatbots in {report['seconds']}s")
+    for name, counter in report["drift"].items():
+        typer.echo(f"  {name}: {counter['chatbots']} chatbots off, total {counter['total']}, max {counter['max']}")
+    if report["skipped"]:
+        typer.echo(f"Skipped {report['skipped']} chatbots whose counters changed meanwhile; run again")
+
+
+@app.command("ensure-indexes")
+def ensure_indexes_command(
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only show what differs from the declarations"),
+    rebuild: bool = typer.Option(False, "--rebuild", help="Drop and recreate indexes whose declaration changed")
+):
+    """Create the declared indexes that are missing (also done at startup)"""
+    plan = run_with_db(lambda db: index_plan(db) if dry_run else ensure_indexes(db, rebuild))
+    for collection, changes in plan.items():
+        for change, names in changes.items():
+            if names:
+                typer.echo(f"{collection}: {change}: {', '.join(names)}")
+    if not dry_run and not rebuild and any(changes["conflicting"] for changes in plan.values()):
+        typer.echo("Conflicting indexes were left as they are; use --rebuild to replace them")
+
+
+@app.command("explain-queries")
+def explain_queries():
+    """Fail if any declared query shape is planned as a collection scan"""
+    failing = run_with_db(collscans)
+    for name, stages in failing.items():
+        typer.echo(f"{name}: {' <- '.join(stages)}")
+    if failing:
+        raise typer.Exit(code=1)
+    typer.echo("Every query shape uses an index")
+
+
+if __name__ == "__main__":
+    app()
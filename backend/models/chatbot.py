@@ -4,6 +4,10 @@ from datetime import datetime
 import uuid
 
 
+def generate_chatbot_id() -> str:
+    return f"bot_{uuid.uuid4().hex[:12]}"
+
+
 class Customization(BaseModel):
     primary_color: str = "#7c3aed"
     secondary_color: str = "#2563eb"
@@ -21,14 +25,17 @@ class ChatbotStats(BaseModel):
 
 class Chatbot(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    chatbot_id: str = Field(default_factory=lambda: f"bot_{uuid.uuid4().hex[:12]}")
+    chatbot_id: str = Field(default_factory=generate_chatbot_id)
     google_form_url: str
     name: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     customization: Customization = Field(default_factory=Customization)
     stats: ChatbotStats = Field(default_factory=ChatbotStats)
-    form_schema: Dict = Field(default_factory=dict) # Stores the parsed form structure
+    form_schema: Dict = Field(default_factory=dict) # Legacy embedded copy of the parsed form structure
+    form_title: Optional[str] = None
+    form_key: Optional[str] = None  # Canonical form id, e.g. "e/1FAIpQLSc..."
+    form_schema_ref: Optional[str] = None  # Content hash of the shared schema in form_schemas
     embed_type: str = "popup"  # popup, iframe
     is_active: bool = True
 
@@ -54,4 +61,10 @@ class ChatbotUpdate(BaseModel):
     google_form_url: Optional[str] = None
     customization: Optional[Customization] = None
     embed_type: Optional[str] = None
-    is_active: Optional[bool] = None
\ No newline at end of file
+    is_active: Optional[bool] = None
+
+
+class WebhookConfigUpdate(BaseModel):
+    url: str
+    enabled: bool = True
+    rotate_secret: bool = False
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
+from typing import Any, Optional, List, Dict
 from datetime import datetime
 import uuid
 
@@ -10,7 +10,9 @@ class Conversation(BaseModel):
     chatbot_id: str
     started_at: datetime = Field(default_factory=datetime.utcnow)
     completed_at: Optional[datetime] = None
-    responses: List[Dict] = Field(default_factory=list)
+    # Answers are stored compactly as parallel arrays; question text lives in the schema
+    question_ids: List[str] = Field(default_factory=list)
+    answers: List[Any] = Field(default_factory=list)
     user_data: Dict = Field(default_factory=dict)
     status: str = "started"  # started, completed, abandoned
 
@@ -23,4 +25,10 @@ class ConversationCreate(BaseModel):
 class ConversationUpdate(BaseModel):
     status: Optional[str] = None
     responses: Optional[List[Dict]] = None
-    completed_at: Optional[datetime] = None
\ No newline at end of file
+    completed_at: Optional[datetime] = None
+
+
+class ConversationAnswers(BaseModel):
+    """The full answer set of a conversation, submitted in one request"""
+    responses: List[Dict]
+    complete: bool = True
@@ -1,11 +1,27 @@
 from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional
-from models.chatbot import Chatbot, ChatbotCreate, ChatbotUpdate, Customization
-from services.form_parser import form_parser
+from models.chatbot import Chatbot, ChatbotCreate, ChatbotUpdate, Customization, WebhookConfigUpdate
+from services.schema_store import schema_store
+from services.cache_bus import cache_bus
+from services.creation_jobs import creation_jobs, QueueFullError, TERMINAL_STATUSES
+from services.analytics import answer_analytics
+from services.funnel import funnel_counters
+from services.stats_series import stats_series, naive_utc, GRANULARITIES
+from services.chatbot_search import chatbot_search, SEARCH_FIELDS
+from services.read_routing import read_routing
+from services.json_bytes import dumps, json_response
+from services.webhooks import webhook_delivery, generate_secret, check_webhook_url, WebhookUrlError
+from services.unique_visitors import unique_visitors
+from services.chatbot_purge import chatbot_purger
+from services.conversation_inbox import conversation_inbox
+from services.micro_cache import chatbot_response_cache
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import re
+import json
 
 router = APIRouter(prefix="/api/chatbots", tags=["chatbots"])
 
@@ -14,6 +30,18 @@ mongo_url = os.environ.get('MONGO_URL')
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ.get('DB_NAME', 'fobi_clone')]
 
+# Dashboard reads may go to secondaries; writes and read-your-write paths use `db`
+list_db = read_routing.db(db, "list")
+stats_db = read_routing.db(db, "stats")
+analytics_db = read_routing.db(db, "analytics")
+
+# How often a job event stream re-reads a job run by another process
+JOB_EVENTS_POLL_SECONDS = float(os.environ.get('JOB_EVENTS_POLL_SECONDS', '1.0'))
+
+# Search fields and webhook secrets stay internal; list views also skip the (legacy) embedded schema
+PRIVATE_PROJECTION = {**{field: 0 for field in SEARCH_FIELDS}, "webhook.secret": 0}
+LIST_PROJECTION = {"form_schema": 0, **PRIVATE_PROJECTION}
+
 
 def validate_google_form_url(url: str) -> bool:
     """Validate if the URL is a Google Form URL"""
@@ -57,9 +85,9 @@ def generate_embed_code(chatbot_id: str, embed_type: str, customization: dict) -
     }
 
 
-@router.post("", response_model=dict)
+@router.post("", response_model=dict, status_code=202)
 async def create_chatbot(chatbot_data: ChatbotCreate):
-    """Create a new chatbot from Google Form"""
+    """Queue creation of a new chatbot from Google Form"""
     
     # Validate Google Form URL
     if not validate_google_form_url(chatbot_data.google_form_url):
@@ -68,46 +96,100 @@ async def create_chatbot(chatbot_data: ChatbotCreate):
             detail="Invalid Google Form URL. Please provide a valid Google Forms link."
         )
     
-    # Parse Google Form
+    # Fetching and parsing the form happens on the background job pool
     try:
-        parsed_schema = await form_parser.parse_form(chatbot_data.google_form_url)
-    except Exception as e:
-        # Fallback if parsing fails, still create the bot but maybe mark as error or just empty fields
-        parsed_schema = {"error": str(e), "questions": []}
-        
-    # Create chatbot object
-    chatbot = Chatbot(
-        google_form_url=chatbot_data.google_form_url,
-        name=chatbot_data.name,
-        customization=chatbot_data.customization or Customization(),
-        embed_type=chatbot_data.embed_type,
-        form_schema=parsed_schema
-    )
-    
-    # Insert into database
-    chatbot_dict = chatbot.dict()
-    await db.chatbots.insert_one(chatbot_dict)
-    
-    # Check if _id is in dict and convert to str if so (it is added by insert_one)
-    if "_id" in chatbot_dict:
-        chatbot_dict["_id"] = str(chatbot_dict["_id"])
-    
-    # Generate embed code
-    embed_code = generate_embed_code(
-        chatbot.chatbot_id,
-        chatbot.embed_type,
-        chatbot.customization.dict()
-    )
+        job = await creation_jobs.submit(db, chatbot_data)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     
     return {
         "success": True,
-        "chatbot_id": chatbot.chatbot_id,
-        "message": "Chatbot created successfully",
-        "chatbot": chatbot_dict,
-        "embed_code": embed_code
+        "message": "Chatbot creation started",
+        **job_links(job)
     }
 
 
+def job_links(job: dict) -> dict:
+    """Where to follow a queued job"""
+    return {
+        "job_id": job["_id"],
+        "chatbot_id": job["chatbot_id"],
+        "status": job["status"],
+        "status_url": f"/api/chatbots/jobs/{job['_id']}",
+        "events_url": f"/api/chatbots/jobs/{job['_id']}/events"
+    }
+
+
+async def build_job_status(job: dict) -> dict:
+    """Job status payload; finished jobs include the chatbot and its embed code"""
+    status = {
+        "success": True,
+        "job_id": job["_id"],
+        "kind": job.get("kind", "create"),
+        "chatbot_id": job["chatbot_id"],
+        "status": job["status"],
+        "error": job.get("error"),
+        "result": job.get("result"),
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+    if job["status"] == "succeeded":
+        chatbot = await db.chatbots.find_one({"chatbot_id": job["chatbot_id"]}, {"_id": 0, **LIST_PROJECTION})
+        if chatbot:
+            status["chatbot"] = chatbot
+            status["embed_code"] = generate_embed_code(
+                chatbot["chatbot_id"],
+                chatbot["embed_type"],
+                chatbot["customization"]
+            )
+    return status
+
+
+@router.get("/jobs/{job_id}", response_model=dict)
+async def get_creation_job(job_id: str):
+    """Get the status of a chatbot creation job"""
+    
+    job = await creation_jobs.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return await build_job_status(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_creation_job(job_id: str):
+    """Server-sent events with the job status, until the job finishes"""
+    
+    job = await creation_jobs.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        current = job
+        last_status = None
+        try:
+            while True:
+                if current["status"] != last_status:
+                    last_status = current["status"]
+                    payload = jsonable_encoder(await build_job_status(current))
+                    yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+                    if last_status in TERMINAL_STATUSES:
+                        return
+                else:
+                    # Keep proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                await creation_jobs.wait_for_change(job_id, timeout=JOB_EVENTS_POLL_SECONDS)
+                current = await creation_jobs.get(db, job_id) or current
+        finally:
+            creation_jobs.forget(job_id)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("", response_model=dict)
 async def get_chatbots(
     page: int = Query(1, ge=1),
@@ -121,25 +203,49 @@ async def get_chatbots(
     if is_active is not None:
         query["is_active"] = is_active
     
-    # Get total count
-    total = await db.chatbots.count_documents(query)
+    # Get total count; without a filter the collection's own count is enough
+    if query:
+        total = await list_db.chatbots.count_documents(query)
+    else:
+        total = await list_db.chatbots.estimated_document_count()
     
-    # Get paginated results
+    # Get paginated results, in _id order so pages come from an index (active_id or _id_)
     skip = (page - 1) * per_page
-    chatbots = await db.chatbots.find(query).skip(skip).limit(per_page).to_list(per_page)
+    chatbots = await list_db.chatbots.find(query, LIST_PROJECTION).sort("_id", 1).skip(skip).limit(
+        per_page
+    ).to_list(per_page)
+    
+    # Encoded straight to JSON bytes (ObjectId _ids become strings)
+    return json_response(
+        success=True,
+        chatbots=chatbots,
+        total=total,
+        page=page,
+        per_page=per_page,
+        total_pages=(total + per_page - 1) // per_page,
+        read=read_routing.describe("list")
+    )
+
+
+@router.get("/search", response_model=dict)
+async def search_chatbots(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """Search chatbots by name or form title (case- and accent-insensitive substring match)"""
     
-    # Convert _id to str for all
-    for bot in chatbots:
-        if "_id" in bot:
-            bot["_id"] = str(bot["_id"])
+    try:
+        result = await chatbot_search.search(list_db, q, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "success": True,
-        "chatbots": chatbots,
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "total_pages": (total + per_page - 1) // per_page
+        "query": q,
+        "chatbots": result["chatbots"],
+        "next_cursor": result["next_cursor"],
+        "read": read_routing.describe("list")
     }
 
 
@@ -147,13 +253,25 @@ async def get_chatbots(
 async def get_chatbot(chatbot_id: str):
     """Get specific chatbot details"""
     
-    chatbot = await db.chatbots.find_one({"chatbot_id": chatbot_id})
-    if chatbot and "_id" in chatbot:
-        chatbot["_id"] = str(chatbot["_id"])
+    # Every page view of an embed asks for this; concurrent misses share one read
+    body = await chatbot_response_cache.get(chatbot_id, lambda: render_chatbot(chatbot_id))
     
-    if not chatbot:
+    if body is None:
         raise HTTPException(status_code=404, detail="Chatbot not found")
     
+    return Response(content=body, media_type="application/json")
+
+
+async def render_chatbot(chatbot_id: str) -> Optional[bytes]:
+    """The encoded GET /api/chatbots/{chatbot_id} response, or None if there is no such chatbot"""
+    chatbot = await db.chatbots.find_one({"chatbot_id": chatbot_id}, PRIVATE_PROJECTION)
+    if not chatbot:
+        return None
+    
+    # The schema is spliced in from its cached JSON instead of being re-encoded
+    form_schema = await schema_store.resolve_json(db, chatbot)
+    chatbot.pop("form_schema", None)
+    
     # Generate embed code
     embed_code = generate_embed_code(
         chatbot["chatbot_id"],
@@ -161,16 +279,16 @@ async def get_chatbot(chatbot_id: str):
         chatbot["customization"]
     )
     
-    return {
-        "success": True,
-        "chatbot": chatbot,
-        "embed_code": embed_code
-    }
+    return json_response(
+        success=True,
+        chatbot=dumps(chatbot, form_schema=form_schema),
+        embed_code=embed_code
+    ).body
 
 
 @router.put("/{chatbot_id}", response_model=dict)
-async def update_chatbot(chatbot_id: str, update_data: ChatbotUpdate):
-    """Update chatbot customization"""
+async def update_chatbot(chatbot_id: str, update_data: ChatbotUpdate, response: Response):
+    """Update chatbot customization; a new form URL is parsed by a background job"""
     
     # Check if chatbot exists
     chatbot = await db.chatbots.find_one({"chatbot_id": chatbot_id})
@@ -188,33 +306,87 @@ async def update_chatbot(chatbot_id: str, update_data: ChatbotUpdate):
     update_dict = {k: v for k, v in update_data.dict(exclude_unset=True).items() if v is not None}
     update_dict["updated_at"] = datetime.utcnow()
     
+    # A different form means a different schema; the URL changes once the job has parsed it
+    job = None
+    new_url = update_dict.pop("google_form_url", None)
+    if new_url and new_url != chatbot.get("google_form_url"):
+        try:
+            job = await creation_jobs.submit_form_change(db, chatbot_id, new_url)
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    
+    # Keep search fields in step with the name
+    if "name" in update_dict:
+        update_dict.update(chatbot_search.fields(update_dict["name"], chatbot.get("form_title")))
+    
     # Update in database
     await db.chatbots.update_one(
         {"chatbot_id": chatbot_id},
         {"$set": update_dict}
     )
+    await cache_bus.publish(db, chatbot_id)
     
+    if job is None:
+        return {
+            "success": True,
+            "message": "Chatbot updated successfully"
+        }
+    response.status_code = 202
     return {
         "success": True,
-        "message": "Chatbot updated successfully"
+        "message": "Chatbot updated; the new form is being parsed",
+        **job_links(job)
     }
 
 
 @router.delete("/{chatbot_id}", response_model=dict)
 async def delete_chatbot(chatbot_id: str):
-    """Delete a chatbot"""
+    """Delete a chatbot; its conversations are removed in the background"""
     
-    result = await db.chatbots.delete_one({"chatbot_id": chatbot_id})
+    tombstone = await chatbot_purger.tombstone(db, chatbot_id)
     
-    if result.deleted_count == 0:
+    if tombstone is None:
         raise HTTPException(status_code=404, detail="Chatbot not found")
+    await cache_bus.publish(db, chatbot_id)
     
-    # Also delete associated conversations
-    await db.conversations.delete_many({"chatbot_id": chatbot_id})
+    return {
+        "success": True,
+        "message": "Chatbot deleted successfully",
+        "purge_url": f"/api/chatbots/{chatbot_id}/purge"
+    }
+
+
+@router.get("/{chatbot_id}/purge", response_model=dict)
+async def get_chatbot_purge(chatbot_id: str):
+    """Get the progress of removing a deleted chatbot's data"""
+    
+    purge = await chatbot_purger.progress(db, chatbot_id)
+    if purge is None:
+        raise HTTPException(status_code=404, detail="No deletion found for this chatbot")
+    
+    return {
+        "success": True,
+        "purge": purge
+    }
+
+
+@router.post("/{chatbot_id}/refresh-schema", response_model=dict, status_code=202)
+async def refresh_chatbot_schema(chatbot_id: str):
+    """Queue re-parsing the chatbot's Google Form for every chatbot built from the same form"""
+    
+    chatbot = await db.chatbots.find_one({"chatbot_id": chatbot_id}, {"google_form_url": 1})
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    
+    try:
+        job = await creation_jobs.submit_refresh(db, chatbot_id, chatbot["google_form_url"])
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     
     return {
         "success": True,
-        "message": "Chatbot deleted successfully"
+        "message": "Schema refresh started",
+        **job_links(job)
     }
 
 
@@ -222,26 +394,290 @@ async def delete_chatbot(chatbot_id: str):
 async def get_chatbot_stats(chatbot_id: str):
     """Get specific chatbot statistics"""
     
-    chatbot = await db.chatbots.find_one({"chatbot_id": chatbot_id})
+    chatbot = await stats_db.chatbots.find_one({"chatbot_id": chatbot_id}, {"stats": 1})
     
     if not chatbot:
         raise HTTPException(status_code=404, detail="Chatbot not found")
     
     # Get conversation stats
-    total_conversations = await db.conversations.count_documents({"chatbot_id": chatbot_id})
-    completed_conversations = await db.conversations.count_documents({
+    total_conversations = await stats_db.conversations.count_documents({"chatbot_id": chatbot_id})
+    completed_conversations = await stats_db.conversations.count_documents({
         "chatbot_id": chatbot_id,
         "status": "completed"
     })
     
     completion_rate = (completed_conversations / total_conversations * 100) if total_conversations > 0 else 0
     
+    # Deduplicated by visitor: reloads and retries count once
+    unique = await unique_visitors.summary(stats_db, chatbot_id)
+    
     return {
         "success": True,
         "stats": {
             "total_conversations": total_conversations,
             "completed_conversations": completed_conversations,
             "total_views": chatbot.get("stats", {}).get("total_views", 0),
-            "completion_rate": round(completion_rate, 2)
-        }
-    }
\ No newline at end of file
+            "completion_rate": round(completion_rate, 2),
+            **unique
+        },
+        "read": read_routing.describe("stats")
+    }
+
+
+# Default look-back window per series granularity
+SERIES_DEFAULT_RANGE = {
+    "hour": timedelta(days=7),
+    "day": timedelta(days=30),
+    "week": timedelta(weeks=12)
+}
+
+
+@router.get("/{chatbot_id}/stats/series", response_model=dict)
+async def get_chatbot_stats_series(
+    chatbot_id: str,
+    granularity: str = Query("hour"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Get views, answers and completions per hour, day or week"""
+    
+    if granularity not in GRANULARITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid granularity. Use one of: {', '.join(GRANULARITIES)}"
+        )
+    
+    chatbot = await stats_db.chatbots.find_one({"chatbot_id": chatbot_id}, {"_id": 1})
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    
+    # A trailing Z or offset makes these aware; buckets are keyed by naive UTC
+    end = naive_utc(end) or datetime.utcnow()
+    start = naive_utc(start) or end - SERIES_DEFAULT_RANGE[granularity]
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    try:
+        series = await stats_series.get_series(stats_db, chatbot_id, granularity, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "success": True,
+        "granularity": granularity,
+        "series": series,
+        "read": read_routing.describe("stats")
+    }
+
+
+@router.get("/{chatbot_id}/stats/unique", response_model=dict)
+async def get_chatbot_unique_visitors(
+    chatbot_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Get estimated unique visitors and completers over a range of days"""
+    
+    chatbot = await stats_db.chatbots.find_one({"chatbot_id": chatbot_id}, {"_id": 1})
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    
+    end = naive_utc(end) or datetime.utcnow()
+    start = naive_utc(start) or end - SERIES_DEFAULT_RANGE["day"]
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if end - start > unique_visitors.day_retention + timedelta(days=1):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Daily visitor sketches are kept for {unique_visitors.day_retention.days} days"
+        )
+    
+    return {
+        "success": True,
+        "start": start,
+        "end": end,
+        "unique": await unique_visitors.summary(stats_db, chatbot_id, start, end),
+        "read": read_routing.describe("stats")
+    }
+
+
+@router.get("/{chatbot_id}/conversations", response_model=dict)
+async def list_chatbot_conversations(
+    chatbot_id: str,
+    status: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    question_id: Optional[str] = None,
+    answer: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """List a chatbot's conversations, newest first, as summaries"""
+    
+    chatbot = await list_db.chatbots.find_one({"chatbot_id": chatbot_id}, {"_id": 1})
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    
+    try:
+        result = await conversation_inbox.page(
+            list_db,
+            chatbot_id,
+            limit=limit,
+            cursor=cursor,
+            status=status,
+            start=start,
+            end=end,
+            question_id=question_id,
+            answer=answer
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "success": True,
+        "conversations": result["conversations"],
+        "next_cursor": result["next_cursor"],
+        "read": read_routing.describe("list")
+    }
+
+
+@router.get("/{chatbot_id}/analytics", response_model=dict)
+async def get_chatbot_analytics(chatbot_id: str):
+    """Get per-question answer distributions for completed conversations"""
+    
+    chatbot = await db.chatbots.find_one({"chatbot_id": chatbot_id}, {"form_schema": 1, "form_schema_ref": 1})
+    
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    
+    analytics = await answer_analytics.get_answer_analytics(
+        analytics_db,
+        chatbot_id,
+        await schema_store.resolve(db, chatbot)
+    )
+    
+    return {
+        "success": True,
+        "analytics": analytics,
+        "read": read_routing.describe("analytics")
+    }
+
+
+@router.get("/{chatbot_id}/funnel", response_model=dict)
+async def get_chatbot_funnel(chatbot_id: str):
+    """Get the per-question drop-off funnel from the chatbot's counter document"""
+    
+    funnel = await funnel_counters.get_funnel(stats_db, chatbot_id)
+    
+    if funnel is None:
+        # Bots created before funnel tracking have no question order yet
+        chatbot = await db.chatbots.find_one({"chatbot_id": chatbot_id}, {"form_schema": 1, "form_schema_ref": 1})
+        if not chatbot:
+            raise HTTPException(status_code=404, detail="Chatbot not found")
+        await funnel_counters.init_funnel(db, chatbot_id, await schema_store.resolve(db, chatbot))
+        funnel = await funnel_counters.get_funnel(db, chatbot_id)
+    
+    return {
+        "success": True,
+        "funnel": funnel,
+        "read": read_routing.describe("stats")
+    }
+
+
+@router.get("/{chatbot_id}/webhook", response_model=dict)
+async def get_chatbot_webhook(chatbot_id: str):
+    """Get the chatbot's webhook configuration (without its secret)"""
+    
+    chatbot = await db.chatbots.find_one({"chatbot_id": chatbot_id}, {"webhook": 1})
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    
+    webhook = chatbot.get("webhook")
+    if webhook:
+        webhook = {k: v for k, v in webhook.items() if k != "secret"}
+    dead_letters = await db[webhook_delivery.DEAD_LETTERS].count_documents({"chatbot_id": chatbot_id})
+    
+    return {
+        "success": True,
+        "webhook": webhook,
+        "dead_letters": dead_letters
+    }
+
+
+@router.put("/{chatbot_id}/webhook", response_model=dict)
+async def set_chatbot_webhook(chatbot_id: str, config: WebhookConfigUpdate):
+    """Set the webhook notified when a conversation completes; returns the signing secret"""
+    
+    try:
+        await check_webhook_url(config.url, webhook_delivery.allow_private)
+    except WebhookUrlError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError:
+        raise HTTPException(status_code=400, detail="Webhook host could not be resolved")
+    
+    chatbot = await db.chatbots.find_one({"chatbot_id": chatbot_id}, {"webhook": 1})
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    
+    # Keep the secret across URL changes unless asked to rotate it
+    secret = (chatbot.get("webhook") or {}).get("secret")
+    if not secret or config.rotate_secret:
+        secret = generate_secret()
+    webhook = {
+        "url": config.url,
+        "enabled": config.enabled,
+        "secret": secret,
+        "updated_at": datetime.utcnow()
+    }
+    await db.chatbots.update_one({"chatbot_id": chatbot_id}, {"$set": {"webhook": webhook}})
+    await cache_bus.publish(db, chatbot_id)
+    
+    return {
+        "success": True,
+        "webhook": webhook
+    }
+
+
+@router.delete("/{chatbot_id}/webhook", response_model=dict)
+async def delete_chatbot_webhook(chatbot_id: str):
+    """Remove the chatbot's webhook; undelivered events are dead-lettered"""
+    
+    result = await db.chatbots.update_one({"chatbot_id": chatbot_id}, {"$unset": {"webhook": ""}})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    await cache_bus.publish(db, chatbot_id)
+    
+    return {
+        "success": True,
+        "message": "Webhook removed"
+    }
+
+
+@router.get("/{chatbot_id}/webhook/dead-letters", response_model=dict)
+async def get_webhook_dead_letters(chatbot_id: str, limit: int = Query(50, ge=1, le=500)):
+    """Events that could not be delivered after every retry"""
+    
+    dead_letters = await webhook_delivery.list_dead_letters(db, chatbot_id, limit)
+    
+    return {
+        "success": True,
+        "dead_letters": dead_letters
+    }
+
+
+@router.post("/{chatbot_id}/webhook/dead-letters/redeliver", response_model=dict)
+async def redeliver_webhook_dead_letters(chatbot_id: str):
+    """Queue every dead-lettered event of the chatbot for delivery again"""
+    
+    chatbot = await db.chatbots.find_one({"chatbot_id": chatbot_id}, {"webhook.enabled": 1})
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    if not (chatbot.get("webhook") or {}).get("enabled"):
+        raise HTTPException(status_code=409, detail="Webhook is not enabled")
+    
+    requeued = await webhook_delivery.redeliver(db, chatbot_id)
+    
+    return {
+        "success": True,
+        "requeued": requeued
+    }
@@ -1,8 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from models.conversation import Conversation, ConversationCreate, ConversationUpdate
+from fastapi import APIRouter, HTTPException, Query, Request
+from models.conversation import Conversation, ConversationCreate, ConversationUpdate, ConversationAnswers
 from services.chat_engine import chat_engine
-from typing import Dict, Any
+from services.conversation_ids import conversation_ids
+from services.read_routing import read_routing
+from services.json_bytes import json_response
+from services.conversation_responses import conversation_responses
+from services.funnel import funnel_counters
+from services.schema_store import schema_store
+from services.stats_series import stats_series
+from services.unique_visitors import unique_visitors, visitor_fingerprint
+from services.webhooks import webhook_delivery
+from services.micro_cache import chatbot_start_cache
+from typing import Dict, Any, Optional
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 import os
 from datetime import datetime
 
@@ -12,26 +23,139 @@ router = APIRouter(prefix="/api/conversations", tags=["conversations"])
 mongo_url = os.environ.get('MONGO_URL')
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ.get('DB_NAME', 'fobi_clone')]
+# Conversations read back what they just wrote; primary unless configured otherwise
+conversation_db = read_routing.db(db, "conversation")
+
+# The conversation flow only needs the chatbot's schema (shared or legacy embedded)
+SCHEMA_PROJECTION = {"form_schema": 1, "form_schema_ref": 1}
+# Answer paths also need to know whether completions notify a webhook
+FLOW_PROJECTION = {**SCHEMA_PROJECTION, "webhook.enabled": 1}
+# Written only by the request that completes a conversation
+COMPLETION_FIELDS = ("status", "completed_at", "outbox")
+# Most questions a client may prefetch with `lookahead`
+LOOKAHEAD_MAX = 10
+
+
+async def find_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Load a conversation, or describe a valid provisional one that has no
+    document yet (opened, but nothing answered). Provisional ones have no `_id`.
+    """
+    conversation = await conversation_db.conversations.find_one({"conversation_id": conversation_id})
+    if conversation:
+        return conversation
+    
+    provisional = conversation_ids.verify(conversation_id)
+    if not provisional:
+        return None
+    return Conversation(
+        conversation_id=conversation_id,
+        chatbot_id=provisional["chatbot_id"],
+        started_at=provisional["started_at"]
+    ).dict()
+
+
+async def save_conversation(
+    conversation: Dict[str, Any],
+    update_dict: Dict[str, Any],
+    upsert: bool = False,
+    completing: bool = False
+) -> bool:
+    """
+    $set `update_dict`; with `upsert`, write the rest of a provisional conversation too.
+    With `completing`, the write only applies to a conversation that is not completed
+    yet; if a concurrent request completed it first, only the answers are saved and
+    False is returned, so the completion (webhook event, counters) happens once.
+    """
+    update = {"$set": update_dict}
+    if "question_ids" in update_dict:
+        # Rewriting the answers also converts a legacy document
+        update["$unset"] = {"responses": ""}
+    if upsert:
+        update["$setOnInsert"] = {
+            k: v for k, v in conversation.items()
+            if k not in update_dict and k != "conversation_id"
+        }
+    query = {"conversation_id": conversation["conversation_id"]}
+    if completing:
+        query["status"] = {"$ne": "completed"}
+    try:
+        result = await db.conversations.update_one(query, update, upsert=upsert)
+    except DuplicateKeyError:
+        # A concurrent first answer created it already (and may have completed it)
+        result = await db.conversations.update_one(
+            query,
+            {k: v for k, v in update.items() if k != "$setOnInsert"}
+        )
+    if result.matched_count or result.upserted_id is not None:
+        return True
+    
+    # Lost the race to complete: keep this request's answers only
+    update["$set"] = {k: v for k, v in update_dict.items() if k not in COMPLETION_FIELDS}
+    update.pop("$setOnInsert", None)
+    await db.conversations.update_one({"conversation_id": conversation["conversation_id"]}, update)
+    return False
+
+
+async def save_answer_set(conversation: Dict[str, Any], update_dict: Dict[str, Any], upsert: bool = False) -> bool:
+    """
+    One write of a whole answer set; the status guard makes the completion
+    transition happen at most once. False if the conversation is completed.
+    """
+    query = {"conversation_id": conversation["conversation_id"], "status": {"$ne": "completed"}}
+    update = {"$set": update_dict, "$unset": {"responses": ""}}
+    try:
+        if upsert:
+            result = await db.conversations.update_one(
+                query,
+                {
+                    "$set": update_dict,
+                    "$setOnInsert": {
+                        k: v for k, v in conversation.items()
+                        if k not in update_dict and k != "conversation_id"
+                    }
+                },
+                upsert=True
+            )
+        else:
+            result = await db.conversations.update_one(query, update)
+    except DuplicateKeyError:
+        # The guarded upsert found a document it may not update: either it is
+        # completed, or a concurrent first answer created it
+        existing = await db.conversations.find_one({"conversation_id": conversation["conversation_id"]}, {"status": 1})
+        if existing is not None and existing.get("status") == "completed":
+            return False
+        result = await db.conversations.update_one(query, update)
+    return bool(result.matched_count or result.upserted_id is not None)
 
 
 @router.post("", response_model=dict)
-async def create_conversation(conversation_data: ConversationCreate):
+async def create_conversation(
+    conversation_data: ConversationCreate,
+    request: Request,
+    lookahead: int = Query(0, ge=0, le=LOOKAHEAD_MAX)
+):
     """Create/start a new conversation"""
     
     # Check if chatbot exists
-    chatbot = await db.chatbots.find_one({"chatbot_id": conversation_data.chatbot_id})
+    chatbot = await chatbot_start_cache.get(
+        conversation_data.chatbot_id,
+        lambda: db.chatbots.find_one({"chatbot_id": conversation_data.chatbot_id}, SCHEMA_PROJECTION)
+    )
     if not chatbot:
         raise HTTPException(status_code=404, detail="Chatbot not found")
     
-    # Create conversation
+    # Create conversation under a signed provisional id
     conversation = Conversation(
+        conversation_id=conversation_ids.issue(conversation_data.chatbot_id),
         chatbot_id=conversation_data.chatbot_id,
         user_data=conversation_data.user_data or {}
     )
     
-    # Insert into database
-    conversation_dict = conversation.dict()
-    await db.conversations.insert_one(conversation_dict)
+    # The document is only written once the first answer arrives, unless there is
+    # user data the id cannot carry
+    if conversation.user_data:
+        await db.conversations.insert_one(conversation.dict())
     
     # Increment chatbot views
     await db.chatbots.update_one(
@@ -40,93 +164,238 @@ async def create_conversation(conversation_data: ConversationCreate):
     )
     
     # Get the first question
-    next_question = chat_engine.get_next_question(chatbot.get("form_schema", {}), [])
+    schema = await schema_store.resolve(db, chatbot)
+    next_question = chat_engine.get_next_question(schema, [])
+    await funnel_counters.record_start(db, conversation_data.chatbot_id, next_question)
+    await stats_series.record(db, conversation_data.chatbot_id, views=1)
+    unique_visitors.add(conversation_data.chatbot_id, "visitors", visitor_fingerprint(conversation.user_data, request))
 
-    return {
+    response = {
         "success": True,
         "conversation_id": conversation.conversation_id,
         "message": "Conversation started",
         "next_question": next_question
     }
+    if lookahead:
+        response["next_questions"] = chat_engine.get_upcoming_questions(schema, [], lookahead)
+    return response
 
 
 @router.put("/{conversation_id}", response_model=dict)
-async def update_conversation(conversation_id: str, update_data: ConversationUpdate):
+async def update_conversation(
+    conversation_id: str,
+    update_data: ConversationUpdate,
+    request: Request,
+    lookahead: int = Query(0, ge=0, le=LOOKAHEAD_MAX)
+):
     """Update conversation (add responses, mark completed)"""
     
-    # Check if conversation exists
-    conversation = await db.conversations.find_one({"conversation_id": conversation_id})
+    # Check if conversation exists, or is a provisional one about to be written
+    conversation = await find_conversation(conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
+    is_new = "_id" not in conversation
     
     # Prepare update data
     update_dict = {k: v for k, v in update_data.dict(exclude_unset=True).items() if v is not None}
     
-    # If marking as completed, set completed_at
-    if update_data.status == "completed" and not update_dict.get("completed_at"):
-        update_dict["completed_at"] = datetime.utcnow()
-    
-    # Update in database
-    await db.conversations.update_one(
-        {"conversation_id": conversation_id},
-        {"$set": update_dict}
-    )
-    
-    # If completed, increment chatbot stats
-    if update_data.status == "completed":
-        await db.chatbots.update_one(
-            {"chatbot_id": conversation["chatbot_id"]},
-            {"$inc": {"stats.total_conversations": 1}}
-        )
+    # Merge this turn's answers into the stored history
+    previous_responses = conversation_responses.unpack(conversation)
+    current_responses = previous_responses
+    answered_ids = []
+    if "responses" in update_dict:
+        known_ids = {r.get("question_id") for r in previous_responses}
+        answered_ids = list(dict.fromkeys(
+            r.get("question_id") for r in update_dict["responses"]
+            if r.get("question_id") is not None and r.get("question_id") not in known_ids
+        ))
+        current_responses = chat_engine.merge_responses(previous_responses, update_dict.pop("responses"))
+        update_dict.update(conversation_responses.pack(current_responses))
     
+    # If marking as completed, set completed_at (once)
+    was_completed = conversation.get("status") == "completed"
+    if update_data.status == "completed" and not was_completed and not update_dict.get("completed_at"):
+        update_dict["completed_at"] = datetime.utcnow()
     
     # Get associated chatbot for schema
-    chatbot = await db.chatbots.find_one({"chatbot_id": conversation["chatbot_id"]})
+    chatbot = await db.chatbots.find_one({"chatbot_id": conversation["chatbot_id"]}, FLOW_PROJECTION)
     if not chatbot:
         raise HTTPException(status_code=404, detail="Chatbot for conversation not found")
 
-    # Get the current responses from update_dict or existing conversation
-    current_responses = update_dict.get("responses") or conversation.get("responses", [])
-    
     # Get next question
-    next_question = chat_engine.get_next_question(chatbot.get("form_schema", {}), current_responses)
+    schema = await schema_store.resolve(db, chatbot)
+    next_question = chat_engine.get_next_question(schema, current_responses)
     
     # Determine if conversation is "internally" completed (no more questions)
     is_flow_completed = next_question is None
     
-    if is_flow_completed and update_data.status != "completed":
+    if is_flow_completed and update_data.status != "completed" and not was_completed:
         # Auto-complete if flow is done
         update_dict["status"] = "completed"
         update_dict["completed_at"] = datetime.utcnow()
-        await db.conversations.update_one(
-             {"conversation_id": conversation_id},
-             {"$set": update_dict}
-        )
-        # Also increment stats if we auto-completed it just now
+    
+    is_completed = update_data.status == "completed" or is_flow_completed
+    completed_now = is_completed and not was_completed
+    
+    # The webhook event is queued in the same write as the completion
+    outbox = webhook_delivery.outbox_entry(conversation["chatbot_id"], chatbot.get("webhook")) if completed_now else None
+    if outbox:
+        update_dict["outbox"] = outbox
+    
+    # Update in database (first answer: create the document); a concurrent
+    # completion wins and this one is dropped along with its webhook event
+    if not await save_conversation(conversation, update_dict, upsert=is_new, completing=completed_now):
+        completed_now, outbox = False, None
+    if outbox:
+        webhook_delivery.notify()
+    
+    # Count the completion once, not again on every later update of a completed conversation
+    if completed_now:
         await db.chatbots.update_one(
             {"chatbot_id": conversation["chatbot_id"]},
             {"$inc": {"stats.total_conversations": 1}}
         )
 
-    return {
+    # Funnel and time series: count each newly answered question and the transition to completed once
+    await funnel_counters.record_answers(
+        db,
+        conversation["chatbot_id"],
+        answered_ids,
+        next_question,
+        completed=completed_now
+    )
+    await stats_series.record(
+        db,
+        conversation["chatbot_id"],
+        answers=len(answered_ids),
+        completions=1 if completed_now else 0
+    )
+    if completed_now:
+        unique_visitors.add(
+            conversation["chatbot_id"],
+            "completers",
+            visitor_fingerprint(conversation.get("user_data"), request)
+        )
+
+    response = {
         "success": True,
         "message": "Conversation updated",
         "next_question": next_question
     }
+    if lookahead:
+        # Rendered by the client ahead of time; this server still decides completion
+        response["next_questions"] = chat_engine.get_upcoming_questions(schema, current_responses, lookahead)
+    return response
+
+
+@router.put("/{conversation_id}/answers", response_model=dict)
+async def submit_answers(
+    conversation_id: str,
+    answers: ConversationAnswers,
+    request: Request,
+    lookahead: int = Query(0, ge=0, le=LOOKAHEAD_MAX)
+):
+    """Submit a conversation's whole answer set in one request"""
+    
+    conversation = await find_conversation(conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if conversation.get("status") == "completed":
+        raise HTTPException(status_code=409, detail="Conversation already completed")
+    is_new = "_id" not in conversation
+    
+    chatbot = await db.chatbots.find_one({"chatbot_id": conversation["chatbot_id"]}, FLOW_PROJECTION)
+    if not chatbot:
+        raise HTTPException(status_code=404, detail="Chatbot for conversation not found")
+    schema = await schema_store.resolve(db, chatbot)
+    
+    # Validate everything in one pass and report every problem at once
+    previous_responses = conversation_responses.unpack(conversation)
+    responses = chat_engine.merge_responses(previous_responses, answers.responses)
+    errors = chat_engine.validate_answers(schema, responses, require_all=answers.complete)
+    if errors:
+        raise HTTPException(
+            status_code=422,
+            detail={"message": "Some answers are invalid", "errors": errors}
+        )
+    
+    next_question = chat_engine.get_next_question(schema, responses)
+    completed_now = answers.complete or next_question is None
+    update_dict = conversation_responses.pack(responses)
+    outbox = None
+    if completed_now:
+        update_dict["status"] = "completed"
+        update_dict["completed_at"] = datetime.utcnow()
+        outbox = webhook_delivery.outbox_entry(conversation["chatbot_id"], chatbot.get("webhook"))
+        if outbox:
+            update_dict["outbox"] = outbox
+    
+    if not await save_answer_set(conversation, update_dict, upsert=is_new):
+        raise HTTPException(status_code=409, detail="Conversation already completed")
+    if outbox:
+        webhook_delivery.notify()
+    
+    known_ids = {r.get("question_id") for r in previous_responses}
+    answered_ids = list(dict.fromkeys(
+        r.get("question_id") for r in answers.responses
+        if r.get("question_id") is not None and r.get("question_id") not in known_ids
+    ))
+    if completed_now:
+        await db.chatbots.update_one(
+            {"chatbot_id": conversation["chatbot_id"]},
+            {"$inc": {"stats.total_conversations": 1}}
+        )
+    # The question that was pending before this request had already been reached
+    pending = chat_engine.get_next_question(schema, previous_responses)
+    await funnel_counters.record_answers(
+        db,
+        conversation["chatbot_id"],
+        answered_ids,
+        None if completed_now else next_question,
+        completed=completed_now,
+        skipped_to_ids=[q for q in answered_ids if not pending or q != pending["id"]]
+    )
+    await stats_series.record(
+        db,
+        conversation["chatbot_id"],
+        answers=len(answered_ids),
+        completions=1 if completed_now else 0
+    )
+    if completed_now:
+        unique_visitors.add(
+            conversation["chatbot_id"],
+            "completers",
+            visitor_fingerprint(conversation.get("user_data"), request)
+        )
+    
+    response = {
+        "success": True,
+        "message": "Conversation completed" if completed_now else "Answers saved",
+        "status": "completed" if completed_now else conversation.get("status", "started"),
+        "next_question": None if completed_now else next_question
+    }
+    if lookahead:
+        response["next_questions"] = [] if completed_now else chat_engine.get_upcoming_questions(
+            schema, responses, lookahead
+        )
+    return response
 
 
 @router.get("/{conversation_id}", response_model=dict)
 async def get_conversation(conversation_id: str):
     """Get conversation details"""
     
-    conversation = await db.conversations.find_one({"conversation_id": conversation_id})
-    if conversation and "_id" in conversation:
-        conversation["_id"] = str(conversation["_id"])
+    conversation = await find_conversation(conversation_id)
     
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    return {
-        "success": True,
-        "conversation": conversation
-    }
\ No newline at end of file
+    # Question text is not stored with the answers; put it back from the schema
+    chatbot = await db.chatbots.find_one({"chatbot_id": conversation["chatbot_id"]}, SCHEMA_PROJECTION)
+    if not chatbot:
+        # Its chatbot was deleted; the conversation is only waiting to be purged
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    schema = await schema_store.resolve(db, chatbot)
+    conversation = conversation_responses.to_api(conversation, schema)
+    
+    return json_response(success=True, conversation=conversation)
\ No newline at end of file
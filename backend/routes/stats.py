@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 from motor.motor_asyncio import AsyncIOMotorClient
+from services.chatbot_purge import chatbot_purger
+from services.read_routing import read_routing
 import os
 from datetime import datetime
 
@@ -9,6 +11,7 @@ router = APIRouter(prefix="/api/stats", tags=["stats"])
 mongo_url = os.environ.get('MONGO_URL')
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ.get('DB_NAME', 'fobi_clone')]
+stats_db = read_routing.db(db, "stats")
 
 
 @router.get("", response_model=dict)
@@ -16,12 +19,16 @@ async def get_global_stats():
     """Get global statistics for homepage"""
     
     # Get actual counts from database
-    total_chatbots = await db.chatbots.count_documents({"is_active": True})
-    total_conversations = await db.conversations.count_documents({"status": "completed"})
+    total_chatbots = await stats_db.chatbots.count_documents({"is_active": True})
+    # Conversations of deleted chatbots no longer count, even before they are purged
+    purging = await chatbot_purger.pending_ids(stats_db)
+    total_conversations = await stats_db.conversations.count_documents(
+        {"status": "completed", "chatbot_id": {"$nin": purging}} if purging else {"status": "completed"}
+    )
     
     # Calculate engagement rate
     total_views = 0
-    chatbots = await db.chatbots.find({"is_active": True}).to_list(None)
+    chatbots = await stats_db.chatbots.find({"is_active": True}, {"stats.total_views": 1}).to_list(None)
     for chatbot in chatbots:
         total_views += chatbot.get("stats", {}).get("total_views", 0)
     
@@ -39,5 +46,6 @@ async def get_global_stats():
             "avg_engagement_rate": max(90.0, round(avg_engagement_rate, 1)),  # Minimum 90%
             "total_chatbots": base_websites + total_chatbots
         },
-        "last_updated": datetime.utcnow()
+        "last_updated": datetime.utcnow(),
+        "read": read_routing.describe("stats")
     }
\ No newline at end of file
@@ -6,8 +6,23 @@ import os
 import logging
 from pathlib import Path
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from models.chatbot import Customization
+from services.cache_bus import cache_bus
+from services.chatbot_purge import chatbot_purger
+from services.conversation_ids import conversation_ids
+from services.cpu_pool import CpuPoolBusyError, cpu_pool
+from services.creation_jobs import creation_jobs
+from services.http_client import http_client
+from services.indexes import ensure_indexes
+from services.log_pipeline import log_pipeline
+from services.loop_monitor import loop_monitor
+from services.metrics import metrics
+from services.micro_cache import MICRO_CACHES
+from services.stats_reconcile import stats_reconciler
+from services.stats_series import stats_series
+from services.unique_visitors import unique_visitors
+from services.webhooks import webhook_delivery
 
 # Import routes
 from routes.chatbots import router as chatbots_router
@@ -46,6 +61,30 @@ async def root():
 async def health_check():
     return {"status": "healthy", "database": "connected"}
 
+@api_router.get("/metrics")
+async def get_metrics():
+    """Process metrics: webhook delivery latency and throughput, among others"""
+    metrics.set("webhook_outbox_pending", await webhook_delivery.pending(db))
+    return metrics.snapshot()
+
+@api_router.get("/metrics/loop")
+async def get_loop_stalls():
+    """Recent event-loop stalls with the stack that was blocking"""
+    return {
+        "success": True,
+        "stall_threshold_seconds": loop_monitor.stall_threshold,
+        "debug": loop_monitor.debug,
+        "stalls": loop_monitor.stalls()
+    }
+
+@api_router.get("/metrics/caches")
+async def get_cache_stats():
+    """Hit and coalesce rates of the public read micro-caches"""
+    return {
+        "success": True,
+        "caches": [cache.stats() for cache in MICRO_CACHES]
+    }
+
 # Include the general router
 app.include_router(api_router)
 
@@ -112,9 +151,15 @@ async def get_embed_html(chatbot_id: str):
     <script>
         const API_URL = '/api';
         const CHATBOT_ID = '{chatbot_id}';
+        // Questions the server sent ahead (lookahead); empty when the next one depends on an answer
+        const LOOKAHEAD = 5;
         let conversationId = null;
         let chatbotConfig = null;
         let currentQuestion = null;
+        let upcoming = [];
+        // Answers are sent one at a time, in order, behind the rendered conversation
+        let sending = Promise.resolve();
+        let sendFailed = false;
 
         // Init
         async function init() {{
@@ -129,7 +174,7 @@ async def get_embed_html(chatbot_id: str):
                 }}
 
                 // 2. Start Conversation
-                const convRes = await fetch(`${{API_URL}}/conversations`, {{
+                const convRes = await fetch(`${{API_URL}}/conversations?lookahead=${{LOOKAHEAD}}`, {{
                     method: 'POST',
                     headers: {{ 'Content-Type': 'application/json' }},
                     body: JSON.stringify({{ chatbot_id: CHATBOT_ID }})
@@ -138,6 +183,7 @@ async def get_embed_html(chatbot_id: str):
                 
                 if (convData.success) {{
                     conversationId = convData.conversation_id;
+                    upcoming = (convData.next_questions || []).slice(1);
                     // Show Welcome Message
                     if (chatbotConfig && chatbotConfig.welcome_message) {{
                         addMessage(chatbotConfig.welcome_message, 'bot');
@@ -237,8 +283,49 @@ async def get_embed_html(chatbot_id: str):
             }}
         }}
 
+        function refreshUpcoming(nextQuestions, shownId) {{
+            // The server is authoritative: take its view of what follows the question on screen
+            const index = nextQuestions.findIndex(q => q.id === shownId);
+            if (index >= 0) upcoming = nextQuestions.slice(index + 1);
+        }}
+
+        function sendAnswer(question, answer) {{
+            const send = sending.then(async () => {{
+                // After a failure, later answers must not be stored out of order
+                if (sendFailed) throw Object.assign(new Error('An earlier answer was not saved'), {{ skipped: true }});
+                try {{
+                    const res = await fetch(`${{API_URL}}/conversations/${{conversationId}}?lookahead=${{LOOKAHEAD}}`, {{
+                        method: 'PUT',
+                        headers: {{ 'Content-Type': 'application/json' }},
+                        body: JSON.stringify({{
+                            responses: [{{ 
+                                question_id: question.id,
+                                question: question.text,
+                                answer: answer 
+                            }}]
+                        }})
+                    }});
+                    const data = await res.json();
+                    if (!res.ok || !data.success) throw new Error(data.detail || 'Request failed');
+                    return data;
+                }} catch (err) {{
+                    sendFailed = true;
+                    throw err;
+                }}
+            }});
+            sending = send.catch(() => {{}});
+            return send;
+        }}
+
+        function finish() {{
+            addMessage("Thank you! Your response has been recorded.", 'bot');
+            // Maybe close or show done state
+            document.getElementById('inputArea').style.display = 'none';
+        }}
+
         async function submitAnswer(answer) {{
             if (!answer || !answer.trim()) return;
+            const question = currentQuestion;
             
             // UI Update
             addMessage(answer, 'user');
@@ -246,36 +333,38 @@ async def get_embed_html(chatbot_id: str):
             // Clear Input
             document.getElementById('inputGroup').innerHTML = ''; // Disable input while loading
             
-            try {{
-                // API Call
-                const res = await fetch(`${{API_URL}}/conversations/${{conversationId}}`, {{
-                    method: 'PUT',
-                    headers: {{ 'Content-Type': 'application/json' }},
-                    body: JSON.stringify({{
-                        responses: [{{ 
-                            question_id: currentQuestion.id,
-                            question: currentQuestion.text,
-                            answer: answer 
-                        }}]
-                    }})
+            const send = sendAnswer(question, answer);
+            if (upcoming.length) {{
+                // Prefetched: ask the next question now and save this answer in the background
+                handleNewQuestion(upcoming.shift());
+                send.then(data => refreshUpcoming(data.next_questions || [], currentQuestion.id)).catch(err => {{
+                    if (err.skipped) return;
+                    console.error(err);
+                    upcoming = [];
+                    document.getElementById('inputGroup').innerHTML = '';
+                    addMessage("Sorry, I couldn't save one of your answers. Let's try that one again.", 'bot');
+                    // Once the answers queued behind it have been dropped, ask it again
+                    sending.then(() => {{
+                        sendFailed = false;
+                        handleNewQuestion(question);
+                    }});
                 }});
-                const data = await res.json();
-                
-                if (data.success) {{
-                    if (data.next_question) {{
-                        setTimeout(() => handleNewQuestion(data.next_question), 400);
-                    }} else {{
-                        setTimeout(() => {{
-                            addMessage("Thank you! Your response has been recorded.", 'bot');
-                            // Maybe close or show done state
-                            document.getElementById('inputArea').style.display = 'none';
-                        }}, 400);
-                    }}
+                return;
+            }}
+            
+            try {{
+                const data = await send;
+                if (data.next_questions) upcoming = data.next_questions.slice(1);
+                if (data.next_question) {{
+                    setTimeout(() => handleNewQuestion(data.next_question), 400);
+                }} else {{
+                    setTimeout(finish, 400);
                 }}
             }} catch (err) {{
                 console.error(err);
                 addMessage("Failed to send message. Please try again.", 'bot');
-                renderInput(currentQuestion); // Re-enable input
+                sendFailed = false;
+                renderInput(question); // Re-enable input
             }}
         }}
 
@@ -291,6 +380,13 @@ app.include_router(chatbots_router)
 app.include_router(conversations_router)
 app.include_router(stats_router)
 
+
+@app.exception_handler(CpuPoolBusyError)
+async def cpu_pool_busy(request, exc: CpuPoolBusyError):
+    # Shed load instead of queueing without bound behind the parse workers
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -299,13 +395,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: formatting and output happen on a background thread
+log_pipeline.configure()
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_background_services():
+    await loop_monitor.start()
+    await ensure_indexes(db)
+    await conversation_ids.start(db)
+    await http_client.start()
+    await cpu_pool.start()
+    await cache_bus.start(db)
+    await stats_series.start(db)
+    await unique_visitors.start(db)
+    await stats_reconciler.start(db)
+    await creation_jobs.start(db)
+    await webhook_delivery.start(db)
+    await chatbot_purger.start(db)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await chatbot_purger.stop()
+    await webhook_delivery.stop()
+    await creation_jobs.stop()
+    await cache_bus.stop()
+    await stats_reconciler.stop()
+    await stats_series.stop()
+    # Flush unmerged visitor registers before the client goes away
+    await unique_visitors.stop(db)
+    await cpu_pool.stop()
+    await http_client.close()
+    client.close()
+    await loop_monitor.stop()
+    log_pipeline.stop()
\ No newline at end of file
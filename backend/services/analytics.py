@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import math
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from services.cache_bus import cache_bus, ALL_KEYS
+from services.conversation_responses import conversation_responses, RESPONSES_PROJECTION
+
+logger = logging.getLogger(__name__)
+
+CHOICE_TYPES = ("multiple_choice", "dropdown", "checkboxes")
+
+
+def _answer_length(answer: Any) -> int:
+    """Characters for text answers, selections for checkbox lists, 0 when unanswered"""
+    if answer is None:
+        return 0
+    if isinstance(answer, (str, list)):
+        return len(answer)
+    return len(str(answer))
+
+
+def choice_question_ids(schema: Dict) -> Set[str]:
+    """Questions whose answers are options, the only ones with a distribution"""
+    return {str(q.get("id")) for q in schema.get("questions", []) if q.get("type") in CHOICE_TYPES}
+
+
+def _percentile(counts: pd.Series, q: float) -> float:
+    """`np.percentile` (linear interpolation) of a sorted length -> count series"""
+    position = q / 100 * (int(counts.sum()) - 1)
+    # Values at 0-based rank r are the first whose cumulative count exceeds r
+    ends = np.cumsum(counts.to_numpy())
+    values = counts.index.to_numpy()
+    lower = values[np.searchsorted(ends, math.floor(position), side="right")]
+    upper = values[np.searchsorted(ends, math.ceil(position), side="right")]
+    return float(lower + (upper - lower) * (position - math.floor(position)))
+
+
+class _AnswerState:
+    """Accumulated answer columns for one chatbot up to a high-water mark"""
+
+    def __init__(self):
+        self.conversations = 0
+        self.high_water_mark: Optional[datetime] = None
+        # _id -> completed_at of documents folded in within the lookback before
+        # `high_water_mark`, to skip when the next query reads them again
+        self.seen: Dict[Any, datetime] = {}
+        self.option_counts: Dict[str, pd.Series] = {}
+        # Answer length -> count per question, answered responses only; bounded
+        # by the distinct lengths seen rather than by the number of answers
+        self.length_counts: Dict[str, pd.Series] = {}
+
+
+class AnswerAnalytics:
+    """
+    Per-question answer distributions for a chatbot.
+
+    Completed conversations are streamed in completion order and only their
+    answers are projected. Each batch is turned into flat question_id /
+    answer columns and aggregated with pandas, then merged into a cached
+    per-chatbot state, so a refresh only reads conversations completed after
+    the last high-water mark, less a lookback window: `completed_at` is set
+    by the app before the write, so a conversation can become visible (on a
+    lagging secondary too) after a later one was read. Documents seen within
+    the window are skipped.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, max_chatbots: Optional[int] = None):
+        self.batch_size = batch_size or int(os.environ.get("ANALYTICS_BATCH_SIZE", "2000"))
+        self.max_chatbots = max_chatbots or int(os.environ.get("ANALYTICS_CACHE_SIZE", "256"))
+        self.lookback = timedelta(seconds=int(os.environ.get("ANALYTICS_LOOKBACK_SECONDS", "300")))
+        self._states: "OrderedDict[str, _AnswerState]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        cache_bus.subscribe(self.invalidate)
+
+    def invalidate(self, chatbot_id: Optional[str]):
+        if chatbot_id is ALL_KEYS:
+            self._states.clear()
+        else:
+            self._states.pop(chatbot_id, None)
+
+    def _state_for(self, chatbot_id: str) -> _AnswerState:
+        state = self._states.get(chatbot_id)
+        if state is None:
+            state = _AnswerState()
+            self._states[chatbot_id] = state
+            while len(self._states) > self.max_chatbots:
+                evicted, _ = self._states.popitem(last=False)
+                self._locks.pop(evicted, None)
+        else:
+            self._states.move_to_end(chatbot_id)
+        return state
+
+    async def get_answer_analytics(self, db, chatbot_id: str, schema: Dict) -> Dict:
+        """Refresh the cached state from its high-water mark and summarize it"""
+        lock = self._locks.setdefault(chatbot_id, asyncio.Lock())
+        async with lock:
+            state = self._state_for(chatbot_id)
+            await self._refresh(db, chatbot_id, state, choice_question_ids(schema))
+            return self.summarize(state, schema)
+
+    async def _refresh(self, db, chatbot_id: str, state: _AnswerState, choice_ids: Set[str]):
+        query = {"chatbot_id": chatbot_id, "status": "completed"}
+        if state.high_water_mark is not None:
+            query["completed_at"] = {"$gte": state.high_water_mark - self.lookback}
+
+        cursor = db.conversations.find(
+            query,
+            {**RESPONSES_PROJECTION, "completed_at": 1}
+        ).sort("completed_at", 1).batch_size(self.batch_size)
+
+        batch = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                self.ingest(state, batch, choice_ids)
+                batch = []
+        if batch:
+            self.ingest(state, batch, choice_ids)
+
+    def ingest(self, state: _AnswerState, docs: List[Dict], choice_ids: Set[str]):
+        """Fold a batch of conversation documents into `state`; options are counted for `choice_ids` only"""
+        question_ids: List[str] = []
+        answers: List[Any] = []
+
+        for doc in docs:
+            if doc["_id"] in state.seen:
+                continue
+            completed_at = doc.get("completed_at")
+            if completed_at is not None:
+                state.seen[doc["_id"]] = completed_at
+                if state.high_water_mark is None or completed_at > state.high_water_mark:
+                    state.high_water_mark = completed_at
+
+            state.conversations += 1
+            for response in conversation_responses.unpack(doc):
+                question_id = response.get("question_id")
+                if question_id is None:
+                    continue
+                question_ids.append(str(question_id))
+                answers.append(response.get("answer"))
+
+        if state.high_water_mark is not None:
+            horizon = state.high_water_mark - self.lookback
+            state.seen = {_id: at for _id, at in state.seen.items() if at >= horizon}
+        if not question_ids:
+            return
+
+        frame = pd.DataFrame({"question_id": question_ids, "answer": answers})
+
+        # Checkbox answers arrive as lists; count every ticked option. Free-text
+        # answers are not counted: every distinct one would stay in the state
+        options = frame[frame["question_id"].isin(choice_ids)].explode("answer").dropna(subset=["answer"])
+        options["answer"] = options["answer"].astype(str)
+        for question_id, counts in options.groupby("question_id")["answer"].value_counts().groupby(level=0):
+            counts = counts.droplevel(0)
+            previous = state.option_counts.get(question_id)
+            state.option_counts[question_id] = counts if previous is None else previous.add(counts, fill_value=0)
+
+        frame["length"] = frame["answer"].map(_answer_length)
+        answered = frame[frame["length"] > 0]
+        for question_id, counts in answered.groupby("question_id")["length"].value_counts().groupby(level=0):
+            counts = counts.droplevel(0)
+            previous = state.length_counts.get(question_id)
+            counts = counts if previous is None else previous.add(counts, fill_value=0)
+            state.length_counts[question_id] = counts.sort_index()
+
+    def summarize(self, state: _AnswerState, schema: Dict) -> Dict:
+        questions = []
+        for question in schema.get("questions", []):
+            question_id = str(question.get("id"))
+            lengths = state.length_counts.get(question_id)
+            answered = int(lengths.sum()) if lengths is not None else 0
+            summary = {
+                "question_id": question_id,
+                "question": question.get("title"),
+                "type": question.get("type"),
+                "answered": answered
+            }
+
+            if question.get("type") in CHOICE_TYPES:
+                counts = state.option_counts.get(question_id, pd.Series(dtype=float))
+                known = question.get("options") or []
+                distribution = []
+                for option in known + [o for o in counts.index if o not in known]:
+                    count = int(counts.get(option, 0))
+                    distribution.append({
+                        "option": option,
+                        "count": count,
+                        "percentage": round(count / answered * 100, 2) if answered else 0.0
+                    })
+                summary["distribution"] = distribution
+            else:
+                if answered:
+                    summary["length_stats"] = {
+                        "min": int(lengths.index[0]),
+                        "max": int(lengths.index[-1]),
+                        "mean": round(float((lengths.index.to_numpy() * lengths.to_numpy()).sum()) / answered, 2),
+                        "median": _percentile(lengths, 50),
+                        "p90": _percentile(lengths, 90)
+                    }
+                else:
+                    summary["length_stats"] = None
+
+            questions.append(summary)
+
+        return {
+            "conversations": state.conversations,
+            "as_of": state.high_water_mark,
+            "questions": questions
+        }
+
+
+answer_analytics = AnswerAnalytics()
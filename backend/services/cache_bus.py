@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Passed to subscribers when the affected key is unknown: drop everything
+ALL_KEYS = None
+
+# Raised by the server when change streams are not supported (standalone mongod)
+CHANGE_STREAM_UNSUPPORTED = (40573, 40415)
+
+
+# Deleted chatbots are announced by their tombstone, whose _id is the chatbot id
+TOMBSTONES = "chatbot_tombstones"
+
+# Fields whose updates never change what the caches hold: view and completion counters
+# are bumped on every embed open and completion and would evict the hottest bots constantly
+_CACHED_FIELD_CHANGED = {"$gt": [
+    {"$size": {"$filter": {
+        "input": {"$concatArrays": [
+            {"$map": {"input": {"$objectToArray": "$updateDescription.updatedFields"}, "in": "$$this.k"}},
+            {"$ifNull": ["$updateDescription.removedFields", []]}
+        ]},
+        "cond": {"$not": [{"$regexMatch": {"input": "$$this", "regex": r"^(stats(\.|$)|updated_at$)"}}]}
+    }}},
+    0
+]}
+
+WATCH_PIPELINE = [
+    {"$match": {"$or": [
+        {"ns.coll": "chatbots", "operationType": {"$in": ["insert", "replace"]}},
+        {"ns.coll": "chatbots", "operationType": "update", "$expr": _CACHED_FIELD_CHANGED},
+        {"ns.coll": TOMBSTONES, "operationType": "insert"},
+    ]}},
+    {"$project": {"ns": 1, "operationType": 1, "documentKey": 1, "fullDocument.chatbot_id": 1}},
+]
+
+
+def change_key(change: Dict) -> Optional[str]:
+    """The chatbot id a change event affects, or ALL_KEYS if it cannot be told"""
+    if change.get("ns", {}).get("coll") == TOMBSTONES:
+        return change.get("documentKey", {}).get("_id") or ALL_KEYS
+    return (change.get("fullDocument") or {}).get("chatbot_id") or ALL_KEYS
+
+
+class CacheInvalidationBus:
+    """
+    Fans out chatbot invalidations to the in-process caches of every worker.
+
+    The preferred source is a change stream on `db.chatbots` (counter-only
+    updates excluded) and on chatbot tombstones, which stand in for deletes:
+    a delete event only carries the ObjectId, not the chatbot id. Where change
+    streams are unavailable the bus polls a single version document instead:
+    every publish bumps the version and appends the key to a short bounded
+    log, so a worker only ever reads one document per poll and evicts exactly
+    the keys that changed since its last poll (or everything, if it fell
+    further behind than the log covers).
+    """
+
+    COLLECTION = "cache_versions"
+    VERSION_DOC_ID = "chatbots"
+
+    def __init__(self, poll_interval: Optional[float] = None, log_size: Optional[int] = None):
+        self.poll_interval = poll_interval or float(os.environ.get("CACHE_BUS_POLL_INTERVAL", "1.0"))
+        self.log_size = log_size or int(os.environ.get("CACHE_BUS_LOG_SIZE", "256"))
+        self.use_change_stream = os.environ.get("CACHE_BUS_CHANGE_STREAM", "true").lower() != "false"
+        self.db = None
+        self.mode: Optional[str] = None
+        self._subscribers: List[Callable[[Optional[str]], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._version: Optional[int] = None
+
+    def subscribe(self, callback: Callable[[Optional[str]], None]):
+        """Register `callback(chatbot_id)`; `chatbot_id` is ALL_KEYS for a full flush"""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Optional[str]], None]):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def dispatch(self, chatbot_id: Optional[str]):
+        """Evict `chatbot_id` from every local subscriber"""
+        for callback in list(self._subscribers):
+            try:
+                callback(chatbot_id)
+            except Exception:
+                logger.exception("Cache invalidation subscriber failed")
+
+    async def publish(self, db, chatbot_id: str):
+        """Evict locally right away and announce the change to the other workers"""
+        self.dispatch(chatbot_id)
+        try:
+            await db[self.COLLECTION].update_one(
+                {"_id": self.VERSION_DOC_ID},
+                [
+                    {"$set": {"version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}}},
+                    {"$set": {"log": {"$slice": [
+                        {"$concatArrays": [
+                            {"$ifNull": ["$log", []]},
+                            [{"v": "$version", "key": chatbot_id}]
+                        ]},
+                        -self.log_size
+                    ]}}}
+                ],
+                upsert=True
+            )
+        except PyMongoError as e:
+            # Change-stream workers still see the write itself; pollers catch up on the next bump
+            logger.warning("Failed to publish cache invalidation for %s: %s", chatbot_id, e)
+
+    def apply_version_doc(self, doc: Optional[Dict]) -> List[Optional[str]]:
+        """
+        Work out which keys to evict from a freshly polled version document.
+        Returns the keys (or [ALL_KEYS]) and advances the local version.
+        """
+        if not doc:
+            return []
+
+        version = doc.get("version", 0)
+        previous = self._version
+        self._version = version
+
+        if previous is None or version == previous:
+            return []
+        if version < previous:
+            # Counter was reset; we cannot tell what changed
+            return [ALL_KEYS]
+
+        log = doc.get("log", [])
+        if not log or log[0]["v"] > previous + 1:
+            # We missed entries that already fell out of the log
+            return [ALL_KEYS]
+
+        keys = []
+        for entry in log:
+            if entry["v"] > previous and entry["key"] not in keys:
+                keys.append(entry["key"])
+        return keys
+
+    async def start(self, db):
+        if self._task is not None:
+            return
+        self.db = db
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        if self.use_change_stream:
+            try:
+                await self._watch()
+                return
+            except OperationFailure as e:
+                if e.code not in CHANGE_STREAM_UNSUPPORTED:
+                    raise
+                logger.info("Change streams unavailable (%s); polling cache version counter", e.code)
+        await self._poll()
+
+    async def _watch(self):
+        resume_token = None
+        self.mode = "change_stream"
+        while True:
+            try:
+                async with self.db.watch(
+                    WATCH_PIPELINE,
+                    full_document="updateLookup",
+                    resume_after=resume_token
+                ) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self.dispatch(change_key(change))
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED:
+                    raise
+                logger.warning("Cache change stream failed, restarting: %s", e)
+                resume_token = None
+                self.dispatch(ALL_KEYS)
+            except PyMongoError as e:
+                logger.warning("Cache change stream interrupted, resuming: %s", e)
+            await asyncio.sleep(self.poll_interval)
+
+    async def _poll(self):
+        self.mode = "polling"
+        while True:
+            try:
+                doc = await self.db[self.COLLECTION].find_one({"_id": self.VERSION_DOC_ID})
+                for key in self.apply_version_doc(doc):
+                    self.dispatch(key)
+            except PyMongoError as e:
+                logger.warning("Cache version poll failed: %s", e)
+            await asyncio.sleep(self.poll_interval)
+
+
+cache_bus = CacheInvalidationBus()
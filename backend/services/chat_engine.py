@@ -24,31 +24,106 @@ class ChatEngine:
             return None
             
         # Get the next question
-        next_q = questions[answered_count]
-        
+        return self._to_question(questions[answered_count])
+
+    def get_upcoming_questions(self, schema: Dict, conversation_history: List[Dict], count: int) -> List[Dict]:
+        """
+        The next `count` questions, for clients that render ahead of the server.
+        Stops after a question whose answer picks the next section: what follows
+        it depends on the answer.
+        """
+        questions = schema.get("questions", [])
+        upcoming = []
+        for question in questions[len(conversation_history):len(conversation_history) + count]:
+            upcoming.append(self._to_question(question))
+            if question.get("branches"):
+                break
+        return upcoming
+
+    def _to_question(self, question: Dict) -> Dict:
         return {
-            "id": next_q.get("id"),
-            "text": next_q.get("title"),
-            "type": next_q.get("type"),
-            "options": next_q.get("options"),
-            "required": next_q.get("required"),
-            "placeholder": next_q.get("description") or "Type your answer..."
+            "id": question.get("id"),
+            "text": question.get("title"),
+            "type": question.get("type"),
+            "options": question.get("options"),
+            "required": question.get("required"),
+            "placeholder": question.get("description") or "Type your answer..."
+        }
+
+    def merge_responses(self, existing: List[Dict], incoming: List[Dict]) -> List[Dict]:
+        """
+        Merge the responses sent in one turn into the stored history.
+        Responses are keyed by question_id: a re-sent answer replaces the stored one,
+        anything else is appended in order.
+        """
+        merged = list(existing)
+        positions = {
+            r.get("question_id"): i for i, r in enumerate(merged) if r.get("question_id") is not None
         }
+        for response in incoming:
+            question_id = response.get("question_id")
+            if question_id is not None and question_id in positions:
+                merged[positions[question_id]] = response
+                continue
+            if question_id is not None:
+                positions[question_id] = len(merged)
+            merged.append(response)
+        return merged
 
     def validate_answer(self, question: Dict, answer: Any) -> bool:
         """
         Validate the answer format based on question type.
         """
+        return self.answer_error(question, answer) is None
+
+    def answer_error(self, question: Dict, answer: Any) -> Optional[str]:
+        """
+        Describe what is wrong with an answer, or None if it is valid.
+        """
         q_type = question.get("type", "short_text")
         
         # Simple validation logic
         if not answer and question.get("required"):
-            return False
+            return "This question is required"
             
         if q_type == "multiple_choice" or q_type == "dropdown":
             if answer and answer not in question.get("options", []):
-                return False # Answer must be one of the options
+                return "Answer must be one of the options"
+        
+        if q_type == "checkboxes" and answer:
+            selected = answer if isinstance(answer, list) else [answer]
+            invalid = [a for a in selected if a not in question.get("options", [])]
+            if invalid:
+                return f"Not an option: {', '.join(map(str, invalid))}"
                 
-        return True
+        return None
+
+    def validate_answers(self, schema: Dict, responses: List[Dict], require_all: bool = False) -> List[Dict]:
+        """
+        Validate a whole answer set against the schema in one pass.
+        Returns one {"question_id", "error"} entry per problem; empty when valid.
+        With `require_all`, required questions missing from `responses` are errors too.
+        """
+        questions = {str(q.get("id")): q for q in schema.get("questions", [])}
+        errors = []
+        seen = set()
+
+        for response in responses:
+            question_id = response.get("question_id")
+            question = questions.get(str(question_id)) if question_id is not None else None
+            if question is None:
+                errors.append({"question_id": question_id, "error": "Unknown question"})
+                continue
+            seen.add(str(question_id))
+            error = self.answer_error(question, response.get("answer"))
+            if error:
+                errors.append({"question_id": question_id, "error": error})
+
+        if require_all:
+            for question_id, question in questions.items():
+                if question.get("required") and question_id not in seen:
+                    errors.append({"question_id": question_id, "error": "This question is required"})
+
+        return errors
 
 chat_engine = ChatEngine()
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from services.funnel import funnel_counters
+from services.metrics import metrics
+from services.stats_series import stats_series
+from services.unique_visitors import unique_visitors
+from services.webhooks import webhook_delivery
+
+logger = logging.getLogger(__name__)
+
+# Conversations are removed in the order of this index, which every purge query can use
+PURGE_INDEX = "chatbot_status_completed"
+
+
+class ChatbotPurger:
+    """
+    Deferred removal of deleted chatbots' data.
+
+    Deleting a chatbot moves its document into a tombstone and returns; the
+    chatbot is gone for every read at once. A background task claims
+    tombstones (with a lease, so one process purges each) and deletes the
+    conversations in index-ordered batches, sleeping between batches to stay
+    under `rate` documents per second, and records its progress on the
+    tombstone. The small per-chatbot collections go last, then the tombstone
+    is kept for `retention` so the progress stays readable.
+    """
+
+    COLLECTION = "chatbot_tombstones"
+
+    def __init__(self):
+        self.batch_size = int(os.environ.get("PURGE_BATCH_SIZE", "1000"))
+        self.rate = float(os.environ.get("PURGE_RATE", "5000"))
+        self.lease = timedelta(seconds=int(os.environ.get("PURGE_LEASE", "120")))
+        self.poll_interval = float(os.environ.get("PURGE_POLL_INTERVAL", "30"))
+        self.retention = timedelta(days=int(os.environ.get("PURGE_TOMBSTONE_RETENTION_DAYS", "7")))
+        self.db = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def start(self, db):
+        if self._task is not None:
+            return
+        self.db = db
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._work())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def tombstone(self, db, chatbot_id: str) -> Optional[Dict]:
+        """Replace a chatbot with its tombstone; None if there is no such chatbot"""
+        chatbot = await db.chatbots.find_one({"chatbot_id": chatbot_id})
+        if not chatbot:
+            return None
+        now = datetime.utcnow()
+        # Not claimable until the chatbot is gone: a delete that dies in
+        # between leaves a tombstone the purger drops once the lease runs out
+        tombstone = {
+            "_id": chatbot_id,
+            "chatbot": chatbot,
+            "status": "pending",
+            "deleted_at": now,
+            "updated_at": now,
+            "lease_until": now + self.lease,
+            "total": None,
+            "purged": 0
+        }
+        try:
+            await db[self.COLLECTION].insert_one(tombstone)
+        except DuplicateKeyError:
+            # A previous delete got this far
+            tombstone = await db[self.COLLECTION].find_one({"_id": chatbot_id})
+        result = await db.chatbots.delete_one({"_id": chatbot["_id"]})
+        if result.deleted_count == 0:
+            return None
+        await db[self.COLLECTION].update_one({"_id": chatbot_id}, {"$set": {"lease_until": datetime.utcnow()}})
+        unique_visitors.forget(chatbot_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return tombstone
+
+    async def progress(self, db, chatbot_id: str) -> Optional[Dict]:
+        tombstone = await db[self.COLLECTION].find_one({"_id": chatbot_id}, {"chatbot": 0, "lease_until": 0})
+        if tombstone is None:
+            return None
+        tombstone["chatbot_id"] = tombstone.pop("_id")
+        return tombstone
+
+    async def pending_ids(self, db) -> List[str]:
+        """Chatbots whose conversations may still be in the database"""
+        return await db[self.COLLECTION].distinct("_id", {"status": {"$ne": "done"}})
+
+    async def _work(self):
+        while True:
+            try:
+                tombstone = await self._claim()
+                if tombstone is not None:
+                    await self.purge(tombstone)
+                    continue
+            except PyMongoError as e:
+                logger.warning("Chatbot purge failed: %s", e)
+            except Exception:
+                logger.exception("Chatbot purge crashed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim(self) -> Optional[Dict]:
+        now = datetime.utcnow()
+        return await self.db[self.COLLECTION].find_one_and_update(
+            {"status": {"$ne": "done"}, "lease_until": {"$lte": now}},
+            {"$set": {"status": "purging", "lease_until": now + self.lease, "updated_at": now}},
+            sort=[("lease_until", 1)],
+            projection={"chatbot": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def purge(self, tombstone: Dict):
+        chatbot_id = tombstone["_id"]
+        query = {"chatbot_id": chatbot_id}
+        if await self.db.chatbots.find_one(query, {"_id": 1}):
+            # The delete stopped before removing the chatbot: nothing to purge
+            logger.warning("Chatbot %s still exists; dropping its tombstone", chatbot_id)
+            await self.db[self.COLLECTION].delete_one({"_id": chatbot_id})
+            return
+        if tombstone.get("total") is None:
+            total = await self.db.conversations.count_documents(query, hint=PURGE_INDEX)
+            await self.db[self.COLLECTION].update_one({"_id": chatbot_id}, {"$set": {"total": total}})
+        pause = self.batch_size / self.rate if self.rate > 0 else 0
+
+        while True:
+            started = asyncio.get_running_loop().time()
+            batch = await self.db.conversations.find(query, {"_id": 1}).hint(PURGE_INDEX).limit(
+                self.batch_size
+            ).to_list(self.batch_size)
+            if not batch:
+                break
+            result = await self.db.conversations.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+            now = datetime.utcnow()
+            await self.db[self.COLLECTION].update_one(
+                {"_id": chatbot_id},
+                {
+                    "$inc": {"purged": result.deleted_count},
+                    "$set": {"updated_at": now, "lease_until": now + self.lease}
+                }
+            )
+            metrics.inc("purge_conversations_deleted_total", result.deleted_count)
+            # Rate limit: a batch every batch_size / rate seconds at most
+            elapsed = asyncio.get_running_loop().time() - started
+            if pause > elapsed:
+                await asyncio.sleep(pause - elapsed)
+
+        await self.db[funnel_counters.COLLECTION].delete_one({"_id": chatbot_id})
+        await self.db[stats_series.COLLECTION].delete_many(query)
+        await self.db[webhook_delivery.DEAD_LETTERS].delete_many(query)
+        await self.db[unique_visitors.COLLECTION].delete_many(query)
+        now = datetime.utcnow()
+        await self.db[self.COLLECTION].update_one(
+            {"_id": chatbot_id},
+            {"$set": {"status": "done", "updated_at": now, "expires_at": now + self.retention}}
+        )
+        logger.info("Purged chatbot %s", chatbot_id)
+
+
+chatbot_purger = ChatbotPurger()
@@ -0,0 +1,132 @@
+import base64
+import json
+import re
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+
+from services.schema_store import schema_store
+
+# Fields only used by search; kept out of API responses
+SEARCH_FIELDS = ("search_name", "search_title", "search_grams")
+
+
+def normalize(text: Optional[str]) -> str:
+    """Case- and accent-insensitive form of `text` with collapsed whitespace"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text.casefold()).strip()
+
+
+def grams(text: str) -> Set[str]:
+    """All 1-, 2- and 3-character substrings of normalized `text`"""
+    found = set()
+    for size in (1, 2, 3):
+        for i in range(len(text) - size + 1):
+            found.add(text[i:i + size])
+    return found
+
+
+def query_grams(query: str) -> List[str]:
+    """Grams every match must contain: the query itself if short, else its trigrams"""
+    if len(query) <= 3:
+        return [query]
+    return sorted({query[i:i + 3] for i in range(len(query) - 2)})
+
+
+class ChatbotSearch:
+    """
+    Prefix and substring search over chatbot names and form titles.
+
+    Each chatbot stores its normalized name/title and the set of their 1-3
+    character substrings in `search_grams`. A query matches through a
+    multikey index on (search_grams, search_name, chatbot_id): every gram of
+    the query must be present, then the few candidates whose grams only
+    match across fields are dropped by an exact substring check. Results are
+    ordered by name and paged with an opaque keyset cursor.
+    """
+
+    def fields(self, name: Optional[str], form_title: Optional[str]) -> Dict:
+        """Search fields to `$set` on a chatbot document"""
+        search_name = normalize(name)
+        search_title = normalize(form_title)
+        return {
+            "search_name": search_name,
+            "search_title": search_title,
+            "search_grams": sorted(grams(search_name) | grams(search_title))
+        }
+
+    def encode_cursor(self, doc: Dict) -> str:
+        raw = json.dumps([doc["search_name"], doc["chatbot_id"]]).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    def decode_cursor(self, cursor: str) -> Tuple[str, str]:
+        try:
+            search_name, chatbot_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return str(search_name), str(chatbot_id)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid cursor")
+
+    async def search(self, db, query: str, limit: int, cursor: Optional[str] = None) -> Dict:
+        text = normalize(query)
+        if not text:
+            raise ValueError("Query must not be empty")
+
+        projection = {
+            "_id": 0, "chatbot_id": 1, "name": 1, "form_title": 1, "is_active": 1,
+            "created_at": 1, "search_name": 1, "search_title": 1
+        }
+        after = self.decode_cursor(cursor) if cursor else None
+        results = []
+        # Over-fetch a little so cross-field false positives rarely cost a second round trip
+        batch = limit + max(limit // 4, 5)
+        while len(results) < limit:
+            query_filter = {"search_grams": {"$all": query_grams(text)}}
+            if after:
+                query_filter["$or"] = [
+                    {"search_name": {"$gt": after[0]}},
+                    {"search_name": after[0], "chatbot_id": {"$gt": after[1]}}
+                ]
+            candidates = await db.chatbots.find(query_filter, projection).sort(
+                [("search_name", ASCENDING), ("chatbot_id", ASCENDING)]
+            ).limit(batch).to_list(batch)
+
+            for doc in candidates:
+                after = (doc["search_name"], doc["chatbot_id"])
+                if text in doc["search_name"] or text in doc.get("search_title", ""):
+                    results.append(doc)
+                    if len(results) == limit:
+                        break
+            if len(candidates) < batch:
+                break
+
+        next_cursor = self.encode_cursor(results[-1]) if len(results) == limit else None
+        for doc in results:
+            doc.pop("search_name", None)
+            doc.pop("search_title", None)
+        return {"chatbots": results, "next_cursor": next_cursor}
+
+    async def reindex(self, db, batch_size: int = 500) -> int:
+        """Backfill form titles and search fields for chatbots that predate search"""
+        indexed = 0
+        while True:
+            chatbots = await db.chatbots.find(
+                {"search_grams": {"$exists": False}},
+                {"name": 1, "form_title": 1, "form_schema_ref": 1, "form_schema.title": 1}
+            ).limit(batch_size).to_list(batch_size)
+            if not chatbots:
+                return indexed
+
+            operations = []
+            for bot in chatbots:
+                title = bot.get("form_title") or (await schema_store.resolve(db, bot)).get("title")
+                operations.append(UpdateOne(
+                    {"_id": bot["_id"]},
+                    {"$set": {"form_title": title, **self.fields(bot.get("name"), title)}}
+                ))
+            await db.chatbots.bulk_write(operations, ordered=False)
+            indexed += len(operations)
+
+
+chatbot_search = ChatbotSearch()
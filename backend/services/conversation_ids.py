@@ -0,0 +1,93 @@
+import base64
+import calendar
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationIds:
+    """
+    Signed, self-describing conversation ids.
+
+    Opening a conversation no longer inserts a document: the id handed to the
+    client carries the chatbot id and start time, signed with HMAC-SHA256, so
+    the first answer can create the document without any prior server state:
+
+        conv_<hex12>.<chatbot_id>.<started_at, base36 seconds>.<signature>
+
+    The key is CONVERSATION_SIGNING_KEY; without it, `start` loads a random
+    key generated once and stored in the database, so every worker shares it.
+    """
+
+    COLLECTION = "signing_keys"
+
+    def __init__(self):
+        secret = os.environ.get("CONVERSATION_SIGNING_KEY")
+        self._key: Optional[bytes] = self._derive(secret) if secret else None
+        self.max_age = timedelta(seconds=int(os.environ.get("CONVERSATION_ID_MAX_AGE", str(7 * 24 * 3600))))
+
+    @staticmethod
+    def _derive(secret: str) -> bytes:
+        return hashlib.sha256(secret.encode("utf-8")).digest()
+
+    async def start(self, db):
+        if self._key is not None:
+            return
+        # The first worker to start stores its key; the others read that one
+        stored = await db[self.COLLECTION].find_one_and_update(
+            {"_id": "conversation_ids"},
+            {"$setOnInsert": {"key": secrets.token_hex(32), "created_at": datetime.utcnow()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        logger.info("CONVERSATION_SIGNING_KEY is not set; using the key stored in %s", self.COLLECTION)
+        self._key = self._derive(stored["key"])
+
+    def _sign(self, payload: str) -> str:
+        if self._key is None:
+            raise RuntimeError("No conversation signing key: set CONVERSATION_SIGNING_KEY or call start()")
+        digest = hmac.new(self._key, payload.encode("utf-8"), hashlib.sha256).digest()[:16]
+        return base64.urlsafe_b64encode(digest).decode("ascii").rstrip("=")
+
+    def issue(self, chatbot_id: str, started_at: Optional[datetime] = None) -> str:
+        started_at = started_at or datetime.utcnow()
+        payload = f"conv_{uuid.uuid4().hex[:12]}.{chatbot_id}.{_to_base36(calendar.timegm(started_at.utctimetuple()))}"
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, conversation_id: str) -> Optional[Dict]:
+        """Return {"chatbot_id", "started_at"} for a valid, unexpired id, else None"""
+        parts = conversation_id.split(".")
+        if len(parts) != 4 or not parts[0].startswith("conv_"):
+            return None
+        payload, signature = ".".join(parts[:3]), parts[3]
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        try:
+            started_at = datetime.utcfromtimestamp(int(parts[2], 36))
+        except (ValueError, OverflowError, OSError):
+            return None
+        if datetime.utcnow() - started_at > self.max_age:
+            return None
+        return {"chatbot_id": parts[1], "started_at": started_at}
+
+
+def _to_base36(number: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    encoded = ""
+    while True:
+        number, remainder = divmod(number, 36)
+        encoded = digits[remainder] + encoded
+        if number == 0:
+            return encoded
+
+
+conversation_ids = ConversationIds()
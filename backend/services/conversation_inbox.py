@@ -0,0 +1,91 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import DESCENDING
+
+from services.conversation_responses import answer_key
+
+STATUSES = ("started", "completed")
+
+# What a listing returns per conversation, instead of the whole document
+SUMMARY_PROJECTION = {
+    "_id": 0,
+    "conversation_id": 1,
+    "status": 1,
+    "started_at": 1,
+    "completed_at": 1,
+    "answered": {"$size": {"$ifNull": ["$question_ids", {"$ifNull": ["$responses", []]}]}}
+}
+INBOX_SORT = [("started_at", DESCENDING), ("conversation_id", DESCENDING)]
+
+
+class ConversationInbox:
+    """
+    A chatbot's conversations, newest first, filtered by status, start time
+    and an answer given to a question.
+
+    Every filter combination has an index with `chatbot_id` and the filter
+    field ahead of (started_at, conversation_id), which is also the sort and
+    the keyset cursor, so a page reads only the entries it returns. Answer
+    filters match the multikey `answer_keys` tokens. Conversations that were
+    opened but never answered have no document and are not listed.
+    """
+
+    def encode_cursor(self, doc: Dict) -> str:
+        raw = json.dumps([doc["started_at"].isoformat(), doc["conversation_id"]]).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    def decode_cursor(self, cursor: str) -> Tuple[datetime, str]:
+        try:
+            started_at, conversation_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return datetime.fromisoformat(started_at), str(conversation_id)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid cursor")
+
+    def build_filter(
+        self,
+        chatbot_id: str,
+        status: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        question_id: Optional[str] = None,
+        answer: Any = None,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        query: Dict[str, Any] = {"chatbot_id": chatbot_id}
+        if status is not None:
+            if status not in STATUSES:
+                raise ValueError(f"Invalid status. Use one of: {', '.join(STATUSES)}")
+            query["status"] = status
+        if (question_id is None) != (answer is None):
+            raise ValueError("question_id and answer must be given together")
+        if question_id is not None:
+            query["answer_keys"] = answer_key(question_id, answer)
+
+        started = {}
+        if start is not None:
+            started["$gte"] = start
+        if end is not None:
+            started["$lt"] = end
+        if started:
+            query["started_at"] = started
+        if cursor:
+            after_started, after_id = self.decode_cursor(cursor)
+            query["$or"] = [
+                {"started_at": {"$lt": after_started}},
+                {"started_at": after_started, "conversation_id": {"$lt": after_id}}
+            ]
+        return query
+
+    async def page(self, db, chatbot_id: str, limit: int = 50, cursor: Optional[str] = None, **filters) -> Dict:
+        query = self.build_filter(chatbot_id, cursor=cursor, **filters)
+        conversations = await db.conversations.find(query, SUMMARY_PROJECTION).sort(INBOX_SORT).limit(
+            limit
+        ).to_list(limit)
+        next_cursor = self.encode_cursor(conversations[-1]) if len(conversations) == limit else None
+        return {"conversations": conversations, "next_cursor": next_cursor}
+
+
+conversation_inbox = ConversationInbox()
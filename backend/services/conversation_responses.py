@@ -0,0 +1,130 @@
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Fields of the compact format; `responses` is the legacy one
+COMPACT_FIELDS = ("question_ids", "answers", "answer_keys")
+RESPONSES_PROJECTION = {"responses": 1, "question_ids": 1, "answers": 1}
+
+
+def answer_key(question_id: Any, answer: Any) -> str:
+    """
+    Index token for "question_id was answered `answer`": case- and
+    whitespace-insensitive, hashed so long free-text answers stay small
+    """
+    normalized = str(answer).strip().casefold()
+    return f"{question_id}:{hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()}"
+
+
+def answer_keys(question_ids: Iterable, answers: Iterable) -> List[str]:
+    """One token per answer; each chosen option of a checkbox answer gets its own"""
+    keys = []
+    for question_id, answer in zip(question_ids, answers):
+        for value in answer if isinstance(answer, list) else [answer]:
+            if value is not None and value != "":
+                keys.append(answer_key(question_id, value))
+    return list(dict.fromkeys(keys))
+
+
+class ConversationResponses:
+    """
+    Compact storage of conversation answers.
+
+    Conversations used to store `responses: [{question_id, question, answer}]`,
+    repeating each question's text in every conversation. They now store two
+    parallel arrays, `question_ids` and `answers`, and the question text is
+    looked up in the chatbot's schema when a conversation is read. Documents
+    in the legacy format are still read transparently until migrated.
+    `answer_keys` is a multikey copy of the answers for equality queries.
+    """
+
+    def pack(self, responses: List[Dict]) -> Dict[str, List]:
+        """Compact fields to `$set` for a list of responses"""
+        question_ids = [r.get("question_id") for r in responses]
+        answers = [r.get("answer") for r in responses]
+        return {
+            "question_ids": question_ids,
+            "answers": answers,
+            "answer_keys": answer_keys(question_ids, answers)
+        }
+
+    def unpack(self, conversation: Dict, schema: Optional[Dict] = None) -> List[Dict]:
+        """
+        The responses of a conversation in either format, as {question_id, answer}.
+        With `schema`, each response also gets its `question` text back.
+        """
+        if "question_ids" in conversation:
+            responses = [
+                {"question_id": question_id, "answer": answer}
+                for question_id, answer in zip(conversation["question_ids"], conversation.get("answers") or [])
+            ]
+        else:
+            responses = [dict(r) for r in conversation.get("responses") or []]
+
+        if schema is not None:
+            titles = {str(q.get("id")): q.get("title") for q in schema.get("questions", [])}
+            for response in responses:
+                if "question" not in response:
+                    response["question"] = titles.get(str(response.get("question_id")))
+        return responses
+
+    def to_api(self, conversation: Dict, schema: Optional[Dict]) -> Dict[str, Any]:
+        """A conversation as the read API has always returned it, with `responses`"""
+        responses = self.unpack(conversation, schema)
+        conversation = {k: v for k, v in conversation.items() if k not in COMPACT_FIELDS}
+        conversation["responses"] = responses
+        return conversation
+
+    async def migrate_legacy(self, db, batch_size: int = 500) -> int:
+        """Rewrite legacy `responses` arrays into the compact format, in batches"""
+        migrated = 0
+        while True:
+            conversations = await db.conversations.find(
+                {"responses": {"$exists": True}},
+                {"responses": 1}
+            ).limit(batch_size).to_list(batch_size)
+            if not conversations:
+                return migrated
+
+            # The `responses` guard skips documents an answer converted meanwhile
+            operations = [
+                UpdateOne(
+                    {"_id": conversation["_id"], "responses": {"$exists": True}},
+                    {"$set": self.pack(conversation["responses"] or []), "$unset": {"responses": ""}}
+                )
+                for conversation in conversations
+            ]
+            await db.conversations.bulk_write(operations, ordered=False)
+            migrated += len(operations)
+            logger.info("Compacted responses of %d conversations", migrated)
+
+    async def backfill_answer_keys(self, db, batch_size: int = 500) -> int:
+        """Add `answer_keys` to compact conversations written before answer queries existed"""
+        indexed = 0
+        while True:
+            conversations = await db.conversations.find(
+                {"question_ids": {"$exists": True}, "answer_keys": {"$exists": False}},
+                {"question_ids": 1, "answers": 1}
+            ).limit(batch_size).to_list(batch_size)
+            if not conversations:
+                return indexed
+
+            operations = [
+                UpdateOne(
+                    {"_id": conversation["_id"], "answer_keys": {"$exists": False}},
+                    {"$set": {"answer_keys": answer_keys(
+                        conversation["question_ids"], conversation.get("answers") or []
+                    )}}
+                )
+                for conversation in conversations
+            ]
+            await db.conversations.bulk_write(operations, ordered=False)
+            indexed += len(operations)
+            logger.info("Indexed answers of %d conversations", indexed)
+
+
+conversation_responses = ConversationResponses()
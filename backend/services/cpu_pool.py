@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Tuple
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MODES = ("process", "thread", "inline")
+
+
+class CpuPoolBusyError(Exception):
+    """Raised instead of queueing when the pool's waiting list is full (an API route answers 503)"""
+
+
+def _timed(func: Callable, args: Tuple) -> Tuple[Any, float, float]:
+    """Runs in the worker: the result, when it started (wall clock) and how long it took"""
+    started = time.time()
+    counter = time.perf_counter()
+    result = func(*args)
+    return result, started, time.perf_counter() - counter
+
+
+class CpuPool:
+    """
+    Runs CPU-bound work (form parsing) off the event loop.
+
+    `process` mode uses a pool of spawned worker processes, so concurrent
+    parses use several cores; `thread` mode only keeps the loop responsive;
+    `inline` (and any use before `start`) runs on the caller, as before. At
+    most `max_pending` tasks are handed to the executor at a time; up to
+    `max_waiting` further callers wait for a slot (that wait is part of the
+    reported queue wait), and any more fail fast with `CpuPoolBusyError`.
+    Functions and arguments must be picklable in process mode.
+    """
+
+    def __init__(self):
+        self.mode = os.environ.get("CPU_POOL_MODE", "process")
+        if self.mode not in MODES:
+            raise ValueError(f"CPU_POOL_MODE must be one of: {', '.join(MODES)}")
+        self.workers = int(os.environ.get("CPU_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.max_pending = int(os.environ.get("CPU_POOL_MAX_PENDING", str(self.workers * 4)))
+        self.max_waiting = int(os.environ.get("CPU_POOL_MAX_WAITING", str(self.max_pending)))
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+
+    def _create_executor(self) -> Optional[Executor]:
+        if self.mode == "process":
+            # Spawned, not forked: the parent has an event loop and helper threads
+            return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        if self.mode == "thread":
+            return ThreadPoolExecutor(self.workers, thread_name_prefix="cpu-pool")
+        return None
+
+    async def start(self):
+        if self._slots is not None:
+            return
+        self._executor = self._create_executor()
+        self._slots = asyncio.Semaphore(self.max_pending)
+
+    async def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        self._slots = None
+
+    async def run(self, func: Callable, *args, task: Optional[str] = None) -> Any:
+        """Run `func(*args)` in the pool and return its result"""
+        task = task or getattr(func, "__name__", "task")
+        if self._slots is None or self._executor is None:
+            return func(*args)
+
+        if self._pending >= self.max_pending + self.max_waiting:
+            metrics.inc("cpu_pool_rejected_total", task=task)
+            raise CpuPoolBusyError("Form parsing is at capacity, please retry shortly")
+
+        submitted = time.time()
+        self._pending += 1
+        metrics.set("cpu_pool_pending", self._pending)
+        try:
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                executor = self._executor
+                try:
+                    result, started, seconds = await loop.run_in_executor(executor, _timed, func, args)
+                except BrokenProcessPool:
+                    # A worker died (OOM, signal); replace the pool for the next caller,
+                    # unless another caller of the same broken pool already did
+                    if self._executor is executor:
+                        logger.warning("CPU pool worker died running %s; restarting the pool", task)
+                        self._executor = self._create_executor()
+                        executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+        finally:
+            self._pending -= 1
+            metrics.set("cpu_pool_pending", self._pending)
+
+        metrics.observe("cpu_pool_wait_seconds", max(0.0, started - submitted), task=task)
+        metrics.observe("cpu_pool_run_seconds", seconds, task=task)
+        return result
+
+
+cpu_pool = CpuPool()
@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from models.chatbot import Chatbot, ChatbotCreate, Customization, generate_chatbot_id
+from services.cache_bus import cache_bus
+from services.chatbot_search import chatbot_search
+from services.cpu_pool import CpuPoolBusyError
+from services.funnel import funnel_counters
+from services.schema_store import schema_store
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+class QueueFullError(Exception):
+    """Raised when the creation queue is at capacity"""
+
+
+class ChatbotCreationJobs:
+    """
+    Background chatbot creation, form changes and schema refreshes.
+
+    `submit` records a job document and queues it; a fixed pool of worker
+    tasks claims jobs atomically (pending -> running, with a lease), fetches
+    and parses the form, and only stores the chatbot (or its new form) when
+    parsing succeeds, so no request worker waits on a Google Forms fetch.
+    Job documents are the source of truth for status polling, so any app
+    worker can answer for a job; jobs orphaned by a crashed process are
+    re-queued by a periodic sweep once their lease expires.
+    """
+
+    COLLECTION = "chatbot_jobs"
+
+    def __init__(self):
+        self.workers = int(os.environ.get("CREATION_JOB_WORKERS", "4"))
+        self.max_queue = int(os.environ.get("CREATION_JOB_QUEUE", "100"))
+        self.lease = timedelta(seconds=int(os.environ.get("CREATION_JOB_LEASE", "120")))
+        self.retention = timedelta(seconds=int(os.environ.get("CREATION_JOB_RETENTION", str(24 * 3600))))
+        self.sweep_interval = float(os.environ.get("CREATION_JOB_SWEEP_INTERVAL", "60"))
+        self.db = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._changed: Dict[str, asyncio.Event] = {}
+
+    async def start(self, db):
+        if self._tasks:
+            return
+        self.db = db
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep_forever()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def submit(self, db, request: ChatbotCreate) -> Dict:
+        """Record a creation job and queue it; the chatbot id is allocated up front"""
+        return await self._submit(db, "create", generate_chatbot_id(), request.dict())
+
+    async def submit_form_change(self, db, chatbot_id: str, google_form_url: str) -> Dict:
+        """Queue moving a chatbot to another form; its URL changes once the form parses"""
+        return await self._submit(db, "change_form", chatbot_id, {"google_form_url": google_form_url})
+
+    async def submit_refresh(self, db, chatbot_id: str, google_form_url: str) -> Dict:
+        """Queue re-parsing a chatbot's form for every chatbot built from it"""
+        return await self._submit(db, "refresh_schema", chatbot_id, {"google_form_url": google_form_url})
+
+    async def _submit(self, db, kind: str, chatbot_id: str, request: Dict) -> Dict:
+        if self._queue is None or self._queue.full():
+            raise QueueFullError("Form parsing queue is full, please retry shortly")
+
+        now = datetime.utcnow()
+        job = {
+            "_id": f"job_{uuid.uuid4().hex[:16]}",
+            "kind": kind,
+            "chatbot_id": chatbot_id,
+            "status": "pending",
+            "request": request,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + self.retention
+        }
+        await db[self.COLLECTION].insert_one(job)
+        self._queue.put_nowait(job["_id"])
+        return job
+
+    async def get(self, db, job_id: str) -> Optional[Dict]:
+        return await db[self.COLLECTION].find_one({"_id": job_id})
+
+    async def wait_for_change(self, job_id: str, timeout: float):
+        """
+        Wait until this process moves the job forward, or `timeout` elapses.
+        Jobs run by other processes are only seen by re-reading after the timeout.
+        """
+        event = self._changed.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def forget(self, job_id: str):
+        self._changed.pop(job_id, None)
+
+    def _notify(self, job_id: str):
+        # Wake every current waiter; later waiters get a fresh event
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _set_status(self, job_id: str, status: str, **fields):
+        fields.update({"status": status, "updated_at": datetime.utcnow()})
+        await self.db[self.COLLECTION].update_one({"_id": job_id}, {"$set": fields})
+        self._notify(job_id)
+
+    async def _claim(self, job_id: str) -> Optional[Dict]:
+        now = datetime.utcnow()
+        return await self.db[self.COLLECTION].find_one_and_update(
+            {"_id": job_id, "$or": [
+                {"status": "pending"},
+                {"status": "running", "lease_until": {"$lt": now}}
+            ]},
+            {"$set": {"status": "running", "lease_until": now + self.lease, "updated_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = await self._claim(job_id)
+                if job is not None:
+                    self._notify(job_id)
+                    await self._run(job)
+            except Exception:
+                logger.exception("Chatbot job %s crashed", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Dict):
+        try:
+            parsed = await schema_store.parse_and_store(self.db, job["request"]["google_form_url"])
+        except CpuPoolBusyError:
+            # Not the form's fault: back to pending, for the sweep to queue again
+            logger.info("Chatbot job %s deferred: CPU pool busy", job["_id"])
+            await self._set_status(job["_id"], "pending")
+            return
+        except Exception as e:
+            logger.info("Chatbot job %s failed: %s", job["_id"], e)
+            await self._set_status(job["_id"], "failed", error=f"Could not parse Google Form: {e}")
+            return
+
+        kind = job.get("kind", "create")
+        if kind == "change_form":
+            result = await self._change_form(job, *parsed)
+        elif kind == "refresh_schema":
+            result = await self._refresh_schema(job, *parsed)
+        else:
+            result = await self._create(job, *parsed)
+        await self._set_status(job["_id"], "succeeded", result=result)
+
+    async def _create(self, job: Dict, form_key: str, schema_ref: str, schema: Dict) -> Optional[Dict]:
+        request = ChatbotCreate(**job["request"])
+        chatbot = Chatbot(
+            chatbot_id=job["chatbot_id"],
+            google_form_url=request.google_form_url,
+            name=request.name,
+            customization=request.customization or Customization(),
+            embed_type=request.embed_type,
+            form_title=schema.get("title"),
+            form_key=form_key,
+            form_schema_ref=schema_ref
+        )
+        document = chatbot.dict(exclude={"form_schema"})
+        document.update(chatbot_search.fields(chatbot.name, chatbot.form_title))
+        try:
+            await self.db.chatbots.insert_one(document)
+        except DuplicateKeyError:
+            # A previous attempt at this job got as far as inserting the chatbot
+            logger.info("Chatbot %s of job %s already exists", chatbot.chatbot_id, job["_id"])
+        # Drops a "not found" some public read may have cached for the new id
+        await cache_bus.publish(self.db, chatbot.chatbot_id)
+        await funnel_counters.init_funnel(self.db, chatbot.chatbot_id, schema)
+        return None
+
+    async def _change_form(self, job: Dict, form_key: str, schema_ref: str, schema: Dict) -> Dict:
+        chatbot_id = job["chatbot_id"]
+        chatbot = await self.db.chatbots.find_one({"chatbot_id": chatbot_id}, {"name": 1})
+        if chatbot is not None:
+            title = schema.get("title")
+            await self.db.chatbots.update_one(
+                {"_id": chatbot["_id"]},
+                {
+                    "$set": {
+                        "google_form_url": job["request"]["google_form_url"],
+                        "form_key": form_key, "form_schema_ref": schema_ref, "form_title": title,
+                        "updated_at": datetime.utcnow(), **chatbot_search.fields(chatbot.get("name"), title)
+                    },
+                    "$unset": {"form_schema": ""}
+                }
+            )
+            await funnel_counters.init_funnel(self.db, chatbot_id, schema)
+            await cache_bus.publish(self.db, chatbot_id)
+        return {"form_key": form_key, "form_schema_ref": schema_ref}
+
+    async def _refresh_schema(self, job: Dict, form_key: str, schema_ref: str, schema: Dict) -> Dict:
+        # Every bot on this form (and this one, if it predates form keys) moves to the new schema
+        query = {"$or": [{"form_key": form_key}, {"chatbot_id": job["chatbot_id"]}]}
+        bots = await self.db.chatbots.find(query, {"chatbot_id": 1, "name": 1}).to_list(None)
+        title = schema.get("title")
+        now = datetime.utcnow()
+        if bots:
+            await self.db.chatbots.bulk_write([
+                UpdateOne(
+                    {"_id": bot["_id"]},
+                    {
+                        "$set": {
+                            "form_key": form_key, "form_schema_ref": schema_ref, "form_title": title,
+                            "updated_at": now, **chatbot_search.fields(bot.get("name"), title)
+                        },
+                        "$unset": {"form_schema": ""}
+                    }
+                )
+                for bot in bots
+            ], ordered=False)
+        for bot in bots:
+            await funnel_counters.init_funnel(self.db, bot["chatbot_id"], schema)
+            await cache_bus.publish(self.db, bot["chatbot_id"])
+        return {
+            "form_key": form_key,
+            "form_schema_ref": schema_ref,
+            "updated_chatbots": [bot["chatbot_id"] for bot in bots]
+        }
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.requeue_orphans()
+            except PyMongoError as e:
+                logger.warning("Chatbot creation job sweep failed: %s", e)
+
+    async def requeue_orphans(self):
+        """Queue jobs whose owner died: pending for a whole lease, or running past their lease"""
+        room = self.max_queue - self._queue.qsize()
+        if room <= 0:
+            return
+        now = datetime.utcnow()
+        cursor = self.db[self.COLLECTION].find(
+            {"$or": [
+                {"status": "pending", "created_at": {"$lt": now - self.lease}},
+                {"status": "running", "lease_until": {"$lt": now}}
+            ]},
+            {"_id": 1}
+        ).limit(room)
+        async for job in cursor:
+            try:
+                self._queue.put_nowait(job["_id"])
+            except asyncio.QueueFull:
+                return
+
+
+creation_jobs = ChatbotCreationJobs()
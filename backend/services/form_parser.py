@@ -1,33 +1,32 @@
-import aiohttp
 from bs4 import BeautifulSoup
 import re
 import json
 import logging
 from typing import Dict, List, Optional, Any
 
+from services.cpu_pool import cpu_pool
+from services.http_client import HttpClient, http_client
+
 logger = logging.getLogger(__name__)
 
 class GoogleFormParser:
-    def __init__(self):
-        self.session = None
-
-    async def get_session(self):
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
-        return self.session
-
-    async def close(self):
-        if self.session:
-            await self.session.close()
-            self.session = None
+    def __init__(self, client: Optional[HttpClient] = None):
+        self.client = client or http_client
 
     async def fetch_form_html(self, url: str) -> str:
         """Fetch the HTML content of the Google Form"""
-        session = await self.get_session()
-        async with session.get(url) as response:
-            if response.status != 200:
-                raise Exception(f"Failed to fetch form: {response.status}")
-            return await response.text()
+        response = await self.client.request("GET", url)
+        if response.status != 200:
+            raise Exception(f"Failed to fetch form: {response.status}")
+        return response.text
+
+    async def resolve_redirect(self, url: str) -> str:
+        """Follow a short link (e.g. forms.gle) to the URL it points at"""
+        response = await self.client.request("GET", url, allow_redirects=False)
+        location = response.headers.get("Location")
+        if response.status not in (301, 302, 303, 307, 308) or not location:
+            raise Exception(f"Failed to resolve short link: {response.status}")
+        return location
 
     def parse_public_data(self, html: str) -> Dict[str, Any]:
         """
@@ -105,58 +104,72 @@ class GoogleFormParser:
                 
                 # Extract Options for choice-based questions
                 # Options are usually at item[4][0][1] which is a list of [value, null, null, null]
+                # An option's [2] is the section it jumps to ("go to section based on answer")
+                branches = False
                 if question_type in ["multiple_choice", "dropdown", "checkboxes"]:
                     if len(item) > 4 and item[4] and len(item[4]) > 0 and len(item[4][0]) > 1:
                         raw_options = item[4][0][1]
                         if raw_options:
                             options = [opt[0] for opt in raw_options if opt and len(opt) > 0]
+                            branches = any(opt and len(opt) > 2 and opt[2] is not None for opt in raw_options)
 
                 if entry_id: # Only add if we successfully found an entry ID, otherwise it's likely not a submittable question
-                    questions.append({
+                    question = {
                         "id": str(entry_id),
                         "title": question_title,
                         "description": question_desc,
                         "type": question_type,
                         "options": options,
                         "required": required
-                    })
+                    }
+                    if branches:
+                        question["branches"] = True
+                    questions.append(question)
                     
         except Exception as e:
-            logger.error(f"Error parsing specific question items: {str(e)}")
+            logger.error("Error parsing specific question items: %s", e)
             # Continue with what we have or re-raise depending on strictness
             pass
             
         return questions
 
+    def parse_html(self, html: str) -> Dict[str, Any]:
+        """Build the form schema from the page HTML (CPU-bound; runs in the CPU pool)"""
+        # Using BeautifulSoup just for title/desc if needed, or fallback
+        soup = BeautifulSoup(html, 'html.parser')
+        # Plain text: a NavigableString drags the whole tree along when pickled
+        form_title = soup.title.get_text() if soup.title else "Untitled Form"
+        
+        # Extract raw data
+        raw_data = self.parse_public_data(html)
+        
+        # Extract basic info from raw data if possible, usually at [1][8] or [1][0]
+        # [1][8] is form title, [1][0] is description
+        if len(raw_data) > 1:
+             if len(raw_data[1]) > 8:
+                 form_title = raw_data[1][8] or form_title
+        
+        questions = self._extract_questions(raw_data)
+        
+        return {
+            "title": form_title,
+            "questions": questions,
+            "raw_data_version": "1.0"
+        }
+
     async def parse_form(self, url: str) -> Dict[str, Any]:
         """Main entry point to parse a Google Form"""
         try:
             html = await self.fetch_form_html(url)
-            
-            # Using BeautifulSoup just for title/desc if needed, or fallback
-            soup = BeautifulSoup(html, 'html.parser')
-            form_title = soup.title.string if soup.title else "Untitled Form"
-            
-            # Extract raw data
-            raw_data = self.parse_public_data(html)
-            
-            # Extract basic info from raw data if possible, usually at [1][8] or [1][0]
-            # [1][8] is form title, [1][0] is description
-            if len(raw_data) > 1:
-                 if len(raw_data[1]) > 8:
-                     form_title = raw_data[1][8] or form_title
-            
-            questions = self._extract_questions(raw_data)
-            
-            return {
-                "title": form_title,
-                "questions": questions,
-                "raw_data_version": "1.0"
-            }
+            return await cpu_pool.run(self.parse_html, html, task="parse_form")
             
         except Exception as e:
-            logger.error(f"Failed to parse Google Form: {str(e)}")
+            logger.error("Failed to parse Google Form: %s", e)
             raise e
 
+    def __reduce__(self):
+        # Sent to CPU pool processes without the HTTP client, which stays in this process
+        return (GoogleFormParser, ())
+
 # specific instance to be used
 form_parser = GoogleFormParser()
@@ -0,0 +1,126 @@
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _safe_key(question_id) -> Optional[str]:
+    """Question ids become field names; refuse anything Mongo would read as a path or operator"""
+    key = str(question_id) if question_id is not None else ""
+    if not key or "." in key or key.startswith("$"):
+        return None
+    return key
+
+
+class FunnelCounters:
+    """
+    Per-question reached/answered counters kept in one document per chatbot.
+
+    Every answered turn bumps `answered` for the question just answered and
+    `reached` for the one shown next, in a single upsert, so the whole
+    drop-off curve is read back with one `find_one` and no conversation scan.
+    """
+
+    COLLECTION = "chatbot_funnels"
+
+    def _order(self, schema: Dict) -> List[Dict]:
+        return [
+            {"id": key, "title": q.get("title")}
+            for q in schema.get("questions", [])
+            if (key := _safe_key(q.get("id")))
+        ]
+
+    async def init_funnel(self, db, chatbot_id: str, schema: Dict):
+        """Create (or re-order after a schema change) the funnel document of a chatbot"""
+        await db[self.COLLECTION].update_one(
+            {"_id": chatbot_id},
+            {
+                "$set": {"order": self._order(schema), "updated_at": datetime.utcnow()},
+                "$setOnInsert": {"started": 0, "completed": 0, "questions": {}}
+            },
+            upsert=True
+        )
+
+    async def record_start(self, db, chatbot_id: str, first_question: Optional[Dict]):
+        inc = {"started": 1}
+        key = _safe_key(first_question.get("id")) if first_question else None
+        if key:
+            inc[f"questions.{key}.reached"] = 1
+        await self._inc(db, chatbot_id, inc)
+
+    async def record_answers(
+        self,
+        db,
+        chatbot_id: str,
+        answered_ids: Iterable[str],
+        next_question: Optional[Dict],
+        completed: bool,
+        skipped_to_ids: Iterable[str] = ()
+    ):
+        """
+        Count answered questions and the question shown next. `skipped_to_ids`
+        are questions answered without being shown one at a time (bulk
+        submissions), which are counted as reached as well.
+        """
+        inc = {}
+        for question_id in answered_ids:
+            key = _safe_key(question_id)
+            if key:
+                inc[f"questions.{key}.answered"] = inc.get(f"questions.{key}.answered", 0) + 1
+        for question_id in skipped_to_ids:
+            key = _safe_key(question_id)
+            if key:
+                inc[f"questions.{key}.reached"] = 1
+        if inc and next_question:
+            key = _safe_key(next_question.get("id"))
+            if key:
+                inc[f"questions.{key}.reached"] = 1
+        if completed:
+            inc["completed"] = 1
+        if inc:
+            await self._inc(db, chatbot_id, inc)
+
+    async def _inc(self, db, chatbot_id: str, inc: Dict[str, int]):
+        await db[self.COLLECTION].update_one(
+            {"_id": chatbot_id},
+            {"$inc": inc, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def get_funnel(self, db, chatbot_id: str) -> Optional[Dict]:
+        """None until `init_funnel` has stored the question order"""
+        doc = await db[self.COLLECTION].find_one({"_id": chatbot_id})
+        # A bot created before funnels gets its document, without an order, from its first open
+        if doc is None or "order" not in doc:
+            return None
+        return self.build_curve(doc)
+
+    def build_curve(self, doc: Dict) -> Dict:
+        started = doc.get("started", 0)
+        counters = doc.get("questions", {})
+        steps = []
+        for question in doc.get("order", []):
+            counts = counters.get(question["id"], {})
+            reached = counts.get("reached", 0)
+            answered = counts.get("answered", 0)
+            steps.append({
+                "question_id": question["id"],
+                "question": question.get("title"),
+                "reached": reached,
+                "answered": answered,
+                "drop_off": max(reached - answered, 0),
+                "drop_off_rate": round((reached - answered) / reached * 100, 2) if reached else 0.0,
+                "answered_rate_from_start": round(answered / started * 100, 2) if started else 0.0
+            })
+
+        return {
+            "started": started,
+            "completed": doc.get("completed", 0),
+            "completion_rate": round(doc.get("completed", 0) / started * 100, 2) if started else 0.0,
+            "steps": steps,
+            "updated_at": doc.get("updated_at")
+        }
+
+
+funnel_counters = FunnelCounters()
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from multidict import CIMultiDictProxy
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """Raised without making a request while a host's circuit is open"""
+
+
+class HttpResponse(NamedTuple):
+    status: int
+    headers: CIMultiDictProxy
+    text: str
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failed requests in a row the circuit opens and
+    requests fail fast for `reset_timeout` seconds; then a single trial
+    request is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release(self):
+        """End a trial without an outcome (cancelled, or failed in an unexpected way)"""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class HttpClient:
+    """
+    Shared outbound HTTP client.
+
+    One pooled `aiohttp.ClientSession` per process with per-host connection
+    limits, keep-alive and DNS caching, total/connect/read timeouts, retries
+    with full-jitter exponential backoff and a circuit breaker per host.
+    Opened and closed by the app lifespan; started lazily elsewhere.
+    """
+
+    def __init__(self, resolver: Optional[Callable[[], AbstractResolver]] = None):
+        # Builds the connector's DNS resolver (aiohttp's default if None)
+        self.resolver = resolver
+        self.total_timeout = float(os.environ.get("HTTP_TOTAL_TIMEOUT", "15"))
+        self.connect_timeout = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3"))
+        self.read_timeout = float(os.environ.get("HTTP_READ_TIMEOUT", "8"))
+        self.limit = int(os.environ.get("HTTP_POOL_LIMIT", "100"))
+        self.limit_per_host = int(os.environ.get("HTTP_POOL_LIMIT_PER_HOST", "10"))
+        self.keepalive_timeout = float(os.environ.get("HTTP_KEEPALIVE_TIMEOUT", "30"))
+        self.dns_ttl = int(os.environ.get("HTTP_DNS_CACHE_TTL", "300"))
+        self.retries = int(os.environ.get("HTTP_RETRIES", "2"))
+        self.backoff_base = float(os.environ.get("HTTP_BACKOFF_BASE", "0.2"))
+        self.backoff_max = float(os.environ.get("HTTP_BACKOFF_MAX", "2.0"))
+        self.breaker_failures = int(os.environ.get("HTTP_BREAKER_FAILURES", "5"))
+        self.breaker_reset = float(os.environ.get("HTTP_BREAKER_RESET", "30"))
+        self.user_agent = os.environ.get("HTTP_USER_AGENT", "Mozilla/5.0 (compatible; FobiClone/1.0)")
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._lock:
+            if self.session is None or self.session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    ttl_dns_cache=self.dns_ttl,
+                    keepalive_timeout=self.keepalive_timeout,
+                    resolver=self.resolver() if self.resolver is not None else None
+                )
+                self.session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(
+                        total=self.total_timeout,
+                        connect=self.connect_timeout,
+                        sock_read=self.read_timeout
+                    ),
+                    headers={"User-Agent": self.user_agent}
+                )
+        return self.session
+
+    async def close(self):
+        async with self._lock:
+            if self.session is not None:
+                await self.session.close()
+                self.session = None
+
+    def breaker_for(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+            self._breakers[host] = breaker
+        return breaker
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs) -> HttpResponse:
+        """
+        Send a request and read the body. Connection errors, timeouts and
+        retryable statuses are retried (`retries` times, default HTTP_RETRIES);
+        the last outcome is returned or raised.
+        """
+        retries = self.retries if retries is None else retries
+        session = self.session if self.session is not None and not self.session.closed else await self.start()
+        breaker = self.breaker_for(urlparse(url).netloc)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {urlparse(url).netloc}")
+
+        attempt = 0
+        try:
+            while True:
+                try:
+                    async with session.request(method, url, **kwargs) as response:
+                        result = HttpResponse(response.status, response.headers, await response.text())
+                    if result.status not in RETRY_STATUSES:
+                        breaker.record_success()
+                        return result
+                    if attempt >= retries:
+                        breaker.record_failure()
+                        return result
+                    logger.info("%s %s returned %d, retrying", method, url, result.status)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt >= retries:
+                        breaker.record_failure()
+                        raise
+                    logger.info("%s %s failed (%s), retrying", method, url, e.__class__.__name__)
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+        finally:
+            # A half-open trial that never recorded an outcome must not block the host for good
+            breaker.release()
+
+
+http_client = HttpClient()
@@ -0,0 +1,307 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+# Indexes the query paths depend on, per collection
+INDEXES: Dict[str, List[IndexModel]] = {
+    "chatbots": [
+        # Background creation jobs retry inserts under a pre-allocated id
+        IndexModel([("chatbot_id", ASCENDING)], name="chatbot_id_unique", unique=True),
+        # Schema refresh: every bot built from the same form
+        IndexModel([("form_key", ASCENDING)], name="form_key", sparse=True),
+        # Dashboard list (by is_active or not) and homepage counts, in _id order
+        IndexModel([("is_active", ASCENDING), ("_id", ASCENDING)], name="active_id"),
+        # Dashboard search: multikey gram match, then keyset order by name
+        IndexModel(
+            [("search_grams", ASCENDING), ("search_name", ASCENDING), ("chatbot_id", ASCENDING)],
+            name="search_grams_name"
+        ),
+    ],
+    "conversations": [
+        # Provisional conversations are created by upsert on the first answer
+        IndexModel([("conversation_id", ASCENDING)], name="conversation_id_unique", unique=True),
+        # Analytics: completed conversations of a bot, streamed by completion time
+        IndexModel(
+            [("chatbot_id", ASCENDING), ("status", ASCENDING), ("completed_at", ASCENDING)],
+            name="chatbot_status_completed"
+        ),
+        # Homepage: completed conversations across all chatbots
+        IndexModel([("status", ASCENDING), ("chatbot_id", ASCENDING)], name="status_chatbot"),
+        # Inbox: a chatbot's conversations newest first, alone or by status or by answer (multikey)
+        IndexModel(
+            [("chatbot_id", ASCENDING), ("started_at", DESCENDING), ("conversation_id", DESCENDING)],
+            name="chatbot_started"
+        ),
+        IndexModel(
+            [("chatbot_id", ASCENDING), ("status", ASCENDING), ("started_at", DESCENDING),
+             ("conversation_id", DESCENDING)],
+            name="chatbot_status_started"
+        ),
+        IndexModel(
+            [("chatbot_id", ASCENDING), ("answer_keys", ASCENDING), ("started_at", DESCENDING),
+             ("conversation_id", DESCENDING)],
+            name="chatbot_answer_started"
+        ),
+        # Webhook outbox: due events, and due events of one chatbot for batching
+        IndexModel([("outbox.next_attempt_at", ASCENDING)], name="outbox_due", sparse=True),
+        IndexModel(
+            [("outbox.chatbot_id", ASCENDING), ("outbox.next_attempt_at", ASCENDING)],
+            name="outbox_chatbot_due",
+            sparse=True
+        ),
+    ],
+    "webhook_dead_letters": [
+        IndexModel([("chatbot_id", ASCENDING), ("failed_at", ASCENDING)], name="chatbot_failed"),
+    ],
+    "visitor_sketches": [
+        # Range merges over day sketches, and cleanup on chatbot delete
+        IndexModel([("chatbot_id", ASCENDING), ("kind", ASCENDING), ("day", ASCENDING)], name="chatbot_kind_day"),
+        # Day sketches past retention expire on their own
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0, sparse=True),
+    ],
+    "chatbot_tombstones": [
+        # Purger claims: unfinished tombstones whose lease ran out
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="status_lease"),
+        # Finished purges are kept for a while, then expire
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0, sparse=True),
+    ],
+    "chatbot_jobs": [
+        # Finished and abandoned creation jobs expire on their own
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        # Orphan sweep
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created"),
+    ],
+    "stats_buckets": [
+        # Time-series range reads
+        IndexModel(
+            [("chatbot_id", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)],
+            name="chatbot_granularity_bucket"
+        ),
+        # Compaction sweep over old hourly buckets
+        IndexModel([("granularity", ASCENDING), ("bucket", ASCENDING)], name="granularity_bucket"),
+    ],
+}
+
+
+# Options that make two indexes with the same keys different
+INDEX_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+_SAMPLE_TIME = datetime(2026, 1, 1)
+
+# The filter (and sort) of every query a request or worker runs, with sample values.
+# Each must be answered from an index: see `collscans`.
+QUERY_SHAPES: List[Dict[str, Any]] = [
+    {"name": "chatbot_by_id", "collection": "chatbots", "filter": {"chatbot_id": "bot_sample"}},
+    {"name": "chatbots_by_form", "collection": "chatbots", "filter": {"form_key": "e/sample"}},
+    {"name": "chatbot_list", "collection": "chatbots", "filter": {}, "sort": [("_id", ASCENDING)]},
+    {
+        "name": "chatbot_list_active", "collection": "chatbots",
+        "filter": {"is_active": True}, "sort": [("_id", ASCENDING)]
+    },
+    {
+        "name": "chatbot_search", "collection": "chatbots",
+        "filter": {"search_grams": {"$all": ["sam", "amp"]}},
+        "sort": [("search_name", ASCENDING), ("chatbot_id", ASCENDING)]
+    },
+    {"name": "conversation_by_id", "collection": "conversations", "filter": {"conversation_id": "conv_sample"}},
+    {"name": "conversations_of_chatbot", "collection": "conversations", "filter": {"chatbot_id": "bot_sample"}},
+    {
+        "name": "conversations_by_status", "collection": "conversations",
+        "filter": {"chatbot_id": "bot_sample", "status": "completed"}
+    },
+    {
+        "name": "completed_conversations", "collection": "conversations",
+        "filter": {"status": "completed", "chatbot_id": {"$nin": ["bot_deleted"]}}
+    },
+    {
+        "name": "completed_since", "collection": "conversations",
+        "filter": {"chatbot_id": "bot_sample", "status": "completed", "completed_at": {"$gte": _SAMPLE_TIME}},
+        "sort": [("completed_at", ASCENDING)]
+    },
+    {
+        "name": "inbox", "collection": "conversations",
+        "filter": {"chatbot_id": "bot_sample"},
+        "sort": [("started_at", DESCENDING), ("conversation_id", DESCENDING)]
+    },
+    {
+        "name": "inbox_by_status", "collection": "conversations",
+        "filter": {"chatbot_id": "bot_sample", "status": "started"},
+        "sort": [("started_at", DESCENDING), ("conversation_id", DESCENDING)]
+    },
+    {
+        "name": "inbox_by_answer", "collection": "conversations",
+        "filter": {"chatbot_id": "bot_sample", "answer_keys": "q1:0011223344556677"},
+        "sort": [("started_at", DESCENDING), ("conversation_id", DESCENDING)]
+    },
+    {
+        "name": "outbox_due", "collection": "conversations",
+        "filter": {"outbox.next_attempt_at": {"$lte": _SAMPLE_TIME}},
+        "sort": [("outbox.next_attempt_at", ASCENDING)]
+    },
+    {
+        "name": "outbox_chatbot_due", "collection": "conversations",
+        "filter": {"outbox.chatbot_id": "bot_sample", "outbox.next_attempt_at": {"$lte": _SAMPLE_TIME}},
+        "sort": [("outbox.next_attempt_at", ASCENDING)]
+    },
+    {
+        "name": "dead_letters", "collection": "webhook_dead_letters",
+        "filter": {"chatbot_id": "bot_sample"}, "sort": [("failed_at", DESCENDING)]
+    },
+    {
+        "name": "unique_visitor_days", "collection": "visitor_sketches",
+        "filter": {"chatbot_id": "bot_sample", "kind": "visitors", "day": {"$ne": None, "$gte": _SAMPLE_TIME}}
+    },
+    {
+        "name": "purge_claim", "collection": "chatbot_tombstones",
+        "filter": {"status": {"$ne": "done"}, "lease_until": {"$lte": _SAMPLE_TIME}},
+        "sort": [("lease_until", ASCENDING)]
+    },
+    {
+        "name": "creation_job_orphans", "collection": "chatbot_jobs",
+        "filter": {"$or": [
+            {"status": "pending", "created_at": {"$lt": _SAMPLE_TIME}},
+            {"status": "running", "lease_until": {"$lt": _SAMPLE_TIME}}
+        ]}
+    },
+    {
+        "name": "stats_series", "collection": "stats_buckets",
+        "filter": {
+            "chatbot_id": "bot_sample", "granularity": {"$in": ["hour", "day"]},
+            "bucket": {"$gte": _SAMPLE_TIME, "$lt": datetime(2026, 2, 1)}
+        }
+    },
+    {
+        "name": "stats_compaction", "collection": "stats_buckets",
+        "filter": {"granularity": "hour", "bucket": {"$lt": _SAMPLE_TIME}}
+    },
+]
+
+
+def _declared(model: IndexModel) -> Tuple[List[Tuple[str, Any]], Dict[str, Any]]:
+    document = model.document
+    return list(document["key"].items()), {k: document[k] for k in INDEX_OPTIONS if k in document}
+
+
+def _existing(info: Dict[str, Any]) -> Tuple[List[Tuple[str, Any]], Dict[str, Any]]:
+    # The server reports numeric options back as floats (e.g. expireAfterSeconds: 0.0)
+    key = [(field, int(direction) if isinstance(direction, float) else direction) for field, direction in info["key"]]
+    options = {k: info[k] for k in INDEX_OPTIONS if k in info and info[k] is not False}
+    if "expireAfterSeconds" in options:
+        options["expireAfterSeconds"] = int(options["expireAfterSeconds"])
+    return key, options
+
+
+def diff_indexes(collection: str, existing: Dict[str, Dict]) -> Dict[str, List[str]]:
+    """
+    Compare the declared indexes of `collection` with `index_information()`:
+    names to create, names that exist with other keys or options, and
+    undeclared names (left alone).
+    """
+    declared = {model.document["name"]: model for model in INDEXES.get(collection, [])}
+    plan: Dict[str, List[str]] = {"missing": [], "conflicting": [], "extra": []}
+    for name, model in declared.items():
+        if name not in existing:
+            plan["missing"].append(name)
+        elif _declared(model) != _existing(existing[name]):
+            plan["conflicting"].append(name)
+    plan["extra"] = [name for name in existing if name not in declared and name != "_id_"]
+    return plan
+
+
+async def index_plan(db) -> Dict[str, Dict[str, List[str]]]:
+    """`diff_indexes` for every collection with declared indexes"""
+    return {
+        collection: diff_indexes(collection, await db[collection].index_information())
+        for collection in INDEXES
+    }
+
+
+async def ensure_indexes(db, rebuild: bool = False) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Create missing declared indexes; existing ones are left as they are.
+    An index whose declaration changed is only dropped and recreated with
+    `rebuild` (a build on a large collection is not something to do on
+    every startup); otherwise it is reported and skipped.
+    """
+    plan = await index_plan(db)
+    for collection, changes in plan.items():
+        models = {model.document["name"]: model for model in INDEXES[collection]}
+        to_create = [models[name] for name in changes["missing"]]
+        for name in changes["conflicting"]:
+            if rebuild:
+                await db[collection].drop_index(name)
+                to_create.append(models[name])
+            else:
+                logger.warning("Index %s.%s differs from its declaration; run manage.py ensure-indexes --rebuild",
+                               collection, name)
+        if to_create:
+            names = await db[collection].create_indexes(to_create)
+            logger.info("Created indexes on %s: %s", collection, ", ".join(names))
+    return plan
+
+
+def plan_stages(explain: Dict) -> List[str]:
+    """Every stage of the winning plan of an `explain()` result"""
+    planner = explain.get("queryPlanner", {})
+    winning = planner.get("winningPlan", {})
+    # Plans run by the slot-based engine nest the classic tree under `queryPlan`
+    stack = [winning.get("queryPlan", winning)]
+    stages = []
+    while stack:
+        node = stack.pop()
+        if "stage" in node:
+            stages.append(node["stage"])
+        for child in ("inputStage", "outerStage", "innerStage"):
+            if child in node:
+                stack.append(node[child])
+        stack.extend(node.get("inputStages", []))
+    return stages
+
+
+async def explain_shape(db, shape: Dict) -> List[str]:
+    cursor = db[shape["collection"]].find(shape["filter"])
+    if shape.get("sort"):
+        cursor = cursor.sort(shape["sort"])
+    return plan_stages(await cursor.explain())
+
+
+async def collscans(db) -> Dict[str, List[str]]:
+    """Query shapes whose winning plan scans a whole collection, with their stages"""
+    failing = {}
+    for shape in QUERY_SHAPES:
+        stages = await explain_shape(db, shape)
+        if "COLLSCAN" in stages:
+            failing[shape["name"]] = stages
+    return failing
+
+
+def leading_index(collection: str, fields: List[str]) -> Optional[str]:
+    """A declared index of `collection` that starts with one of `fields`"""
+    if "_id" in fields:
+        return "_id_"
+    for model in INDEXES.get(collection, []):
+        if next(iter(model.document["key"])) in fields:
+            return model.document["name"]
+    return None
+
+
+def unindexed_shapes() -> List[str]:
+    """
+    Query shapes with no declared index to start from: a check that needs no
+    server, the minimum for `collscans` to pass. Every `$or` branch needs its
+    own index; a filterless shape needs one on its sort.
+    """
+    unindexed = []
+    for shape in QUERY_SHAPES:
+        query = shape["filter"]
+        branches = query["$or"] if "$or" in query else [query]
+        for branch in branches:
+            fields = list(branch) or [field for field, _ in shape.get("sort") or []]
+            if leading_index(shape["collection"], fields) is None:
+                unindexed.append(shape["name"])
+                break
+    return unindexed
@@ -0,0 +1,53 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.responses import Response
+
+
+class JsonBytes(bytes):
+    """Already-encoded JSON, spliced into a response as-is"""
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return str(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+
+# Same output as FastAPI's JSONResponse after jsonable_encoder, minus the encoder's
+# recursive copy of every document: ObjectIds as strings, datetimes as ISO 8601
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_default)
+
+
+def dumps(value: Any, **spliced: JsonBytes) -> JsonBytes:
+    """
+    Encode a Mongo document (or any JSON-like value). Keyword arguments are
+    pre-encoded JSON values added as extra fields of the top-level object.
+    """
+    encoded = _encoder.encode(value).encode("utf-8")
+    if spliced:
+        parts = [encoded[:-1]]
+        for name, field in spliced.items():
+            if len(parts) > 1 or encoded != b"{}":
+                parts.append(b",")
+            parts += [_encoder.encode(name).encode("utf-8"), b":", field]
+        parts.append(b"}")
+        encoded = b"".join(parts)
+    return JsonBytes(encoded)
+
+
+def json_response(status_code: int = 200, **fields: Any) -> Response:
+    """A JSON object response; JsonBytes field values are written without re-encoding"""
+    plain = {k: v for k, v in fields.items() if not isinstance(v, JsonBytes)}
+    spliced = {k: v for k, v in fields.items() if isinstance(v, JsonBytes)}
+    return Response(content=dumps(plain, **spliced), status_code=status_code, media_type="application/json")
@@ -0,0 +1,162 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from services.metrics import metrics
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "suppressed"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, extras and traceback"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through `burst` records per (logger, message template) every `window`
+    seconds at `level` and above; the rest are dropped and counted, and the
+    next record let through for that key carries the count as `suppressed`.
+    Runs on the caller's thread, so it only does a dict lookup.
+    """
+
+    def __init__(self, burst: int = 20, window: float = 60.0, level: int = logging.WARNING, max_keys: int = 10000):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.level = level
+        self.max_keys = max_keys
+        # key -> [window start, records let through, records dropped]
+        self._windows: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.level:
+            return True
+        key = (record.name, record.levelno, record.msg if isinstance(record.msg, str) else type(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                if state is None and len(self._windows) >= self.max_keys:
+                    self._windows.clear()
+                suppressed = state[2] if state else 0
+                self._windows[key] = [now, 1, 0]
+            elif state[1] < self.burst:
+                state[1] += 1
+                suppressed = 0
+            else:
+                state[2] += 1
+                metrics.inc("log_records_sampled_out_total")
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread untouched. The stock handler formats
+    the message and traceback on the calling thread first; that is the work
+    this pipeline moves off the event loop. A full queue drops the record
+    instead of blocking.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("log_records_dropped_total")
+
+
+class LogPipeline:
+    """
+    Queue-based logging for the app.
+
+    Every logger's records go through a sampling filter into a bounded
+    in-memory queue; a `QueueListener` thread formats them (JSON by default)
+    and writes them to stderr. Uvicorn's own loggers are routed through the
+    same queue.
+    """
+
+    def __init__(self):
+        self.level = os.environ.get("LOG_LEVEL", "INFO").upper()
+        self.format = os.environ.get("LOG_FORMAT", "json")
+        self.queue_size = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+        self.sample_burst = int(os.environ.get("LOG_SAMPLE_BURST", "20"))
+        self.sample_window = float(os.environ.get("LOG_SAMPLE_WINDOW", "60"))
+        self.sample_level = os.environ.get("LOG_SAMPLE_LEVEL", "WARNING").upper()
+        self._listener: Optional[logging.handlers.QueueListener] = None
+
+    def formatter(self) -> logging.Formatter:
+        if self.format == "text":
+            return logging.Formatter(TEXT_FORMAT)
+        return JsonFormatter()
+
+    def configure(self, stream=None):
+        """Replace the root logger's handlers with the queue and start the listener thread"""
+        if self._listener is not None:
+            return
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(self.formatter())
+
+        records = queue.Queue(self.queue_size)
+        handler = NonBlockingQueueHandler(records)
+        handler.addFilter(SamplingFilter(
+            self.sample_burst,
+            self.sample_window,
+            logging.getLevelName(self.sample_level)
+        ))
+
+        root = logging.getLogger()
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(self.level)
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            uvicorn_logger = logging.getLogger(name)
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+
+        self._listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        self._listener.start()
+
+    def stop(self):
+        """Write out what is queued and stop the listener thread"""
+        if self._listener is None:
+            return
+        self._listener.stop()
+        self._listener = None
+
+
+log_pipeline = LogPipeline()
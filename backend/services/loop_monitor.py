@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """
+    Event-loop lag monitor and blocking-call detector.
+
+    A task on the loop sleeps `interval` seconds at a time and records how
+    late it woke up as `event_loop_lag_seconds`. A watchdog thread checks the
+    task's heartbeat; once it is older than `stall_threshold`, the loop is
+    stuck in synchronous code, and the watchdog captures the loop thread's
+    current stack, logs it and keeps it in `recent_stalls` (one capture per
+    stall). With `debug`, asyncio's debug mode also logs every callback
+    slower than the threshold with where it was scheduled from.
+    """
+
+    def __init__(self):
+        self.interval = float(os.environ.get("LOOP_MONITOR_INTERVAL", "0.1"))
+        self.stall_threshold = float(os.environ.get("LOOP_STALL_THRESHOLD", "0.25"))
+        self.debug = os.environ.get("LOOP_DEBUG", "").lower() in ("1", "true", "yes")
+        self.recent_stalls = deque(maxlen=int(os.environ.get("LOOP_STALL_HISTORY", "20")))
+        self._heartbeat = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        if self.debug:
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.stall_threshold
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._watchdog.join(timeout=self.interval * 2)
+        self._watchdog = None
+
+    async def _measure(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._heartbeat = time.monotonic()
+            metrics.observe("event_loop_lag_seconds", lag)
+            metrics.set("event_loop_lag_seconds_last", round(lag, 6))
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stopping.wait(self.interval):
+            beat = self._heartbeat
+            stalled_for = time.monotonic() - beat
+            # A heartbeat we already reported means we are still in the same stall
+            if stalled_for < self.stall_threshold + self.interval or beat == reported_beat:
+                continue
+            reported_beat = beat
+            self.capture_stall(stalled_for)
+
+    def capture_stall(self, stalled_for: float) -> Optional[Dict]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        stack = traceback.format_stack(frame)
+        stall = {
+            "detected_at": datetime.utcnow(),
+            "stalled_for_seconds": round(stalled_for, 3),
+            "stack": [line.rstrip() for line in stack]
+        }
+        self.recent_stalls.append(stall)
+        metrics.inc("event_loop_stalls_total")
+        logger.warning(
+            "Event loop blocked for %.3fs, currently at:\n%s",
+            stalled_for,
+            "".join(stack[-8:]).rstrip()
+        )
+        return stall
+
+    def stalls(self) -> List[Dict]:
+        return list(reversed(self.recent_stalls))
+
+
+loop_monitor = LoopMonitor()
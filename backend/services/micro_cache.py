@@ -0,0 +1,142 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from services.cache_bus import cache_bus, ALL_KEYS
+from services.json_bytes import dumps
+from services.metrics import metrics
+
+
+def encoded_size(value: Any) -> int:
+    """Bytes a cached value accounts for: its length if already encoded, else its JSON"""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    return len(dumps(value))
+
+
+class MicroCache:
+    """
+    Short-lived cache for hot public reads, keyed by chatbot id.
+
+    Entries live `ttl` seconds and the cache holds at most `max_bytes` of
+    values, evicting least recently used entries first. Concurrent misses for
+    one key share a single load (the first caller's loader runs as its own
+    task, so a caller disconnecting does not cancel it for the others).
+    Loader errors are not cached; `None` results ("not found") are.
+
+    Chatbot writes evict through `cache_bus`. A load that was already running
+    when its key was evicted still answers its callers but is not stored.
+    Hit, miss and coalesced counts are in `micro_cache_requests_total`.
+    """
+
+    def __init__(self, name: str, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.name = name
+        self.ttl = ttl if ttl is not None else float(os.environ.get("MICRO_CACHE_TTL", "2.0"))
+        self.max_bytes = max_bytes or int(os.environ.get("MICRO_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        # key -> (expires_at, value, size)
+        self._entries: "OrderedDict[str, Tuple[float, Any, int]]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Task] = {}
+        cache_bus.subscribe(self.invalidate)
+
+    def invalidate(self, key: Optional[str]):
+        # Loads already running are forgotten: they still answer their callers,
+        # but later callers start a fresh load
+        if key is ALL_KEYS:
+            self._entries.clear()
+            self._loading.clear()
+            self.bytes = 0
+        else:
+            self._drop(key)
+            self._loading.pop(key, None)
+        self._report_size()
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._count("hit")
+                return entry[1]
+            self._drop(key)
+
+        task = self._loading.get(key)
+        if task is not None:
+            self._count("coalesced")
+        else:
+            self._count("miss")
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._loading[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+        finally:
+            # Not registered any more if the key was evicted while loading
+            current = self._loading.get(key) is asyncio.current_task()
+            if current:
+                del self._loading[key]
+        if current:
+            self._store(key, value)
+        return value
+
+    def _store(self, key: str, value: Any):
+        size = encoded_size(value) + len(key)
+        if size > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+        self._report_size()
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def _count(self, result: str):
+        if result == "hit":
+            self.hits += 1
+        elif result == "miss":
+            self.misses += 1
+        else:
+            self.coalesced += 1
+        metrics.inc("micro_cache_requests_total", cache=self.name, result=result)
+
+    def _report_size(self):
+        metrics.set("micro_cache_bytes", self.bytes, cache=self.name)
+        metrics.set("micro_cache_entries", len(self._entries), cache=self.name)
+
+    def stats(self) -> Dict:
+        requests = self.hits + self.misses + self.coalesced
+        return {
+            "name": self.name,
+            "ttl_seconds": self.ttl,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "requests": requests,
+            "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+            "coalesce_rate": round(self.coalesced / requests, 4) if requests else 0.0,
+            # Share of requests that did not reach Mongo
+            "offload_rate": round((self.hits + self.coalesced) / requests, 4) if requests else 0.0
+        }
+
+
+# GET /api/chatbots/{id}, as the encoded response body
+chatbot_response_cache = MicroCache("chatbot_response")
+# The schema reference POST /api/conversations starts a conversation from
+chatbot_start_cache = MicroCache("chatbot_start")
+
+MICRO_CACHES = (chatbot_response_cache, chatbot_start_cache)
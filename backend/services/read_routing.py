@@ -0,0 +1,76 @@
+import logging
+import os
+from typing import Dict
+
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+
+logger = logging.getLogger(__name__)
+
+# Query classes and their default read preference. The conversation path
+# reads what it has just written, so it stays on the primary.
+DEFAULT_MODES = {
+    "conversation": "primary",
+    "list": "secondaryPreferred",
+    "stats": "secondaryPreferred",
+    "analytics": "secondaryPreferred",
+    "export": "secondaryPreferred",
+}
+
+# Smallest bound the server accepts (heartbeat interval + idle write period)
+MIN_MAX_STALENESS_SECONDS = 90
+
+
+class ReadRouting:
+    """
+    Per-query-class read preferences.
+
+    Each class reads through a view of the database with its own read
+    preference, configured by `READ_PREFERENCE_<CLASS>` (a MongoDB mode name)
+    and `READ_MAX_STALENESS_<CLASS>` (seconds, falling back to
+    `READ_MAX_STALENESS_SECONDS`). Secondary reads are bounded by
+    maxStalenessSeconds; `describe` reports the bound a response was read with.
+    """
+
+    def __init__(self):
+        default_staleness = int(os.environ.get("READ_MAX_STALENESS_SECONDS", "90"))
+        self.preferences = {}
+        self.staleness: Dict[str, int] = {}
+        for query_class, default_mode in DEFAULT_MODES.items():
+            mode = os.environ.get(f"READ_PREFERENCE_{query_class.upper()}", default_mode)
+            staleness = int(os.environ.get(f"READ_MAX_STALENESS_{query_class.upper()}", str(default_staleness)))
+            self.preferences[query_class], self.staleness[query_class] = self._preference(mode, staleness)
+        self._views = {}
+
+    def _preference(self, mode: str, staleness: int):
+        mode_id = read_pref_mode_from_name(mode)
+        if mode == "primary":
+            return make_read_preference(mode_id, None), 0
+        if staleness <= 0:
+            # No bound; reported as -1 like the driver does
+            return make_read_preference(mode_id, None), -1
+        if staleness < MIN_MAX_STALENESS_SECONDS:
+            logger.warning(
+                "maxStalenessSeconds %d is below the server minimum, using %d",
+                staleness, MIN_MAX_STALENESS_SECONDS
+            )
+            staleness = MIN_MAX_STALENESS_SECONDS
+        return make_read_preference(mode_id, None, staleness), staleness
+
+    def db(self, db, query_class: str):
+        """`db` with the read preference of `query_class`"""
+        key = (id(db), query_class)
+        view = self._views.get(key)
+        if view is None:
+            view = db.with_options(read_preference=self.preferences[query_class])
+            self._views[key] = view
+        return view
+
+    def describe(self, query_class: str) -> Dict:
+        """The read preference and the staleness (seconds) tolerated by `query_class`"""
+        return {
+            "read_preference": self.preferences[query_class].mongos_mode,
+            "max_staleness_seconds": self.staleness[query_class]
+        }
+
+
+read_routing = ReadRouting()
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from pymongo import UpdateOne
+
+from services.form_parser import form_parser
+from services.json_bytes import JsonBytes, dumps
+
+logger = logging.getLogger(__name__)
+
+# /forms/d/e/<published id>/viewform, /forms/d/<edit id>/edit, optionally behind /u/<n>/
+FORM_PATH_PATTERN = re.compile(r'^/forms(?:/u/\d+)?/d/(e/)?([A-Za-z0-9_-]+)')
+
+
+def schema_hash(schema: Dict) -> str:
+    """Stable content hash of a parsed form schema"""
+    payload = json.dumps(schema, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def form_key_from_url(url: str) -> Optional[str]:
+    """Canonical form id ("e/<id>" or "d/<id>") of a docs.google.com form URL"""
+    parsed = urlparse(url)
+    if parsed.netloc != "docs.google.com":
+        return None
+    match = FORM_PATH_PATTERN.match(parsed.path)
+    if not match:
+        return None
+    return f"{'e' if match.group(1) else 'd'}/{match.group(2)}"
+
+
+def form_url_from_key(form_key: str) -> str:
+    return f"https://docs.google.com/forms/d/{form_key[2:] if form_key.startswith('d/') else form_key}/viewform"
+
+
+class FormSchemaStore:
+    """
+    Parsed form schemas stored once per content hash.
+
+    Chatbots reference a schema through `form_schema_ref` and share it with
+    every other bot built from the same canonical form (`form_key`). Stored
+    schemas never change, so they are cached in-process without invalidation,
+    both decoded and as the JSON the read endpoints send.
+    Bots created before the store existed still embed `form_schema` and are
+    served from it until `migrate_embedded` moves them over.
+    """
+
+    COLLECTION = "form_schemas"
+
+    def __init__(self, max_cached: Optional[int] = None):
+        self.max_cached = max_cached or int(os.environ.get("FORM_SCHEMA_CACHE_SIZE", "1024"))
+        self._schemas: "OrderedDict[str, Dict]" = OrderedDict()
+        self._schema_json: "OrderedDict[str, JsonBytes]" = OrderedDict()
+        self._short_links: "OrderedDict[str, str]" = OrderedDict()
+
+    def _remember(self, cache: OrderedDict, key: str, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_cached:
+            cache.popitem(last=False)
+
+    async def canonicalize(self, url: str) -> Tuple[str, str]:
+        """
+        Resolve a form URL (including forms.gle short links) to its canonical
+        form key and the URL to fetch it from.
+        """
+        if urlparse(url).netloc == "forms.gle":
+            resolved = self._short_links.get(url)
+            if resolved is None:
+                resolved = await form_parser.resolve_redirect(url)
+                self._remember(self._short_links, url, resolved)
+            url = resolved
+
+        form_key = form_key_from_url(url)
+        if form_key is None:
+            # Unknown layout: fall back to the URL itself, minus query string
+            parsed = urlparse(url)
+            return f"url:{parsed.netloc}{parsed.path}", url
+        return form_key, form_url_from_key(form_key)
+
+    async def put(self, db, form_key: str, schema: Dict) -> str:
+        """Store `schema` if it is new and return its content hash"""
+        ref = schema_hash(schema)
+        if ref not in self._schemas:
+            await db[self.COLLECTION].update_one(
+                {"_id": ref},
+                {"$setOnInsert": {"form_key": form_key, "schema": schema, "created_at": datetime.utcnow()}},
+                upsert=True
+            )
+            self._remember(self._schemas, ref, schema)
+        return ref
+
+    async def get(self, db, ref: str) -> Dict:
+        schema = self._schemas.get(ref)
+        if schema is not None:
+            self._schemas.move_to_end(ref)
+            return schema
+        doc = await db[self.COLLECTION].find_one({"_id": ref}, {"schema": 1})
+        schema = doc["schema"] if doc else {}
+        if doc:
+            self._remember(self._schemas, ref, schema)
+        return schema
+
+    async def get_json(self, db, ref: str) -> JsonBytes:
+        """The stored schema `ref`, encoded as JSON once and reused"""
+        encoded = self._schema_json.get(ref)
+        if encoded is not None:
+            self._schema_json.move_to_end(ref)
+            return encoded
+        encoded = dumps(await self.get(db, ref))
+        self._remember(self._schema_json, ref, encoded)
+        return encoded
+
+    async def resolve_json(self, db, chatbot: Dict) -> JsonBytes:
+        """`resolve`, as JSON"""
+        ref = chatbot.get("form_schema_ref")
+        if ref:
+            return await self.get_json(db, ref)
+        return dumps(chatbot.get("form_schema", {}))
+
+    async def resolve(self, db, chatbot: Dict) -> Dict:
+        """The form schema of a chatbot document, shared or legacy embedded"""
+        ref = chatbot.get("form_schema_ref")
+        if ref:
+            return await self.get(db, ref)
+        return chatbot.get("form_schema", {})
+
+    async def parse_and_store(self, db, url: str) -> Tuple[str, str, Dict]:
+        """Canonicalize `url`, parse the form and store it. Returns (form_key, ref, schema)"""
+        form_key, fetch_url = await self.canonicalize(url)
+        schema = await form_parser.parse_form(fetch_url)
+        ref = await self.put(db, form_key, schema)
+        return form_key, ref, schema
+
+    async def migrate_embedded(self, db, batch_size: int = 500) -> int:
+        """Move embedded `form_schema` copies into the store, in batches"""
+        migrated = 0
+        query = {"form_schema": {"$exists": True}, "form_schema_ref": {"$exists": False}}
+        while True:
+            chatbots = await db.chatbots.find(
+                query,
+                {"chatbot_id": 1, "google_form_url": 1, "form_schema": 1}
+            ).limit(batch_size).to_list(batch_size)
+            if not chatbots:
+                return migrated
+
+            operations = []
+            for chatbot in chatbots:
+                try:
+                    form_key, _ = await self.canonicalize(chatbot["google_form_url"])
+                except Exception as e:
+                    logger.warning("Could not canonicalize %s: %s", chatbot["google_form_url"], e)
+                    form_key = f"url:{chatbot['google_form_url']}"
+                ref = await self.put(db, form_key, chatbot.get("form_schema") or {})
+                operations.append(UpdateOne(
+                    {"_id": chatbot["_id"]},
+                    {"$set": {"form_key": form_key, "form_schema_ref": ref}, "$unset": {"form_schema": ""}}
+                ))
+
+            await db.chatbots.bulk_write(operations, ordered=False)
+            migrated += len(operations)
+            logger.info("Migrated %d chatbots to the shared schema store", migrated)
+
+
+schema_store = FormSchemaStore()
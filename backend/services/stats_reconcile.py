@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from services.stats_series import stats_series
+
+logger = logging.getLogger(__name__)
+
+# Denormalized counters under `stats` on each chatbot
+COUNTERS = ("total_views", "total_conversations", "completion_rate")
+# Largest corrections listed in a report
+REPORT_TOP = 20
+# Counters corrected by compare-and-set; views are only raised, with `$max`
+COMPARED = ("total_conversations", "completion_rate")
+
+
+class StatsReconciler:
+    """
+    Recomputes every chatbot's `stats` counters from the source data.
+
+    Completions come from a `$group` pass over conversations. Views cannot:
+    an unanswered conversation never gets a document, so they come from the
+    time-series buckets instead for chatbots created after the first bucket
+    was recorded; older chatbots keep their counter, raised to at least the
+    number of conversation documents.
+
+    Chatbots are read in chunks, and a chunk's source data is aggregated only
+    after its stored counters were read, so anything counted meanwhile is in
+    the expected values too. Completion counters are corrected with
+    compare-and-set `bulk_write`s on the values read, so one that moved is
+    left for the next run. Views are only ever raised (`$max`, which keeps
+    opens counted meanwhile): an open bumps the counter before its bucket, so
+    a lower expected value can be a request still in flight.
+    """
+
+    def __init__(self):
+        self.interval = float(os.environ.get("STATS_RECONCILE_INTERVAL", "0"))
+        self._task: Optional[asyncio.Task] = None
+
+    async def _conversation_counts(self, db, chatbot_ids: List[str]) -> Dict[str, Dict]:
+        counts = {}
+        pipeline = [
+            {"$match": {"chatbot_id": {"$in": chatbot_ids}}},
+            {"$group": {
+                "_id": "$chatbot_id",
+                "conversations": {"$sum": 1},
+                "completed": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}}
+            }}
+        ]
+        async for row in db.conversations.aggregate(pipeline, allowDiskUse=True):
+            counts[row["_id"]] = row
+        return counts
+
+    async def _bucket_views(self, db, chatbot_ids: List[str]) -> Dict[str, Dict]:
+        views = {}
+        pipeline = [
+            {"$match": {"chatbot_id": {"$in": chatbot_ids}}},
+            {"$group": {"_id": "$chatbot_id", "views": {"$sum": "$counts.views"}}}
+        ]
+        async for row in db[stats_series.COLLECTION].aggregate(pipeline, allowDiskUse=True):
+            views[row["_id"]] = row
+        return views
+
+    async def _series_since(self, db) -> Optional[datetime]:
+        """When the first bucket was recorded; older buckets may have been compacted into days"""
+        firsts = []
+        for granularity in ("hour", "day"):
+            first = await db[stats_series.COLLECTION].find_one(
+                {"granularity": granularity}, {"bucket": 1}, sort=[("bucket", 1)]
+            )
+            if first:
+                firsts.append(first["bucket"])
+        return min(firsts, default=None)
+
+    def expected_stats(
+        self,
+        chatbot: Dict,
+        counts: Optional[Dict],
+        bucket_views: Optional[Dict],
+        series_since: Optional[datetime]
+    ) -> Dict:
+        stored = chatbot.get("stats") or {}
+        conversations = counts["conversations"] if counts else 0
+        completed = counts["completed"] if counts else 0
+        created_at = chatbot.get("created_at")
+        if series_since and created_at and created_at >= series_since:
+            # Every view of this chatbot went into a bucket
+            views = bucket_views["views"] if bucket_views else 0
+        else:
+            views = stored.get("total_views", 0)
+        # Never lowered: opens in flight have bumped the counter but not their bucket yet
+        views = max(views, conversations, stored.get("total_views", 0))
+        return {
+            "total_views": views,
+            "total_conversations": completed,
+            "completion_rate": round(completed / views * 100, 2) if views else 0.0
+        }
+
+    async def reconcile(self, db, batch_size: int = 500, dry_run: bool = False) -> Dict:
+        """Correct every chatbot's counters; returns how far each one had drifted"""
+        started = datetime.utcnow()
+        series_since = await self._series_since(db)
+
+        drift = {name: {"chatbots": 0, "total": 0, "max": 0} for name in COUNTERS}
+        corrections: List[Dict] = []
+        chatbots: List[Dict] = []
+        report = {"chatbots": 0, "corrected": 0, "skipped": 0}
+
+        async def correct():
+            if not chatbots:
+                return
+            # Aggregated after the counters below were read
+            ids = [chatbot["chatbot_id"] for chatbot in chatbots]
+            counts = await self._conversation_counts(db, ids)
+            bucket_views = await self._bucket_views(db, ids)
+            operations: List[UpdateOne] = []
+            for chatbot in chatbots:
+                stored = chatbot.get("stats") or {}
+                expected = self.expected_stats(
+                    chatbot,
+                    counts.get(chatbot["chatbot_id"]),
+                    bucket_views.get(chatbot["chatbot_id"]),
+                    series_since
+                )
+                changed = {}
+                for name in COUNTERS:
+                    delta = round(expected[name] - stored.get(name, 0), 2)
+                    if delta:
+                        changed[name] = delta
+                        drift[name]["chatbots"] += 1
+                        drift[name]["total"] = round(drift[name]["total"] + abs(delta), 2)
+                        drift[name]["max"] = max(drift[name]["max"], abs(delta))
+                if not changed:
+                    continue
+
+                report["corrected"] += 1
+                corrections.append({"chatbot_id": chatbot["chatbot_id"], "drift": changed})
+                # Only overwrite the values we read; live increments in between win
+                operations.append(UpdateOne(
+                    {
+                        "_id": chatbot["_id"],
+                        **{f"stats.{name}": stored.get(name, {"$exists": False}) for name in COMPARED}
+                    },
+                    {
+                        "$set": {f"stats.{name}": expected[name] for name in COMPARED},
+                        "$max": {"stats.total_views": expected["total_views"]}
+                    }
+                ))
+            if operations and not dry_run:
+                result = await db.chatbots.bulk_write(operations, ordered=False)
+                report["skipped"] += len(operations) - result.matched_count
+            chatbots.clear()
+
+        async for chatbot in db.chatbots.find({}, {"chatbot_id": 1, "stats": 1, "created_at": 1}):
+            report["chatbots"] += 1
+            chatbots.append(chatbot)
+            if len(chatbots) >= batch_size:
+                await correct()
+        await correct()
+
+        corrections.sort(key=lambda c: max(abs(v) for v in c["drift"].values()), reverse=True)
+        report.update({
+            "dry_run": dry_run,
+            "drift": drift,
+            "largest": corrections[:REPORT_TOP],
+            "seconds": round((datetime.utcnow() - started).total_seconds(), 3)
+        })
+        return report
+
+    async def start(self, db):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._reconcile_forever(db))
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _reconcile_forever(self, db):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                report = await self.reconcile(db)
+                logger.info(
+                    "Stats reconciliation corrected %d of %d chatbots (%d skipped)",
+                    report["corrected"], report["chatbots"], report["skipped"]
+                )
+            except PyMongoError as e:
+                logger.warning("Stats reconciliation failed: %s", e)
+
+
+stats_reconciler = StatsReconciler()
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("views", "answers", "completions")
+GRANULARITIES = ("hour", "day", "week")
+
+
+def naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """Stored times are naive UTC; convert an aware query parameter to match"""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Truncate `moment` to the start of its hour, day or (Monday-based) week"""
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def _hour_sum(hours: str, name: str) -> Dict:
+    """Expression summing counter `name` over an array of {id, counts} hours"""
+    return {"$sum": {"$map": {"input": hours, "in": {"$ifNull": [f"$$this.counts.{name}", 0]}}}}
+
+
+def bucket_step(granularity: str) -> timedelta:
+    return {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}[granularity]
+
+
+class StatsSeries:
+    """
+    Time-bucketed counters per chatbot.
+
+    The write path upserts one document per chatbot per hour. A compaction
+    pass folds hourly buckets older than the retention window into one
+    document per day and drops them, so a range query reads a handful of
+    documents from the (chatbot_id, granularity, bucket) index and weekly
+    points are summed from the day buckets at read time.
+
+    One process compacts at a time (under a lease), and a day bucket lists
+    the hours folded into it, so re-running a pass that died between the
+    merge and the delete adds nothing twice.
+    """
+
+    COLLECTION = "stats_buckets"
+    LEASES = "stats_compaction_lease"
+
+    def __init__(self):
+        self.hourly_retention = timedelta(days=int(os.environ.get("STATS_HOURLY_RETENTION_DAYS", "7")))
+        self.compact_interval = float(os.environ.get("STATS_COMPACT_INTERVAL", "3600"))
+        self.max_points = int(os.environ.get("STATS_SERIES_MAX_POINTS", "2000"))
+        self.compact_lease = timedelta(seconds=int(os.environ.get("STATS_COMPACT_LEASE", "600")))
+        self._owner = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+
+    def _bucket_id(self, chatbot_id: str, granularity: str, bucket: datetime) -> str:
+        return f"{chatbot_id}:{granularity}:{bucket.strftime('%Y%m%d%H')}"
+
+    async def record(self, db, chatbot_id: str, at: Optional[datetime] = None, **counts: int):
+        """Add `counts` (views=1, answers=3, ...) to the hourly bucket containing `at`"""
+        inc = {f"counts.{name}": value for name, value in counts.items() if value}
+        if not inc:
+            return
+        bucket = bucket_start(at or datetime.utcnow(), "hour")
+        await db[self.COLLECTION].update_one(
+            {"_id": self._bucket_id(chatbot_id, "hour", bucket)},
+            {
+                "$inc": inc,
+                "$setOnInsert": {"chatbot_id": chatbot_id, "granularity": "hour", "bucket": bucket}
+            },
+            upsert=True
+        )
+
+    async def get_series(
+        self,
+        db,
+        chatbot_id: str,
+        granularity: str,
+        start: datetime,
+        end: datetime
+    ) -> List[Dict]:
+        """Return one point per bucket in [start, end), zero-filled"""
+        start, end = bucket_start(naive_utc(start), granularity), naive_utc(end)
+        step = bucket_step(granularity)
+        if (end - start) / step > self.max_points:
+            raise ValueError(f"Range too large: at most {self.max_points} {granularity} buckets")
+
+        # Hourly points only come from hourly buckets; coarser points also read compacted days
+        sources = ["hour"] if granularity == "hour" else ["hour", "day"]
+        cursor = db[self.COLLECTION].find(
+            {"chatbot_id": chatbot_id, "granularity": {"$in": sources}, "bucket": {"$gte": start, "$lt": end}},
+            {"bucket": 1, "counts": 1}
+        )
+
+        totals: Dict[datetime, Dict[str, int]] = {}
+        async for doc in cursor:
+            point = totals.setdefault(bucket_start(doc["bucket"], granularity), dict.fromkeys(COUNTERS, 0))
+            for name, value in doc.get("counts", {}).items():
+                point[name] = point.get(name, 0) + value
+
+        series = []
+        moment = start
+        while moment < end:
+            series.append({"bucket": moment, **totals.get(moment, dict.fromkeys(COUNTERS, 0))})
+            moment += step
+        return series
+
+    async def acquire_lease(self, db, now: datetime) -> bool:
+        """Take the compaction lease unless another process holds an unexpired one"""
+        try:
+            await db[self.LEASES].find_one_and_update(
+                {"_id": "compaction", "lease_until": {"$lte": now}},
+                {"$set": {"lease_until": now + self.compact_lease, "owner": self._owner}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The document exists with a lease in the future
+            return False
+        return True
+
+    async def release_lease(self, db):
+        await db[self.LEASES].update_one(
+            {"_id": "compaction", "owner": self._owner},
+            {"$set": {"lease_until": datetime.utcnow()}}
+        )
+
+    def merge_pipeline(self, match: Dict) -> List[Dict]:
+        """
+        Group old hourly buckets into day buckets. Each day bucket keeps the
+        hours it was built from in `hours`; merging into an existing one only
+        adds hours it does not list yet, so the merge is idempotent.
+        """
+        return [
+            {"$match": match},
+            {"$group": {
+                "_id": {"chatbot_id": "$chatbot_id", "day": {"$dateFromParts": {
+                    "year": {"$year": "$bucket"}, "month": {"$month": "$bucket"}, "day": {"$dayOfMonth": "$bucket"}
+                }}},
+                "hours": {"$push": {"id": "$_id", "counts": "$counts"}}
+            }},
+            {"$project": {
+                "_id": {"$concat": [
+                    "$_id.chatbot_id", ":day:", {"$dateToString": {"date": "$_id.day", "format": "%Y%m%d00"}}
+                ]},
+                "chatbot_id": "$_id.chatbot_id",
+                "granularity": "day",
+                "bucket": "$_id.day",
+                "hours": 1,
+                "counts": {name: _hour_sum("$hours", name) for name in COUNTERS}
+            }},
+            {"$merge": {
+                "into": self.COLLECTION,
+                "on": "_id",
+                "whenMatched": [
+                    {"$set": {"_unmerged": {"$filter": {
+                        "input": "$$new.hours",
+                        "cond": {"$not": [{"$in": ["$$this.id", {"$ifNull": ["$hours.id", []]}]}]}
+                    }}}},
+                    {"$set": {
+                        **{
+                            f"counts.{name}": {"$add": [
+                                {"$ifNull": [f"$counts.{name}", 0]}, _hour_sum("$_unmerged", name)
+                            ]}
+                            for name in COUNTERS
+                        },
+                        "hours": {"$concatArrays": [{"$ifNull": ["$hours", []]}, "$_unmerged"]}
+                    }},
+                    {"$unset": "_unmerged"}
+                ],
+                "whenNotMatched": "insert"
+            }}
+        ]
+
+    async def compact(self, db, now: Optional[datetime] = None) -> int:
+        """Roll hourly buckets older than the retention window up into day buckets"""
+        now = now or datetime.utcnow()
+        cutoff = bucket_start(now - self.hourly_retention, "day")
+        match = {"granularity": "hour", "bucket": {"$lt": cutoff}}
+
+        if not await db[self.COLLECTION].find_one(match, {"_id": 1}):
+            return 0
+        if not await self.acquire_lease(db, now):
+            return 0
+
+        try:
+            await db[self.COLLECTION].aggregate(self.merge_pipeline(match)).to_list(None)
+            result = await db[self.COLLECTION].delete_many(match)
+        finally:
+            await self.release_lease(db)
+        logger.info("Compacted %d hourly stats buckets older than %s", result.deleted_count, cutoff)
+        return result.deleted_count
+
+    async def start(self, db):
+        if self._task is None:
+            self._task = asyncio.create_task(self._compact_forever(db))
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _compact_forever(self, db):
+        while True:
+            try:
+                await self.compact(db)
+            except PyMongoError as e:
+                logger.warning("Stats bucket compaction failed: %s", e)
+            await asyncio.sleep(self.compact_interval)
+
+
+stats_series = StatsSeries()
@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from bson.binary import Binary
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# 2^12 one-byte registers: 4 KB per sketch, ~1.6% standard error. Sketches only
+# merge with sketches of the same precision, so this is not configurable.
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+KINDS = ("visitors", "completers")
+# user_data fields that identify a visitor across devices, most specific first
+VISITOR_ID_FIELDS = ("visitor_id", "user_id", "email")
+
+# Reverse proxies in front of the app, each appending the address it received
+# the request from to X-Forwarded-For. With none the header is ignored.
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXY_COUNT", "0"))
+
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+_RANK_BITS = 64 - PRECISION
+_RANK_MASK = (1 << _RANK_BITS) - 1
+
+
+def client_address(request, trusted_proxies: int = TRUSTED_PROXIES) -> str:
+    """
+    The visitor's address: the X-Forwarded-For hop our outermost proxy
+    appended, else the peer. Earlier hops are whatever the client sent.
+    """
+    peer = request.client.host if request.client else ""
+    if trusted_proxies <= 0:
+        return peer
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    return hops[-trusted_proxies] if len(hops) >= trusted_proxies else peer
+
+
+def visitor_fingerprint(user_data: Optional[Dict], request=None) -> Optional[int]:
+    """
+    64-bit visitor hash: an id from `user_data` if there is one, else client
+    address, user agent and language from the request. Only the hash is kept.
+    """
+    for field in VISITOR_ID_FIELDS:
+        value = (user_data or {}).get(field)
+        if value not in (None, ""):
+            material = f"id:{str(value).strip().lower()}"
+            break
+    else:
+        if request is None:
+            return None
+        address = client_address(request)
+        if not address:
+            return None
+        material = "req:" + "|".join((
+            address,
+            request.headers.get("user-agent", ""),
+            request.headers.get("accept-language", "")
+        ))
+    return int.from_bytes(hashlib.blake2b(material.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def register_update(fingerprint: int) -> Tuple[int, int]:
+    """(register index, rank) for one hashed visitor"""
+    rest = fingerprint & _RANK_MASK
+    return fingerprint >> _RANK_BITS, _RANK_BITS - rest.bit_length() + 1
+
+
+def estimate(registers: np.ndarray) -> float:
+    """HyperLogLog cardinality estimate, with linear counting for small sets"""
+    raw = _ALPHA * REGISTERS * REGISTERS / float(np.sum(np.ldexp(1.0, -registers.astype(np.int32))))
+    zeros = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * REGISTERS and zeros:
+        return REGISTERS * math.log(REGISTERS / zeros)
+    return raw
+
+
+class UniqueVisitors:
+    """
+    Unique visitors and completers per chatbot, as HyperLogLog sketches.
+
+    Each process folds fingerprints into in-memory registers and periodically
+    merges them (register-wise max) into one all-time sketch and one sketch
+    per day for each chatbot and kind. A merge is a compare-and-swap on the
+    sketch's version, so any number of workers can flush into the same
+    sketch, and a date range is answered by merging its day sketches.
+    """
+
+    COLLECTION = "visitor_sketches"
+
+    def __init__(self):
+        self.flush_interval = float(os.environ.get("UNIQUE_VISITORS_FLUSH_INTERVAL", "10"))
+        self.day_retention = timedelta(days=int(os.environ.get("UNIQUE_VISITORS_DAY_RETENTION_DAYS", "90")))
+        self.merge_attempts = 5
+        self._pending: Dict[Tuple[str, str, Optional[datetime]], np.ndarray] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _sketch_id(self, chatbot_id: str, kind: str, day: Optional[datetime]) -> str:
+        if day is None:
+            return f"{chatbot_id}:{kind}"
+        return f"{chatbot_id}:{kind}:{day.strftime('%Y%m%d')}"
+
+    def add(self, chatbot_id: str, kind: str, fingerprint: Optional[int], at: Optional[datetime] = None):
+        """Count a visitor (kind="visitors") or a visitor who completed (kind="completers")"""
+        if fingerprint is None:
+            return
+        index, rank = register_update(fingerprint)
+        day = (at or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+        for key in ((chatbot_id, kind, None), (chatbot_id, kind, day)):
+            registers = self._pending.get(key)
+            if registers is None:
+                registers = self._pending[key] = np.zeros(REGISTERS, dtype=np.uint8)
+            if rank > registers[index]:
+                registers[index] = rank
+
+    async def flush(self, db):
+        """Merge this process's registers into the stored sketches"""
+        pending, self._pending = self._pending, {}
+        for key, registers in pending.items():
+            try:
+                merged = await self._merge(db, key, registers)
+            except PyMongoError as e:
+                logger.warning("Visitor sketch flush failed: %s", e)
+                merged = False
+            if not merged:
+                # Keep it for the next flush
+                current = self._pending.get(key)
+                self._pending[key] = registers if current is None else np.maximum(current, registers)
+
+    async def _merge(self, db, key, registers: np.ndarray) -> bool:
+        chatbot_id, kind, day = key
+        sketch_id = self._sketch_id(chatbot_id, kind, day)
+        for _ in range(self.merge_attempts):
+            now = datetime.utcnow()
+            stored = await db[self.COLLECTION].find_one({"_id": sketch_id}, {"registers": 1, "version": 1})
+            if stored is None:
+                doc = {
+                    "_id": sketch_id,
+                    "chatbot_id": chatbot_id,
+                    "kind": kind,
+                    "day": day,
+                    "registers": Binary(registers.tobytes()),
+                    "version": 1,
+                    "updated_at": now
+                }
+                if day is not None:
+                    doc["expires_at"] = day + self.day_retention
+                try:
+                    await db[self.COLLECTION].insert_one(doc)
+                    return True
+                except DuplicateKeyError:
+                    continue
+            current = np.frombuffer(stored["registers"], dtype=np.uint8)
+            merged = np.maximum(current, registers)
+            if np.array_equal(merged, current):
+                return True
+            result = await db[self.COLLECTION].update_one(
+                {"_id": sketch_id, "version": stored["version"]},
+                {"$set": {"registers": Binary(merged.tobytes()), "updated_at": now}, "$inc": {"version": 1}}
+            )
+            if result.modified_count:
+                return True
+        logger.warning("Visitor sketch %s kept changing under us; retrying next flush", sketch_id)
+        return False
+
+    async def count(
+        self,
+        db,
+        chatbot_id: str,
+        kind: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> int:
+        """Estimated distinct fingerprints, all time or over the days in [start, end)"""
+        registers = np.zeros(REGISTERS, dtype=np.uint8)
+        all_time = start is None and end is None
+        first_day = start.replace(hour=0, minute=0, second=0, microsecond=0) if start is not None else None
+        if all_time:
+            query = {"_id": self._sketch_id(chatbot_id, kind, None)}
+        else:
+            day_range = {"$ne": None}
+            if first_day is not None:
+                day_range["$gte"] = first_day
+            if end is not None:
+                day_range["$lt"] = end
+            query = {"chatbot_id": chatbot_id, "kind": kind, "day": day_range}
+        async for doc in db[self.COLLECTION].find(query, {"registers": 1}):
+            np.maximum(registers, np.frombuffer(doc["registers"], dtype=np.uint8), out=registers)
+
+        # Plus what this process has not flushed yet
+        for (pending_bot, pending_kind, day), pending in self._pending.items():
+            if pending_bot != chatbot_id or pending_kind != kind:
+                continue
+            if all_time:
+                in_range = day is None
+            else:
+                in_range = day is not None and (first_day is None or day >= first_day) and (end is None or day < end)
+            if in_range:
+                np.maximum(registers, pending, out=registers)
+        if not registers.any():
+            return 0
+        return int(round(estimate(registers)))
+
+    async def summary(
+        self,
+        db,
+        chatbot_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Dict:
+        visitors = await self.count(db, chatbot_id, "visitors", start, end)
+        completers = await self.count(db, chatbot_id, "completers", start, end)
+        return {
+            "unique_visitors": visitors,
+            "unique_completers": completers,
+            # Both sides are estimates; keep the ratio in range
+            "unique_completion_rate": round(min(100.0, completers / visitors * 100), 2) if visitors else 0
+        }
+
+    def forget(self, chatbot_id: str):
+        """Drop unflushed registers of a deleted chatbot"""
+        for key in [key for key in self._pending if key[0] == chatbot_id]:
+            del self._pending[key]
+
+    async def start(self, db):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_forever(db))
+
+    async def stop(self, db=None):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if db is not None:
+            await self.flush(db)
+
+    async def _flush_forever(self, db):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush(db)
+
+
+unique_visitors = UniqueVisitors()
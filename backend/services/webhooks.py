@@ -0,0 +1,404 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import logging
+import os
+import random
+import secrets
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from services.conversation_responses import conversation_responses, RESPONSES_PROJECTION
+from services.http_client import CircuitOpenError, HttpClient, http_client
+from services.json_bytes import dumps
+from services.metrics import metrics
+from services.schema_store import schema_store
+
+logger = logging.getLogger(__name__)
+
+EVENT_CONVERSATION_COMPLETED = "conversation.completed"
+SIGNATURE_HEADER = "X-Fobi-Signature"
+
+# What a delivery needs from a conversation with a pending event
+PAYLOAD_PROJECTION = {
+    "conversation_id": 1, "chatbot_id": 1, "started_at": 1, "completed_at": 1,
+    "user_data": 1, "outbox": 1, **RESPONSES_PROJECTION
+}
+
+
+def generate_secret() -> str:
+    return f"whsec_{secrets.token_hex(24)}"
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    """Signature header value: HMAC-SHA256 over "<timestamp>.<body>" """
+    digest = hmac.new(secret.encode("utf-8"), f"{timestamp}.".encode("ascii") + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(secret: str, header: str, body: bytes, tolerance: int = 300) -> bool:
+    """Check a signature header the way a receiver should, rejecting stale timestamps"""
+    try:
+        fields = dict(part.split("=", 1) for part in header.split(","))
+        timestamp = int(fields["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), f"t={timestamp},v1={fields.get('v1', '')}")
+
+
+class WebhookUrlError(ValueError):
+    """A webhook URL the server must not send to"""
+
+
+def is_public_address(address: str) -> bool:
+    """False for loopback, private, link-local (cloud metadata), shared, reserved and multicast addresses"""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def check_webhook_url(url: str, allow_private: bool = False):
+    """
+    Raise WebhookUrlError unless `url` is an absolute http(s) URL whose host
+    only resolves to public addresses, so customers cannot make the server
+    POST conversation data to its own network. Resolution failures raise
+    OSError (temporary for a delivery, a bad URL when saving).
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise WebhookUrlError("Webhook URLs must be absolute http(s) URLs")
+    try:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError:
+        raise WebhookUrlError("Invalid webhook port")
+    if allow_private:
+        return
+    infos = await asyncio.get_running_loop().getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)
+    for *_, sockaddr in infos:
+        if not is_public_address(sockaddr[0]):
+            raise WebhookUrlError(f"Webhook host {parsed.hostname} resolves to a non-public address")
+
+
+class PublicResolver(AbstractResolver):
+    """
+    DNS resolver for webhook connections that refuses non-public addresses.
+    The addresses checked are the ones connected to, so a host re-resolving
+    to an internal address after `check_webhook_url` cannot be reached.
+    """
+
+    def __init__(self):
+        self._resolver = DefaultResolver()
+
+    async def resolve(self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET):
+        hosts = await self._resolver.resolve(host, port, family=family)
+        for resolved in hosts:
+            if not is_public_address(resolved["host"]):
+                raise WebhookUrlError(f"Webhook host {host} resolves to a non-public address")
+        return hosts
+
+    async def close(self):
+        await self._resolver.close()
+
+
+class WebhookDelivery:
+    """
+    Customer webhooks for completed conversations.
+
+    Completing a conversation writes an `outbox` entry into the conversation
+    document in the same update as the status change, so an event exists if
+    and only if the completion was stored. Worker tasks claim due entries
+    (moving `outbox.next_attempt_at` forward by a lease), group them per
+    chatbot into batches, POST them signed with the chatbot's secret, and
+    remove the entry on a 2xx. Failures are retried with exponential backoff
+    and jitter; after `max_attempts` the event moves to a dead-letter
+    collection. Delivery is at-least-once: receivers dedupe on event id.
+
+    Requests go through a client of their own that only connects to public
+    addresses and never follows redirects; a 3xx is a failed attempt.
+    """
+
+    DEAD_LETTERS = "webhook_dead_letters"
+
+    def __init__(self, client: Optional[HttpClient] = None):
+        self.workers = int(os.environ.get("WEBHOOK_WORKERS", "4"))
+        self.batch_size = int(os.environ.get("WEBHOOK_BATCH_SIZE", "20"))
+        self.max_attempts = int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", "8"))
+        self.backoff_base = float(os.environ.get("WEBHOOK_BACKOFF_BASE", "10"))
+        self.backoff_max = float(os.environ.get("WEBHOOK_BACKOFF_MAX", "3600"))
+        self.lease = timedelta(seconds=int(os.environ.get("WEBHOOK_LEASE", "60")))
+        self.poll_interval = float(os.environ.get("WEBHOOK_POLL_INTERVAL", "2"))
+        # Only for development against a receiver on the local network
+        self.allow_private = os.environ.get("WEBHOOK_ALLOW_PRIVATE_URLS", "").lower() in ("1", "true", "yes")
+        self._own_client = client is None and not self.allow_private
+        self.client = client or (HttpClient(resolver=PublicResolver) if self._own_client else http_client)
+        self.db = None
+        self._tasks = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def start(self, db):
+        if self._tasks:
+            return
+        self.db = db
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self._own_client:
+            await self.client.close()
+
+    def outbox_entry(self, chatbot_id: str, webhook: Optional[Dict]) -> Optional[Dict]:
+        """The outbox entry to store with a completion, or None if the chatbot has no webhook"""
+        if not webhook or not webhook.get("enabled"):
+            return None
+        now = datetime.utcnow()
+        return {
+            "event_id": f"evt_{uuid.uuid4().hex}",
+            "type": EVENT_CONVERSATION_COMPLETED,
+            "chatbot_id": chatbot_id,
+            "created_at": now,
+            "next_attempt_at": now,
+            "attempts": 0
+        }
+
+    def notify(self):
+        """Wake idle workers after an event was written in this process"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _work(self):
+        while True:
+            try:
+                handled = await self.run_once()
+            except PyMongoError as e:
+                logger.warning("Webhook delivery failed to read the outbox: %s", e)
+                handled = 0
+            except Exception:
+                logger.exception("Webhook delivery crashed")
+                handled = 0
+            if not handled:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def _claim(self, query: Dict, now: datetime) -> Optional[Dict]:
+        return await self.db.conversations.find_one_and_update(
+            {**query, "outbox.next_attempt_at": {"$lte": now}},
+            {"$set": {"outbox.next_attempt_at": now + self.lease}},
+            sort=[("outbox.next_attempt_at", 1)],
+            projection=PAYLOAD_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def run_once(self) -> int:
+        """Claim and deliver one batch of due events; returns how many were handled"""
+        now = datetime.utcnow()
+        first = await self._claim({}, now)
+        if first is None:
+            return 0
+        batch = [first]
+        while len(batch) < self.batch_size:
+            doc = await self._claim({"outbox.chatbot_id": first["outbox"]["chatbot_id"]}, now)
+            if doc is None:
+                break
+            batch.append(doc)
+        await self.deliver(batch)
+        return len(batch)
+
+    async def deliver(self, batch: List[Dict]):
+        chatbot_id = batch[0]["outbox"]["chatbot_id"]
+        chatbot = await self.db.chatbots.find_one(
+            {"chatbot_id": chatbot_id},
+            {"webhook": 1, "form_schema": 1, "form_schema_ref": 1}
+        )
+        if chatbot is None:
+            # Deleted: nobody to tell, and its conversations are about to be purged
+            await self.db.conversations.update_many(
+                {"_id": {"$in": [doc["_id"] for doc in batch]}},
+                {"$unset": {"outbox": ""}}
+            )
+            return
+        webhook = chatbot.get("webhook") or {}
+        if not webhook.get("enabled") or not webhook.get("url"):
+            await self._dead_letter(batch, webhook.get("url"), "Webhook no longer configured")
+            return
+
+        try:
+            body = self.build_body(batch, await schema_store.resolve(self.db, chatbot))
+            error = await self.send(webhook["url"], webhook["secret"], body)
+        except Exception as e:
+            # Anything else still counts as a failed attempt, or the event would be
+            # re-claimed every lease without ever reaching the dead letters
+            logger.exception("Webhook delivery to %s crashed", webhook["url"])
+            error = f"{e.__class__.__name__}: {e}"
+        if error is None:
+            await self._delivered(batch)
+        else:
+            logger.info("Webhook delivery of %d events to %s failed: %s", len(batch), webhook["url"], error)
+            await self._failed(batch, webhook["url"], error)
+
+    def build_body(self, batch: List[Dict], schema: Dict) -> bytes:
+        return dumps({"events": [self.event_payload(doc, schema) for doc in batch]})
+
+    def event_payload(self, conversation: Dict, schema: Dict) -> Dict:
+        outbox = conversation["outbox"]
+        return {
+            "id": outbox["event_id"],
+            "type": outbox["type"],
+            "created_at": outbox["created_at"],
+            "data": {
+                "chatbot_id": conversation["chatbot_id"],
+                "conversation_id": conversation["conversation_id"],
+                "started_at": conversation.get("started_at"),
+                "completed_at": conversation.get("completed_at"),
+                "user_data": conversation.get("user_data") or {},
+                "responses": conversation_responses.unpack(conversation, schema)
+            }
+        }
+
+    async def send(self, url: str, secret: str, body: bytes) -> Optional[str]:
+        """POST a signed batch once; None on a 2xx, else why it failed"""
+        headers = {"Content-Type": "application/json", SIGNATURE_HEADER: sign(secret, int(time.time()), body)}
+        started = time.monotonic()
+        try:
+            # Checked again on every send: the host may resolve elsewhere since it was saved
+            await check_webhook_url(url, self.allow_private)
+            response = await self.client.request(
+                "POST", url, retries=0, allow_redirects=False, data=body, headers=headers
+            )
+            if 200 <= response.status < 300:
+                error = None
+            elif 300 <= response.status < 400:
+                error = f"HTTP {response.status} (redirects are not followed)"
+            else:
+                error = f"HTTP {response.status}"
+        except (CircuitOpenError, WebhookUrlError) as e:
+            error = str(e)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = str(e) or e.__class__.__name__
+        except OSError as e:
+            # Only the check resolves outside aiohttp (whose OS errors are ClientErrors)
+            error = f"Could not resolve webhook host: {e}"
+        except Exception as e:
+            logger.exception("Unexpected error sending a webhook to %s", url)
+            error = f"{e.__class__.__name__}: {e}"
+        metrics.observe("webhook_request_seconds", time.monotonic() - started)
+        metrics.inc("webhook_requests_total", outcome="success" if error is None else "failure")
+        return error
+
+    def retry_delay(self, attempts: int) -> float:
+        """Seconds before the next try after `attempts` failed ones: exponential, jittered"""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return random.uniform(delay / 2, delay)
+
+    async def _delivered(self, batch: List[Dict]):
+        now = datetime.utcnow()
+        await self.db.conversations.update_many(
+            {"_id": {"$in": [doc["_id"] for doc in batch]}},
+            {"$unset": {"outbox": ""}}
+        )
+        metrics.inc("webhook_events_delivered_total", len(batch))
+        for doc in batch:
+            metrics.observe("webhook_delivery_lag_seconds", (now - doc["outbox"]["created_at"]).total_seconds())
+
+    async def _failed(self, batch: List[Dict], url: str, error: str):
+        now = datetime.utcnow()
+        retry, dead = [], []
+        for doc in batch:
+            (dead if doc["outbox"]["attempts"] + 1 >= self.max_attempts else retry).append(doc)
+        if retry:
+            await self.db.conversations.bulk_write([
+                UpdateOne(
+                    {"_id": doc["_id"]},
+                    {"$set": {
+                        "outbox.attempts": doc["outbox"]["attempts"] + 1,
+                        "outbox.next_attempt_at": now + timedelta(seconds=self.retry_delay(doc["outbox"]["attempts"] + 1)),
+                        "outbox.last_error": error
+                    }}
+                )
+                for doc in retry
+            ], ordered=False)
+            metrics.inc("webhook_events_retried_total", len(retry))
+        if dead:
+            await self._dead_letter(dead, url, error)
+
+    async def _dead_letter(self, batch: List[Dict], url: Optional[str], error: str):
+        now = datetime.utcnow()
+        try:
+            await self.db[self.DEAD_LETTERS].insert_many([
+                {
+                    "_id": doc["outbox"]["event_id"],
+                    "type": doc["outbox"]["type"],
+                    "chatbot_id": doc["outbox"]["chatbot_id"],
+                    "conversation_id": doc["conversation_id"],
+                    "url": url,
+                    "attempts": doc["outbox"]["attempts"] + 1,
+                    "error": error,
+                    "created_at": doc["outbox"]["created_at"],
+                    "failed_at": now
+                }
+                for doc in batch
+            ], ordered=False)
+        except BulkWriteError:
+            # Already dead-lettered by an earlier, interrupted attempt
+            pass
+        await self.db.conversations.update_many(
+            {"_id": {"$in": [doc["_id"] for doc in batch]}},
+            {"$unset": {"outbox": ""}}
+        )
+        metrics.inc("webhook_events_dead_lettered_total", len(batch))
+
+    async def list_dead_letters(self, db, chatbot_id: str, limit: int) -> List[Dict]:
+        return await db[self.DEAD_LETTERS].find(
+            {"chatbot_id": chatbot_id}
+        ).sort("failed_at", -1).limit(limit).to_list(limit)
+
+    async def redeliver(self, db, chatbot_id: str) -> int:
+        """Put a chatbot's dead-lettered events back into their conversations' outbox"""
+        requeued = 0
+        async for letter in db[self.DEAD_LETTERS].find({"chatbot_id": chatbot_id}):
+            now = datetime.utcnow()
+            await db.conversations.update_one(
+                {"conversation_id": letter["conversation_id"], "outbox": {"$exists": False}},
+                {"$set": {"outbox": {
+                    "event_id": letter["_id"],
+                    "type": letter["type"],
+                    "chatbot_id": chatbot_id,
+                    "created_at": letter["created_at"],
+                    "next_attempt_at": now,
+                    "attempts": 0
+                }}}
+            )
+            await db[self.DEAD_LETTERS].delete_one({"_id": letter["_id"]})
+            requeued += 1
+        self.notify()
+        return requeued
+
+    async def pending(self, db) -> int:
+        return await db.conversations.count_documents({"outbox.next_attempt_at": {"$exists": True}})
+
+
+webhook_delivery = WebhookDelivery()
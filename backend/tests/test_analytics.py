@@ -0,0 +1,128 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from services.analytics import AnswerAnalytics, _AnswerState, choice_question_ids
+
+
+SCHEMA = {
+    "questions": [
+        {"id": "q1", "title": "Your name?", "type": "short_text", "options": []},
+        {"id": "q2", "title": "Plan?", "type": "multiple_choice", "options": ["Free", "Pro", "Enterprise"]},
+        {"id": "q3", "title": "Channels?", "type": "checkboxes", "options": ["Email", "Phone"]},
+    ]
+}
+CHOICES = choice_question_ids(SCHEMA)
+
+
+def conversation(_id, minutes, name, plan, channels):
+    return {
+        "_id": _id,
+        "completed_at": datetime(2026, 1, 1) + timedelta(minutes=minutes),
+        "responses": [
+            {"question_id": "q1", "answer": name},
+            {"question_id": "q2", "answer": plan},
+            {"question_id": "q3", "answer": channels},
+        ]
+    }
+
+
+class TestAnswerAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        self.analytics = AnswerAnalytics(batch_size=10, max_chatbots=2)
+
+    def test_distributions_and_lengths(self):
+        state = _AnswerState()
+        self.analytics.ingest(state, [
+            conversation(1, 0, "Alice", "Pro", ["Email", "Phone"]),
+            conversation(2, 1, "Bob", "Pro", ["Email"]),
+            conversation(3, 2, "Carolina", "Enterprise", []),
+        ], CHOICES)
+        result = self.analytics.summarize(state, SCHEMA)
+
+        self.assertEqual(result["conversations"], 3)
+        name, plan, channels = result["questions"]
+
+        self.assertEqual(name["answered"], 3)
+        self.assertEqual(name["length_stats"]["min"], 3)
+        self.assertEqual(name["length_stats"]["max"], 8)
+        self.assertEqual(name["length_stats"]["median"], 5.0)
+
+        counts = {d["option"]: d["count"] for d in plan["distribution"]}
+        self.assertEqual(counts, {"Free": 0, "Pro": 2, "Enterprise": 1})
+
+        self.assertEqual(channels["answered"], 2)
+        counts = {d["option"]: d["count"] for d in channels["distribution"]}
+        self.assertEqual(counts, {"Email": 2, "Phone": 1})
+
+    def test_incremental_refresh_skips_documents_at_the_mark(self):
+        state = _AnswerState()
+        self.analytics.ingest(state, [conversation(1, 0, "Alice", "Pro", [])], CHOICES)
+        # The next `$gte` query returns the boundary document again
+        self.analytics.ingest(state, [
+            conversation(1, 0, "Alice", "Pro", []),
+            conversation(2, 5, "Bob", "Free", []),
+        ], CHOICES)
+        result = self.analytics.summarize(state, SCHEMA)
+
+        self.assertEqual(result["conversations"], 2)
+        self.assertEqual(result["as_of"], datetime(2026, 1, 1, 0, 5))
+        counts = {d["option"]: d["count"] for d in result["questions"][1]["distribution"]}
+        self.assertEqual(counts, {"Free": 1, "Pro": 1, "Enterprise": 0})
+
+    def test_conversations_visible_late_are_counted_once(self):
+        state = _AnswerState()
+        self.analytics.ingest(state, [conversation(2, 5, "Bob", "Free", [])], CHOICES)
+        # Completed earlier but read after: the next query reaches back `lookback`
+        self.analytics.ingest(state, [
+            conversation(1, 3, "Alice", "Pro", []),
+            conversation(2, 5, "Bob", "Free", []),
+        ], CHOICES)
+        result = self.analytics.summarize(state, SCHEMA)
+
+        self.assertEqual(result["conversations"], 2)
+        self.assertEqual(result["as_of"], datetime(2026, 1, 1, 0, 5))
+
+        # Ids are only kept for the window
+        self.analytics.ingest(state, [conversation(3, 60, "Carol", "Pro", [])], CHOICES)
+        self.assertEqual(set(state.seen), {3})
+
+    def test_free_text_answers_are_not_counted_as_options(self):
+        state = _AnswerState()
+        self.analytics.ingest(state, [conversation(n, n, f"Name {n}", "Pro", ["Email"]) for n in range(20)], CHOICES)
+        self.assertEqual(set(state.option_counts), {"q2", "q3"})
+        self.assertEqual(self.analytics.summarize(state, SCHEMA)["questions"][0]["answered"], 20)
+
+    def test_length_stats_are_kept_as_counts(self):
+        rng = random.Random(7)
+        names = ["x" * rng.randint(1, 40) for _ in range(500)]
+        state = _AnswerState()
+        for start in range(0, len(names), 50):
+            self.analytics.ingest(state, [
+                conversation(n, n, names[n], "Pro", []) for n in range(start, start + 50)
+            ], CHOICES)
+        stats = self.analytics.summarize(state, SCHEMA)["questions"][0]["length_stats"]
+
+        lengths = np.array([len(name) for name in names])
+        self.assertLessEqual(len(state.length_counts["q1"]), 40)
+        self.assertEqual(stats["mean"], round(float(lengths.mean()), 2))
+        self.assertEqual(stats["median"], float(np.median(lengths)))
+        self.assertEqual(stats["p90"], float(np.percentile(lengths, 90)))
+
+    def test_invalidation_and_bounded_cache(self):
+        self.analytics._state_for("bot_a")
+        self.analytics._state_for("bot_b")
+        self.analytics._state_for("bot_c")
+        self.assertEqual(list(self.analytics._states), ["bot_b", "bot_c"])
+
+        self.analytics.invalidate("bot_b")
+        self.assertEqual(list(self.analytics._states), ["bot_c"])
+        self.analytics.invalidate(None)
+        self.assertEqual(len(self.analytics._states), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
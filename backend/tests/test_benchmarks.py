@@ -0,0 +1,23 @@
+import unittest
+from benchmarks.bench import compare
+from benchmarks.fixtures import FORM_SIZES, load_history, load_html
+from services.form_parser import GoogleFormParser
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_fixtures_parse_to_full_forms(self):
+        parser = GoogleFormParser(client=object())
+        for size in FORM_SIZES:
+            questions = parser._extract_questions(parser.parse_public_data(load_html(size)))
+            self.assertEqual(len(questions), size)
+            self.assertEqual([r["question_id"] for r in load_history(size)], [q["id"] for q in questions])
+
+    def test_compare_flags_only_regressions_past_the_threshold(self):
+        baseline = {"a": {"median": 1.0}, "b": {"median": 1.0}, "c": {"median": 1.0}}
+        results = {"a": {"median": 1.1}, "b": {"median": 1.3}, "c": {"median": 0.5}, "new": {"median": 9.0}}
+        self.assertEqual(compare(results, baseline, 0.15), [("b", 1.3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from services.cache_bus import CacheInvalidationBus, ALL_KEYS, change_key
+
+
+class TestCacheInvalidationBus(unittest.TestCase):
+
+    def test_first_poll_only_records_version(self):
+        bus = CacheInvalidationBus(poll_interval=0.1, log_size=4)
+        keys = bus.apply_version_doc({"version": 7, "log": [{"v": 7, "key": "bot_a"}]})
+        self.assertEqual(keys, [])
+
+    def test_evicts_keys_changed_since_last_poll(self):
+        bus = CacheInvalidationBus(poll_interval=0.1, log_size=4)
+        bus.apply_version_doc({"version": 2, "log": [{"v": 1, "key": "bot_a"}, {"v": 2, "key": "bot_b"}]})
+
+        keys = bus.apply_version_doc({"version": 5, "log": [
+            {"v": 2, "key": "bot_b"},
+            {"v": 3, "key": "bot_c"},
+            {"v": 4, "key": "bot_a"},
+            {"v": 5, "key": "bot_c"},
+        ]})
+        self.assertEqual(keys, ["bot_c", "bot_a"])
+
+        # Nothing new
+        self.assertEqual(bus.apply_version_doc({"version": 5, "log": []}), [])
+
+    def test_flushes_everything_when_log_has_a_gap(self):
+        bus = CacheInvalidationBus(poll_interval=0.1, log_size=2)
+        bus.apply_version_doc({"version": 1, "log": [{"v": 1, "key": "bot_a"}]})
+
+        keys = bus.apply_version_doc({"version": 9, "log": [{"v": 8, "key": "bot_x"}, {"v": 9, "key": "bot_y"}]})
+        self.assertEqual(keys, [ALL_KEYS])
+
+    def test_dispatch_isolates_failing_subscribers(self):
+        bus = CacheInvalidationBus(poll_interval=0.1)
+        seen = []
+
+        def broken(_key):
+            raise RuntimeError("boom")
+
+        bus.subscribe(broken)
+        bus.subscribe(seen.append)
+        bus.dispatch("bot_a")
+        self.assertEqual(seen, ["bot_a"])
+
+    def test_change_events_map_to_chatbot_ids(self):
+        self.assertEqual(
+            change_key({"ns": {"coll": "chatbots"}, "fullDocument": {"chatbot_id": "bot_a"}}),
+            "bot_a"
+        )
+        # Deletes are seen through the tombstone inserted first, keyed by chatbot id
+        self.assertEqual(
+            change_key({"ns": {"coll": "chatbot_tombstones"}, "documentKey": {"_id": "bot_b"}}),
+            "bot_b"
+        )
+        # Updated, then deleted before the lookup
+        self.assertIs(change_key({"ns": {"coll": "chatbots"}, "fullDocument": None}), ALL_KEYS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+from services.chatbot_purge import PURGE_INDEX, ChatbotPurger
+from services.funnel import funnel_counters
+from services.stats_series import stats_series
+from services.unique_visitors import unique_visitors
+from services.webhooks import webhook_delivery
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.hinted = None
+
+    def hint(self, index):
+        self.hinted = index
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length):
+        return self.docs
+
+
+class _Collection:
+    def __init__(self, docs=()):
+        self.docs = {doc["_id"]: dict(doc) for doc in docs}
+        self.deletes = []
+        self.updates = []
+
+    async def find_one(self, query, projection=None):
+        for doc in self.docs.values():
+            if all(doc.get(k) == v for k, v in query.items()):
+                return dict(doc)
+        return None
+
+    async def insert_one(self, doc):
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def delete_one(self, query):
+        deleted = self.docs.pop(query["_id"], None)
+        return SimpleNamespace(deleted_count=1 if deleted else 0)
+
+    async def count_documents(self, query, hint=None):
+        return len([d for d in self.docs.values() if d["chatbot_id"] == query["chatbot_id"]])
+
+    def find(self, query, projection=None):
+        self.cursor = _Cursor([{"_id": d["_id"]} for d in self.docs.values() if d["chatbot_id"] == query["chatbot_id"]])
+        return self.cursor
+
+    async def delete_many(self, query):
+        ids = query["_id"]["$in"] if "_id" in query else [
+            k for k, d in self.docs.items() if d.get("chatbot_id") == query["chatbot_id"]
+        ]
+        self.deletes.append(len(ids))
+        for _id in ids:
+            self.docs.pop(_id)
+        return SimpleNamespace(deleted_count=len(ids))
+
+    async def update_one(self, query, update):
+        self.updates.append(update)
+        doc = self.docs[query["_id"]]
+        doc.update(update.get("$set", {}))
+        for k, v in update.get("$inc", {}).items():
+            doc[k] += v
+
+
+class _Db(dict):
+    def __init__(self):
+        super().__init__({
+            name: _Collection() for name in (
+                ChatbotPurger.COLLECTION,
+                funnel_counters.COLLECTION,
+                stats_series.COLLECTION,
+                webhook_delivery.DEAD_LETTERS,
+                unique_visitors.COLLECTION
+            )
+        })
+        self.chatbots = _Collection([{"_id": "oid", "chatbot_id": "bot_1", "name": "Bot"}])
+        self.conversations = _Collection(
+            [{"_id": n, "chatbot_id": "bot_1"} for n in range(25)] + [{"_id": 99, "chatbot_id": "bot_2"}]
+        )
+
+
+class TestChatbotPurge(unittest.IsolatedAsyncioTestCase):
+
+    async def test_delete_tombstones_then_purges_in_batches(self):
+        db = _Db()
+        purger = ChatbotPurger()
+        purger.db = db
+        purger.batch_size = 10
+        purger.rate = 0
+
+        tombstone = await purger.tombstone(db, "bot_1")
+        self.assertEqual(tombstone["chatbot"]["name"], "Bot")
+        self.assertEqual(db.chatbots.docs, {})
+        # Claimable once the chatbot is gone
+        self.assertLessEqual(db[ChatbotPurger.COLLECTION].docs["bot_1"]["lease_until"], datetime.utcnow())
+        self.assertIsNone(await purger.tombstone(db, "bot_1"))
+        # Conversations are still there until the purger runs
+        self.assertEqual(len(db.conversations.docs), 26)
+
+        await purger.purge(tombstone)
+
+        self.assertEqual(db.conversations.deletes, [10, 10, 5])
+        self.assertEqual(db.conversations.cursor.hinted, PURGE_INDEX)
+        self.assertEqual(list(db.conversations.docs), [99])
+        progress = await purger.progress(db, "bot_1")
+        self.assertEqual((progress["status"], progress["total"], progress["purged"]), ("done", 25, 25))
+
+    async def test_tombstone_of_a_chatbot_that_was_not_deleted_is_dropped(self):
+        db = _Db()
+        purger = ChatbotPurger()
+        purger.db = db
+        # The delete died between writing the tombstone and removing the chatbot
+        tombstone = {"_id": "bot_1", "status": "purging", "total": None, "purged": 0}
+        await db[ChatbotPurger.COLLECTION].insert_one(tombstone)
+
+        await purger.purge(tombstone)
+
+        self.assertEqual(len(db.conversations.docs), 26)
+        self.assertEqual(db[ChatbotPurger.COLLECTION].docs, {})
+        self.assertIn("oid", db.chatbots.docs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from services.chatbot_search import ChatbotSearch, normalize, query_grams
+
+
+class _Cursor:
+    def __init__(self, docs, projection):
+        self.docs = docs
+        self.fields = [k for k, v in (projection or {}).items() if v]
+
+    def sort(self, keys):
+        self.docs.sort(key=lambda d: tuple(d[k] for k, _ in keys))
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    async def to_list(self, length):
+        return [{k: d[k] for k in self.fields if k in d} or dict(d) for d in self.docs]
+
+
+class _Chatbots:
+    """Evaluates the `$all` gram filter and the keyset `$or` of a search query"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        required = set(query["search_grams"]["$all"])
+        matches = [d for d in self.docs if required <= set(d["search_grams"])]
+        if "$or" in query:
+            after_name = query["$or"][0]["search_name"]["$gt"]
+            after_id = query["$or"][1]["chatbot_id"]["$gt"]
+            matches = [d for d in matches if (d["search_name"], d["chatbot_id"]) > (after_name, after_id)]
+        return _Cursor(matches, projection)
+
+
+class _Db:
+    def __init__(self, docs):
+        self.chatbots = _Chatbots(docs)
+
+
+def _bot(search, chatbot_id, name, title=None):
+    return {"chatbot_id": chatbot_id, "name": name, **search.fields(name, title)}
+
+
+class TestChatbotSearch(unittest.IsolatedAsyncioTestCase):
+
+    def test_normalize_folds_case_accents_and_whitespace(self):
+        self.assertEqual(normalize("  Encuesta   de  SATISFACCIÓN "), "encuesta de satisfaccion")
+        self.assertEqual(query_grams("ab"), ["ab"])
+        self.assertEqual(query_grams("abcd"), ["abc", "bcd"])
+
+    def test_cursor_round_trip(self):
+        search = ChatbotSearch()
+        cursor = search.encode_cursor({"search_name": "café bot", "chatbot_id": "bot_1"})
+        self.assertEqual(search.decode_cursor(cursor), ("café bot", "bot_1"))
+        with self.assertRaises(ValueError):
+            search.decode_cursor("not-a-cursor")
+
+    async def test_pages_through_substring_matches_in_name_order(self):
+        search = ChatbotSearch()
+        db = _Db([
+            _bot(search, "bot_1", "Customer Survey"),
+            _bot(search, "bot_2", "Event signup", "Conference survey 2026"),
+            _bot(search, "bot_3", "Newsletter"),
+            _bot(search, "bot_4", "Surveyor feedback"),
+            # Every trigram of "survey" is present, but only across name and title
+            _bot(search, "bot_5", "Surv-ey", "urvey"),
+        ])
+
+        first = await search.search(db, "SURVEY", limit=2)
+        self.assertEqual([b["chatbot_id"] for b in first["chatbots"]], ["bot_1", "bot_2"])
+        self.assertNotIn("search_grams", first["chatbots"][0])
+
+        second = await search.search(db, "survey", limit=2, cursor=first["next_cursor"])
+        self.assertEqual([b["chatbot_id"] for b in second["chatbots"]], ["bot_4"])
+        self.assertIsNone(second["next_cursor"])
+
+
+if __name__ == "__main__":
+    unittest.main()
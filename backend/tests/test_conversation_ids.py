@@ -0,0 +1,70 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from services.conversation_ids import ConversationIds
+
+
+class _Keys:
+    """find_one_and_update with $setOnInsert and upsert on a single document"""
+
+    def __init__(self):
+        self.doc = None
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        if self.doc is None:
+            self.doc = {"_id": query["_id"], **update["$setOnInsert"]}
+        return dict(self.doc)
+
+
+class TestConversationIds(unittest.TestCase):
+
+    def setUp(self):
+        with mock.patch.dict(os.environ, {"CONVERSATION_SIGNING_KEY": "test-key"}):
+            self.ids = ConversationIds()
+
+    def test_round_trip(self):
+        started_at = datetime.utcnow().replace(microsecond=0)
+        conversation_id = self.ids.issue("bot_0123456789ab", started_at)
+
+        self.assertTrue(conversation_id.startswith("conv_"))
+        self.assertEqual(
+            self.ids.verify(conversation_id),
+            {"chatbot_id": "bot_0123456789ab", "started_at": started_at}
+        )
+
+    def test_rejects_tampered_and_foreign_ids(self):
+        conversation_id = self.ids.issue("bot_0123456789ab")
+        tampered = conversation_id.replace("bot_0123456789ab", "bot_ffffffffffff")
+
+        self.assertIsNone(self.ids.verify(tampered))
+        self.assertIsNone(self.ids.verify("conv_0123456789ab"))
+        self.assertIsNone(self.ids.verify("not.a.valid.id"))
+
+    def test_rejects_expired_ids(self):
+        conversation_id = self.ids.issue("bot_0123456789ab", datetime.utcnow() - timedelta(days=30))
+        self.assertIsNone(self.ids.verify(conversation_id))
+
+
+class TestStoredSigningKey(unittest.IsolatedAsyncioTestCase):
+
+    async def test_workers_without_a_configured_key_share_a_stored_one(self):
+        db = {ConversationIds.COLLECTION: _Keys()}
+        with mock.patch.dict(os.environ, {"CONVERSATION_SIGNING_KEY": ""}):
+            first, second = ConversationIds(), ConversationIds()
+        with self.assertRaises(RuntimeError):
+            first.issue("bot_0123456789ab")
+
+        await first.start(db)
+        await second.start(db)
+        self.assertIsNotNone(second.verify(first.issue("bot_0123456789ab")))
+
+        with mock.patch.dict(os.environ, {"CONVERSATION_SIGNING_KEY": "test-key"}):
+            configured = ConversationIds()
+        await configured.start(db)
+        self.assertIsNone(configured.verify(first.issue("bot_0123456789ab")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+from datetime import datetime, timedelta
+
+from services.conversation_inbox import ConversationInbox
+from services.conversation_responses import ConversationResponses
+
+START = datetime(2026, 1, 1)
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, clause) for clause in condition):
+                return False
+        elif key == "answer_keys":
+            if condition not in doc.get("answer_keys", []):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(key)
+            if "$lt" in condition and not value < condition["$lt"]:
+                return False
+            if "$gte" in condition and not value >= condition["$gte"]:
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs, projection):
+        self.docs = docs
+        self.projection = projection
+
+    def sort(self, keys):
+        self.docs = sorted(self.docs, key=lambda d: (d["started_at"], d["conversation_id"]), reverse=True)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length):
+        return [
+            {k: doc[k] for k in self.projection if k in doc and self.projection[k] == 1}
+            for doc in self.docs
+        ]
+
+
+class _Conversations:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection):
+        self.queries.append(query)
+        return _Cursor([d for d in self.docs if _matches(d, query)], projection)
+
+
+class _Db:
+    def __init__(self, docs):
+        self.conversations = _Conversations(docs)
+
+
+def _conversation(n, plan, status="completed"):
+    doc = {
+        "conversation_id": f"conv_{n:02d}",
+        "chatbot_id": "bot_1",
+        "status": status,
+        "started_at": START + timedelta(hours=n // 2)  # pairs share a start time
+    }
+    doc.update(ConversationResponses().pack([
+        {"question_id": "plan", "answer": plan},
+        {"question_id": "extras", "answer": ["SSO", "Audit log"]}
+    ]))
+    return doc
+
+
+class TestConversationInbox(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        plans = ["Enterprise", "Starter", " enterprise "] * 4
+        self.db = _Db([
+            _conversation(n, plan, "started" if n % 4 == 0 else "completed") for n, plan in enumerate(plans)
+        ])
+        self.inbox = ConversationInbox()
+
+    async def _all_pages(self, limit, **filters):
+        ids, cursor = [], None
+        while True:
+            page = await self.inbox.page(self.db, "bot_1", limit=limit, cursor=cursor, **filters)
+            ids += [c["conversation_id"] for c in page["conversations"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return ids
+
+    async def test_keyset_pages_cover_everything_once_newest_first(self):
+        ids = await self._all_pages(limit=5)
+        self.assertEqual(ids, [f"conv_{n:02d}" for n in range(11, -1, -1)])
+
+    async def test_filters_by_answer_status_and_range(self):
+        enterprise = await self._all_pages(limit=3, question_id="plan", answer="ENTERPRISE")
+        self.assertEqual(enterprise, ["conv_11", "conv_09", "conv_08", "conv_06", "conv_05", "conv_03", "conv_02", "conv_00"])
+
+        completed_with_sso = await self._all_pages(limit=50, status="completed", question_id="extras", answer="sso")
+        self.assertEqual(len(completed_with_sso), 9)
+
+        in_range = await self._all_pages(limit=50, start=START + timedelta(hours=2), end=START + timedelta(hours=4))
+        self.assertEqual(in_range, ["conv_07", "conv_06", "conv_05", "conv_04"])
+
+    def test_rejects_half_an_answer_filter_and_bad_cursors(self):
+        with self.assertRaises(ValueError):
+            self.inbox.build_filter("bot_1", question_id="plan")
+        with self.assertRaises(ValueError):
+            self.inbox.build_filter("bot_1", cursor="not-a-cursor")
+        with self.assertRaises(ValueError):
+            self.inbox.build_filter("bot_1", status="archived")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from services.conversation_responses import ConversationResponses, answer_key
+
+
+SCHEMA = {"questions": [{"id": "q1", "title": "Your name?"}, {"id": "q2", "title": "Favourite colours?"}]}
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    async def to_list(self, length):
+        return list(self.docs)
+
+
+class _Conversations:
+    def __init__(self, docs):
+        self.docs = {d["_id"]: d for d in docs}
+
+    def find(self, query, projection=None):
+        return _Cursor([d for d in self.docs.values() if "responses" in d])
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            doc = self.docs[operation._filter["_id"]]
+            doc.update(operation._doc["$set"])
+            doc.pop("responses")
+
+
+class _Db:
+    def __init__(self, docs):
+        self.conversations = _Conversations(docs)
+
+
+class TestConversationResponses(unittest.IsolatedAsyncioTestCase):
+
+    def test_pack_drops_question_text_and_unpack_restores_it(self):
+        codec = ConversationResponses()
+        responses = [
+            {"question_id": "q1", "question": "Your name?", "answer": "Ada"},
+            {"question_id": "q2", "question": "Favourite colours?", "answer": ["Red", "Blue"]},
+        ]
+        packed = codec.pack(responses)
+        self.assertEqual(packed, {
+            "question_ids": ["q1", "q2"],
+            "answers": ["Ada", ["Red", "Blue"]],
+            "answer_keys": [answer_key("q1", "Ada"), answer_key("q2", "Red"), answer_key("q2", "Blue")]
+        })
+
+        self.assertEqual(codec.unpack(packed)[1], {"question_id": "q2", "answer": ["Red", "Blue"]})
+        self.assertEqual(codec.unpack(packed, SCHEMA), responses)
+
+    def test_read_api_shape_is_unchanged_for_both_formats(self):
+        codec = ConversationResponses()
+        compact = {"conversation_id": "c1", "question_ids": ["q1"], "answers": ["Ada"]}
+        legacy = {"conversation_id": "c2", "responses": [{"question_id": "q1", "question": "Name", "answer": "Ada"}]}
+
+        self.assertEqual(
+            codec.to_api(compact, SCHEMA),
+            {"conversation_id": "c1", "responses": [{"question_id": "q1", "answer": "Ada", "question": "Your name?"}]}
+        )
+        # Legacy documents keep the question text they were stored with
+        self.assertEqual(codec.to_api(legacy, SCHEMA), legacy)
+
+    async def test_migrates_legacy_documents_in_batches(self):
+        db = _Db([
+            {"_id": i, "responses": [{"question_id": "q1", "question": "Your name?", "answer": f"user {i}"}]}
+            for i in range(5)
+        ] + [{"_id": 9, "question_ids": ["q1"], "answers": ["done"]}])
+
+        migrated = await ConversationResponses().migrate_legacy(db, batch_size=2)
+
+        self.assertEqual(migrated, 5)
+        self.assertEqual(db.conversations.docs[3], {
+            "_id": 3, "question_ids": ["q1"], "answers": ["user 3"], "answer_keys": [answer_key("q1", "user 3")]
+        })
+        self.assertEqual(db.conversations.docs[9]["answers"], ["done"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from pymongo.errors import DuplicateKeyError
+
+import routes.conversations as conversations_route
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if isinstance(condition, dict) and "$ne" in condition:
+            if doc.get(key) == condition["$ne"]:
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class _Conversations:
+    """Single-document update_one with upserts and a unique conversation_id"""
+
+    def __init__(self, docs=()):
+        self.docs = [dict(d) for d in docs]
+
+    async def update_one(self, query, update, upsert=False):
+        for doc in self.docs:
+            if _matches(doc, query):
+                doc.update(update.get("$set", {}))
+                for field in update.get("$unset", {}):
+                    doc.pop(field, None)
+                return SimpleNamespace(matched_count=1, upserted_id=None)
+        if not upsert:
+            return SimpleNamespace(matched_count=0, upserted_id=None)
+        if any(d["conversation_id"] == query["conversation_id"] for d in self.docs):
+            raise DuplicateKeyError("conversation_id_unique")
+        doc = {"conversation_id": query["conversation_id"], **update.get("$setOnInsert", {}), **update["$set"]}
+        self.docs.append(doc)
+        return SimpleNamespace(matched_count=0, upserted_id=len(self.docs))
+
+    async def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.docs if _matches(doc, query)), None)
+
+
+class _RacingConversations(_Conversations):
+    """The first upsert loses to a concurrent insert of the same, still open, conversation"""
+
+    async def update_one(self, query, update, upsert=False):
+        if upsert:
+            self.docs.append({"conversation_id": query["conversation_id"], "status": "started"})
+            raise DuplicateKeyError("conversation_id_unique")
+        return await super().update_one(query, update, upsert)
+
+
+class TestSaveConversation(unittest.IsolatedAsyncioTestCase):
+
+    def _db(self, docs=(), conversations=_Conversations):
+        db = SimpleNamespace(conversations=conversations(docs))
+        patcher = mock.patch.object(conversations_route, "db", db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return db
+
+    async def test_only_one_of_two_racing_completions_is_stored(self):
+        db = self._db([{"conversation_id": "conv_1", "status": "started"}])
+        conversation = {"conversation_id": "conv_1", "status": "started"}
+
+        first = {"question_ids": ["q1"], "answers": ["a"], "status": "completed", "outbox": {"event_id": "evt_1"}}
+        second = {"question_ids": ["q1", "q2"], "answers": ["a", "b"], "status": "completed",
+                  "outbox": {"event_id": "evt_2"}}
+        self.assertTrue(await conversations_route.save_conversation(conversation, first, completing=True))
+        self.assertFalse(await conversations_route.save_conversation(conversation, second, completing=True))
+
+        stored = db.conversations.docs[0]
+        self.assertEqual(stored["outbox"], {"event_id": "evt_1"})
+        # The losing request's answers are still kept
+        self.assertEqual(stored["question_ids"], ["q1", "q2"])
+
+    async def test_completing_a_provisional_conversation_created_concurrently(self):
+        db = self._db([{"conversation_id": "conv_1", "status": "completed", "outbox": {"event_id": "evt_1"}}])
+        conversation = {"conversation_id": "conv_1", "status": "started", "chatbot_id": "bot_1"}
+
+        saved = await conversations_route.save_conversation(
+            conversation,
+            {"question_ids": ["q1"], "answers": ["a"], "status": "completed", "outbox": {"event_id": "evt_2"}},
+            upsert=True,
+            completing=True
+        )
+        self.assertFalse(saved)
+        self.assertEqual(len(db.conversations.docs), 1)
+        self.assertEqual(db.conversations.docs[0]["outbox"], {"event_id": "evt_1"})
+
+    async def test_answer_set_for_a_conversation_created_concurrently_is_saved(self):
+        db = self._db(conversations=_RacingConversations)
+        conversation = {"conversation_id": "conv_1", "status": "started", "chatbot_id": "bot_1"}
+
+        saved = await conversations_route.save_answer_set(
+            conversation, {"question_ids": ["q1"], "answers": ["a"]}, upsert=True
+        )
+        self.assertTrue(saved)
+        self.assertEqual(len(db.conversations.docs), 1)
+        self.assertEqual(db.conversations.docs[0]["answers"], ["a"])
+
+    async def test_answer_set_for_a_completed_conversation_is_refused(self):
+        db = self._db([{"conversation_id": "conv_1", "status": "completed", "answers": ["a"]}])
+        conversation = {"conversation_id": "conv_1", "status": "started"}
+
+        for upsert in (True, False):
+            self.assertFalse(await conversations_route.save_answer_set(
+                conversation, {"answers": ["b"], "status": "completed"}, upsert=upsert
+            ))
+        self.assertEqual(db.conversations.docs[0]["answers"], ["a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import asyncio
+import random
+import time
+import unittest
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+
+from benchmarks.fixtures import build_html, build_public_data, load_html
+from services.cpu_pool import CpuPool, CpuPoolBusyError
+from services.form_parser import GoogleFormParser
+from services.metrics import metrics
+
+
+def _histogram(name, task):
+    for entry in metrics.snapshot()["histograms"]:
+        if entry["name"] == name and entry["labels"] == {"task": task}:
+            return entry["value"]
+    return None
+
+
+class _BrokenExecutor(Executor):
+    """Fails every task the way a pool with a dead worker does, once both callers are in"""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.futures.append(future)
+        if len(self.futures) == 2:
+            for pending in self.futures:
+                pending.set_exception(BrokenProcessPool("worker died"))
+        return future
+
+
+class TestCpuPool(unittest.IsolatedAsyncioTestCase):
+
+    async def test_runs_inline_until_started(self):
+        pool = CpuPool()
+        self.assertEqual(await pool.run(sum, [1, 2, 3]), 6)
+
+    async def test_form_parsing_in_worker_processes(self):
+        parser = GoogleFormParser()
+        html = load_html(10)
+        pool = CpuPool()
+        pool.mode, pool.workers = "process", 2
+        await pool.start()
+        try:
+            results = await asyncio.gather(*[pool.run(parser.parse_html, html, task="parse_test") for _ in range(3)])
+        finally:
+            await pool.stop()
+
+        self.assertEqual(results, [parser.parse_html(html)] * 3)
+        self.assertEqual(_histogram("cpu_pool_run_seconds", "parse_test")["count"], 3)
+
+    async def test_page_title_fallback_crosses_the_process_boundary(self):
+        rng = random.Random(1)
+        public_data = build_public_data(500, rng)
+        # No title in the form data: the <title> of the page is used
+        public_data[1][8] = None
+        html = build_html(public_data, rng)
+        pool = CpuPool()
+        pool.mode, pool.workers = "process", 1
+        await pool.start()
+        try:
+            schema = await pool.run(GoogleFormParser().parse_html, html, task="parse_test")
+        finally:
+            await pool.stop()
+
+        self.assertEqual(schema["title"], "Benchmark form")
+        self.assertIs(type(schema["title"]), str)
+        self.assertEqual(len(schema["questions"]), 500)
+
+    async def test_broken_pool_is_replaced_once(self):
+        pool = CpuPool()
+        pool.mode = "thread"
+        await pool.start()
+        replacements = []
+        pool._executor = broken = _BrokenExecutor()
+
+        def create():
+            replacements.append(object())
+            return replacements[-1]
+
+        pool._create_executor = create
+        results = await asyncio.gather(pool.run(sum, [1]), pool.run(sum, [2]), return_exceptions=True)
+
+        self.assertTrue(all(isinstance(result, BrokenProcessPool) for result in results))
+        self.assertEqual(len(replacements), 1)
+        self.assertIs(pool._executor, replacements[0])
+        self.assertIsNot(pool._executor, broken)
+
+    async def test_pending_work_is_bounded_and_wait_is_measured(self):
+        pool = CpuPool()
+        pool.mode, pool.workers, pool.max_pending = "thread", 1, 1
+        await pool.start()
+        try:
+            await asyncio.gather(*[pool.run(time.sleep, 0.05, task="sleep_test") for _ in range(3)])
+        finally:
+            await pool.stop()
+
+        wait = _histogram("cpu_pool_wait_seconds", "sleep_test")
+        self.assertEqual(wait["count"], 3)
+        # The last caller waited for the two before it
+        self.assertGreaterEqual(wait["max"], 0.09)
+
+    async def test_callers_beyond_the_waiting_list_fail_fast(self):
+        pool = CpuPool()
+        pool.mode, pool.workers, pool.max_pending, pool.max_waiting = "thread", 1, 1, 1
+        await pool.start()
+        try:
+            running = asyncio.create_task(pool.run(time.sleep, 0.1, task="busy_test"))
+            waiting = asyncio.create_task(pool.run(time.sleep, 0.1, task="busy_test"))
+            await asyncio.sleep(0.01)
+            with self.assertRaises(CpuPoolBusyError):
+                await pool.run(time.sleep, 0.1, task="busy_test")
+            await asyncio.gather(running, waiting)
+            # Room again once the queue drains
+            await pool.run(time.sleep, 0, task="busy_test")
+        finally:
+            await pool.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
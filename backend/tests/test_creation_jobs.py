@@ -0,0 +1,112 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from services import creation_jobs as creation_jobs_module
+from services.cpu_pool import CpuPoolBusyError
+from services.creation_jobs import ChatbotCreationJobs
+from services.funnel import funnel_counters
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs
+
+
+class _Collection:
+    def __init__(self, docs=()):
+        self.docs = [dict(doc) for doc in docs]
+        self.updates = []
+
+    def _match(self, doc, query):
+        if "$or" in query:
+            return any(self._match(doc, clause) for clause in query["$or"])
+        return all(doc.get(k) == v for k, v in query.items())
+
+    async def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.docs if self._match(doc, query)), None)
+
+    def find(self, query, projection=None):
+        return _Cursor([dict(doc) for doc in self.docs if self._match(doc, query)])
+
+    async def update_one(self, query, update, upsert=False):
+        self.updates.append((query, update))
+        for doc in self.docs:
+            if self._match(doc, query):
+                doc.update(update.get("$set", {}))
+        return SimpleNamespace(matched_count=1)
+
+    async def bulk_write(self, operations, ordered=True):
+        for op in operations:
+            await self.update_one(op._filter, op._doc)
+
+
+class _Db(dict):
+    def __init__(self, chatbots):
+        super().__init__({ChatbotCreationJobs.COLLECTION: _Collection(), funnel_counters.COLLECTION: _Collection()})
+        self.chatbots = _Collection(chatbots)
+
+
+SCHEMA = {"title": "New form", "questions": [{"id": "q1", "title": "Name?"}]}
+
+
+class TestFormJobs(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.db = _Db([
+            {"_id": 1, "chatbot_id": "bot_a", "name": "A", "form_key": "e/old", "google_form_url": "https://old"},
+            {"_id": 2, "chatbot_id": "bot_b", "name": "B", "form_key": "e/new", "google_form_url": "https://new"},
+        ])
+        self.jobs = ChatbotCreationJobs()
+        self.jobs.db = self.db
+        patcher = mock.patch.object(
+            creation_jobs_module.schema_store, "parse_and_store",
+            mock.AsyncMock(return_value=("e/new", "ref_1", SCHEMA))
+        )
+        self.parse = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(creation_jobs_module.cache_bus, "publish", mock.AsyncMock())
+        self.published = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _job(self, kind, url):
+        return {"_id": "job_1", "kind": kind, "chatbot_id": "bot_a", "request": {"google_form_url": url}}
+
+    async def test_form_change_applies_the_url_once_parsed(self):
+        await self.jobs._run(self._job("change_form", "https://new"))
+
+        bot = await self.db.chatbots.find_one({"chatbot_id": "bot_a"})
+        self.assertEqual(bot["google_form_url"], "https://new")
+        self.assertEqual((bot["form_key"], bot["form_title"]), ("e/new", "New form"))
+        (_, update), = self.db[ChatbotCreationJobs.COLLECTION].updates
+        self.assertEqual(update["$set"]["status"], "succeeded")
+        self.published.assert_awaited_once_with(self.db, "bot_a")
+
+    async def test_refresh_moves_every_bot_on_the_form(self):
+        await self.jobs._run(self._job("refresh_schema", "https://old"))
+
+        (_, update), = self.db[ChatbotCreationJobs.COLLECTION].updates
+        self.assertEqual(update["$set"]["result"]["updated_chatbots"], ["bot_a", "bot_b"])
+        self.assertEqual({doc["form_schema_ref"] for doc in self.db.chatbots.docs}, {"ref_1"})
+
+    async def test_parse_failure_changes_nothing(self):
+        self.parse.side_effect = ValueError("not a form")
+        await self.jobs._run(self._job("change_form", "https://new"))
+
+        self.assertEqual(self.db.chatbots.updates, [])
+        (_, update), = self.db[ChatbotCreationJobs.COLLECTION].updates
+        self.assertEqual(update["$set"]["status"], "failed")
+
+    async def test_busy_parse_pool_defers_the_job(self):
+        self.parse.side_effect = CpuPoolBusyError("busy")
+        await self.jobs._run(self._job("refresh_schema", "https://old"))
+
+        (_, update), = self.db[ChatbotCreationJobs.COLLECTION].updates
+        self.assertEqual(update["$set"]["status"], "pending")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from services.funnel import FunnelCounters
+
+
+class _Funnels:
+    """update_one with $set/$inc/$setOnInsert upserts on documents keyed by _id"""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc else None
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query["_id"])
+        if doc is None:
+            doc = self.docs[query["_id"]] = {"_id": query["_id"], **update.get("$setOnInsert", {})}
+        doc.update(update.get("$set", {}))
+        for path, value in update.get("$inc", {}).items():
+            *parents, field = path.split(".")
+            target = doc
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[field] = target.get(field, 0) + value
+
+
+class TestFunnelCounters(unittest.TestCase):
+
+    def test_drop_off_curve_follows_schema_order(self):
+        doc = {
+            "_id": "bot_a",
+            "order": [{"id": "q1", "title": "Name?"}, {"id": "q2", "title": "Email?"}, {"id": "q3", "title": "Plan?"}],
+            "started": 100,
+            "completed": 40,
+            "questions": {
+                "q1": {"reached": 100, "answered": 80},
+                "q2": {"reached": 80, "answered": 50},
+                "q3": {"reached": 50, "answered": 40},
+            }
+        }
+        funnel = FunnelCounters().build_curve(doc)
+
+        self.assertEqual(funnel["completion_rate"], 40.0)
+        self.assertEqual([s["question_id"] for s in funnel["steps"]], ["q1", "q2", "q3"])
+        self.assertEqual(funnel["steps"][1]["drop_off"], 30)
+        self.assertEqual(funnel["steps"][1]["drop_off_rate"], 37.5)
+        self.assertEqual(funnel["steps"][2]["answered_rate_from_start"], 40.0)
+
+    def test_order_skips_ids_unsafe_as_field_names(self):
+        schema = {"questions": [{"id": "123", "title": "ok"}, {"id": "a.b"}, {"id": "$x"}]}
+        self.assertEqual(FunnelCounters()._order(schema), [{"id": "123", "title": "ok"}])
+
+
+class TestFunnelDocument(unittest.IsolatedAsyncioTestCase):
+
+    async def test_counts_recorded_before_the_order_are_kept(self):
+        funnels = FunnelCounters()
+        db = {FunnelCounters.COLLECTION: _Funnels()}
+        # A bot created before funnel tracking: its first open creates the document
+        await funnels.record_start(db, "bot_a", {"id": "q1"})
+        self.assertIsNone(await funnels.get_funnel(db, "bot_a"))
+
+        await funnels.init_funnel(db, "bot_a", {"questions": [{"id": "q1", "title": "Name?"}]})
+        funnel = await funnels.get_funnel(db, "bot_a")
+        self.assertEqual(funnel["started"], 1)
+        self.assertEqual([(s["question_id"], s["reached"]) for s in funnel["steps"]], [("q1", 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
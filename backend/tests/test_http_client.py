@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from services.http_client import CircuitBreaker, CircuitOpenError, HttpClient
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_after_consecutive_failures_and_half_opens(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_failure()
+        # reset_timeout=0: immediately eligible for a single trial request
+        self.assertEqual(breaker.state, "half_open")
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_fails_fast_while_open(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+
+class TestHttpClient(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.calls = 0
+
+        async def flaky(request):
+            self.calls += 1
+            if self.calls < 3:
+                return web.Response(status=503)
+            return web.Response(text="ok")
+
+        async def down(request):
+            return web.Response(status=502)
+
+        async def hang(request):
+            await asyncio.sleep(60)
+            return web.Response(text="late")
+
+        app = web.Application()
+        app.router.add_get("/flaky", flaky)
+        app.router.add_get("/down", down)
+        app.router.add_get("/hang", hang)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+        self.client = HttpClient()
+        self.client.retries = 2
+        self.client.backoff_base = 0.001
+        self.client.breaker_failures = 1
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+
+    async def test_retries_transient_statuses(self):
+        response = await self.client.request("GET", str(self.server.make_url("/flaky")))
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.text, "ok")
+        self.assertEqual(self.calls, 3)
+
+    async def test_circuit_opens_when_host_keeps_failing(self):
+        response = await self.client.request("GET", str(self.server.make_url("/down")))
+        self.assertEqual(response.status, 502)
+        with self.assertRaises(CircuitOpenError):
+            await self.client.request("GET", str(self.server.make_url("/down")))
+
+    async def test_cancelled_trial_lets_the_next_trial_through(self):
+        self.client.retries = 0
+        self.client.breaker_reset = 0
+        await self.client.request("GET", str(self.server.make_url("/down")))
+        self.assertEqual(self.client.breaker_for(self.server.make_url("/").raw_authority).state, "half_open")
+
+        trial = asyncio.create_task(self.client.request("GET", str(self.server.make_url("/hang"))))
+        await asyncio.sleep(0.05)
+        trial.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await trial
+
+        # Neither a success nor a failure was recorded: the circuit stays half-open for another trial
+        response = await self.client.request("GET", str(self.server.make_url("/down")))
+        self.assertEqual(response.status, 502)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import unittest
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from services.indexes import (
+    INDEXES, QUERY_SHAPES, collscans, diff_indexes, ensure_indexes, plan_stages, unindexed_shapes
+)
+
+
+class TestIndexes(unittest.IsolatedAsyncioTestCase):
+
+    def test_every_query_shape_has_an_index_to_start_from(self):
+        self.assertEqual(unindexed_shapes(), [])
+        self.assertEqual(len({shape["name"] for shape in QUERY_SHAPES}), len(QUERY_SHAPES))
+
+    def test_public_ids_are_unique(self):
+        unique = {
+            (collection, tuple(model.document["key"]))
+            for collection, models in INDEXES.items()
+            for model in models if model.document.get("unique")
+        }
+        self.assertIn(("chatbots", ("chatbot_id",)), unique)
+        self.assertIn(("conversations", ("conversation_id",)), unique)
+
+    def test_diff_against_existing_indexes(self):
+        existing = {
+            "_id_": {"key": [("_id", 1)], "v": 2},
+            "expires_at_ttl": {"key": [("expires_at", 1)], "v": 2, "expireAfterSeconds": 0.0},
+            "status_created": {"key": [("status", 1)], "v": 2},
+            "old_status": {"key": [("status", 1)], "v": 2},
+        }
+        self.assertEqual(
+            diff_indexes("chatbot_jobs", existing),
+            {"missing": [], "conflicting": ["status_created"], "extra": ["old_status"]}
+        )
+
+        existing["status_created"] = {"key": [("status", 1), ("created_at", 1)], "v": 2}
+        del existing["expires_at_ttl"]
+        self.assertEqual(
+            diff_indexes("chatbot_jobs", existing),
+            {"missing": ["expires_at_ttl"], "conflicting": [], "extra": ["old_status"]}
+        )
+
+    def test_plan_stages_walks_classic_and_slot_based_plans(self):
+        classic = {"queryPlanner": {"winningPlan": {
+            "stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+        }}}
+        self.assertEqual(plan_stages(classic), ["LIMIT", "FETCH", "IXSCAN"])
+
+        slot_based = {"queryPlanner": {"winningPlan": {
+            "queryPlan": {"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}]},
+            "slotBasedPlan": {}
+        }}}
+        self.assertIn("COLLSCAN", plan_stages(slot_based))
+
+    @unittest.skipUnless(os.environ.get("MONGO_TEST_URL"), "set MONGO_TEST_URL to a scratch mongod to run")
+    async def test_no_query_shape_scans_a_collection(self):
+        client = AsyncIOMotorClient(os.environ["MONGO_TEST_URL"])
+        db = client["fobi_index_test"]
+        try:
+            await ensure_indexes(db)
+            # Applying the declarations again changes nothing
+            plan = await ensure_indexes(db)
+            self.assertFalse(any(changes["missing"] or changes["conflicting"] for changes in plan.values()))
+            self.assertEqual(await collscans(db), {})
+        finally:
+            await client.drop_database("fobi_index_test")
+            client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import json
+import unittest
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from services.json_bytes import JsonBytes, dumps, json_response
+
+
+class TestJsonBytes(unittest.TestCase):
+
+    def test_matches_the_fastapi_encoding_of_mongo_documents(self):
+        document = {
+            "_id": ObjectId(),
+            "name": "Café bot \"1\"",
+            "created_at": datetime(2024, 1, 2, 3, 4, 5, 123000),
+            "stats": {"total_views": 3, "rate": 1.5},
+            "responses": [{"question_id": "q1", "answer": ["a", None, True]}]
+        }
+        expected = jsonable_encoder(document, custom_encoder={ObjectId: str})
+        self.assertEqual(json.loads(dumps(document)), expected)
+
+    def test_spliced_fields_are_written_verbatim(self):
+        schema = JsonBytes(b'{"questions":[]}')
+        self.assertEqual(
+            dumps({"chatbot_id": "bot_1"}, form_schema=schema),
+            b'{"chatbot_id":"bot_1","form_schema":{"questions":[]}}'
+        )
+        self.assertEqual(dumps({}, form_schema=schema), b'{"form_schema":{"questions":[]}}')
+
+        response = json_response(success=True, chatbot=dumps({"a": 1}, form_schema=schema))
+        self.assertEqual(
+            json.loads(response.body),
+            {"success": True, "chatbot": {"a": 1, "form_schema": {"questions": []}}}
+        )
+        self.assertEqual(response.media_type, "application/json")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import io
+import json
+import logging
+import queue
+import sys
+import unittest
+
+from services.log_pipeline import JsonFormatter, LogPipeline, NonBlockingQueueHandler, SamplingFilter
+
+
+def _record(msg, *args, name="services.test", level=logging.ERROR):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+class TestLogPipeline(unittest.TestCase):
+
+    def test_json_lines_carry_extras_and_tracebacks(self):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord("services.test", logging.ERROR, __file__, 1, "Failed %s", ("job_1",), sys.exc_info())
+        record.chatbot_id = "bot_1"
+
+        entry = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(
+            (entry["level"], entry["logger"], entry["message"], entry["chatbot_id"]),
+            ("ERROR", "services.test", "Failed job_1", "bot_1")
+        )
+        self.assertIn("ValueError: boom", entry["exc_info"])
+
+    def test_repeated_errors_are_sampled_per_template(self):
+        sampler = SamplingFilter(burst=3, window=60)
+        passed = [sampler.filter(_record("Fetch failed: %s", n)) for n in range(10)]
+        self.assertEqual(passed, [True] * 3 + [False] * 7)
+        # Another template, and anything below the sampling level, is unaffected
+        self.assertTrue(sampler.filter(_record("Other failure")))
+        self.assertTrue(all(sampler.filter(_record("Progress %s", n, level=logging.INFO)) for n in range(10)))
+
+        # The next window reports what was dropped
+        sampler.window = 0
+        record = _record("Fetch failed: %s", 11)
+        self.assertTrue(sampler.filter(record))
+        self.assertEqual(record.suppressed, 7)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        records = queue.Queue(2)
+        handler = NonBlockingQueueHandler(records)
+        for n in range(5):
+            handler.handle(_record("Message %s", n))
+        self.assertEqual(records.qsize(), 2)
+        # Left unformatted for the listener thread
+        self.assertEqual(records.get().args, (0,))
+
+    def test_listener_thread_writes_json(self):
+        stream = io.StringIO()
+        pipeline = LogPipeline()
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        try:
+            pipeline.configure(stream)
+            logging.getLogger("services.test").warning("Webhook %s failed", "evt_1", extra={"attempts": 3})
+            pipeline.stop()
+        finally:
+            root.handlers[:] = handlers
+            root.setLevel(level)
+
+        entry = json.loads(stream.getvalue().splitlines()[-1])
+        self.assertEqual((entry["message"], entry["attempts"]), ("Webhook evt_1 failed", 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import asyncio
+import time
+import unittest
+
+from services.loop_monitor import LoopMonitor
+from services.metrics import metrics
+
+
+def _block_the_loop(seconds):
+    time.sleep(seconds)
+
+
+class TestLoopMonitor(unittest.IsolatedAsyncioTestCase):
+
+    async def test_blocking_call_is_captured_with_its_stack(self):
+        monitor = LoopMonitor()
+        monitor.interval, monitor.stall_threshold = 0.02, 0.1
+        await monitor.start()
+        try:
+            await asyncio.sleep(0.1)
+            _block_the_loop(0.4)
+            await asyncio.sleep(0.1)
+        finally:
+            await monitor.stop()
+
+        stalls = monitor.stalls()
+        self.assertEqual(len(stalls), 1)
+        self.assertTrue(any("_block_the_loop" in line for line in stalls[0]["stack"]))
+        lag = next(h["value"] for h in metrics.snapshot()["histograms"] if h["name"] == "event_loop_lag_seconds")
+        self.assertGreaterEqual(lag["max"], 0.3)
+
+    async def test_responsive_loop_records_no_stalls(self):
+        monitor = LoopMonitor()
+        monitor.interval, monitor.stall_threshold = 0.02, 0.2
+        await monitor.start()
+        try:
+            await asyncio.sleep(0.2)
+        finally:
+            await monitor.stop()
+        self.assertEqual(monitor.stalls(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import asyncio
+import unittest
+
+from services.cache_bus import cache_bus, ALL_KEYS
+from services.micro_cache import MicroCache
+
+
+class _Loader:
+    """Counts reads; each read waits for `release` so callers can pile up"""
+
+    def __init__(self, value=b'{"success":true}'):
+        self.value = value
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return self.value
+
+
+class TestMicroCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.cache = MicroCache("test", ttl=60, max_bytes=1000)
+
+    def tearDown(self):
+        cache_bus.unsubscribe(self.cache.invalidate)
+
+    async def test_concurrent_misses_share_one_read(self):
+        loader = _Loader()
+        waiting = [asyncio.create_task(self.cache.get("bot_a", loader)) for _ in range(50)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        results = await asyncio.gather(*waiting)
+
+        self.assertEqual(loader.calls, 1)
+        self.assertEqual(set(results), {loader.value})
+        self.assertEqual(await self.cache.get("bot_a", loader), loader.value)
+        stats = self.cache.stats()
+        self.assertEqual((self.cache.misses, self.cache.coalesced, self.cache.hits), (1, 49, 1))
+        self.assertEqual(stats["coalesce_rate"], 0.9608)
+
+    async def test_cancelled_caller_does_not_cancel_the_shared_read(self):
+        loader = _Loader()
+        first = asyncio.create_task(self.cache.get("bot_a", loader))
+        second = asyncio.create_task(self.cache.get("bot_a", loader))
+        await asyncio.sleep(0)
+        first.cancel()
+        loader.release.set()
+        self.assertEqual(await second, loader.value)
+        self.assertEqual(loader.calls, 1)
+
+    async def test_errors_are_not_cached_but_not_found_is(self):
+        async def failing():
+            raise RuntimeError("mongo down")
+
+        with self.assertRaises(RuntimeError):
+            await self.cache.get("bot_a", failing)
+
+        loader = _Loader(value=None)
+        loader.release.set()
+        self.assertIsNone(await self.cache.get("bot_a", loader))
+        self.assertIsNone(await self.cache.get("bot_a", loader))
+        self.assertEqual(loader.calls, 1)
+
+    async def test_expired_entries_are_reloaded(self):
+        self.cache.ttl = 0
+        loader = _Loader()
+        loader.release.set()
+        await self.cache.get("bot_a", loader)
+        await self.cache.get("bot_a", loader)
+        self.assertEqual(loader.calls, 2)
+
+    async def test_size_bound_evicts_least_recently_used(self):
+        loaders = {key: _Loader(value=b"x" * 295) for key in ("bot_a", "bot_b", "bot_c", "bot_d")}
+        for loader in loaders.values():
+            loader.release.set()
+        for key in ("bot_a", "bot_b", "bot_c"):
+            await self.cache.get(key, loaders[key])
+        await self.cache.get("bot_a", loaders["bot_a"])
+        await self.cache.get("bot_d", loaders["bot_d"])
+
+        self.assertLessEqual(self.cache.bytes, 1000)
+        await self.cache.get("bot_a", loaders["bot_a"])
+        await self.cache.get("bot_b", loaders["bot_b"])
+        self.assertEqual(loaders["bot_a"].calls, 1)
+        self.assertEqual(loaders["bot_b"].calls, 2)
+
+        too_big = _Loader(value=b"x" * 2000)
+        too_big.release.set()
+        await self.cache.get("bot_e", too_big)
+        await self.cache.get("bot_e", too_big)
+        self.assertEqual(too_big.calls, 2)
+
+    async def test_invalidation_during_a_read_is_not_overwritten(self):
+        stale = _Loader(value=b"old")
+        pending = asyncio.create_task(self.cache.get("bot_a", stale))
+        await asyncio.sleep(0)
+        cache_bus.dispatch("bot_a")
+        stale.release.set()
+        self.assertEqual(await pending, b"old")
+
+        fresh = _Loader(value=b"new")
+        fresh.release.set()
+        self.assertEqual(await self.cache.get("bot_a", fresh), b"new")
+
+        cache_bus.dispatch(ALL_KEYS)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+        self.assertEqual(self.cache.bytes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import unittest
+from unittest import mock
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import ReadPreference
+
+from services.read_routing import ReadRouting
+
+
+class TestReadRouting(unittest.IsolatedAsyncioTestCase):
+
+    def test_defaults_keep_conversations_on_the_primary(self):
+        unset = {k: v for k, v in os.environ.items() if not k.startswith("READ_")}
+        with mock.patch.dict(os.environ, unset, clear=True):
+            routing = ReadRouting()
+
+        self.assertEqual(routing.describe("conversation"), {"read_preference": "primary", "max_staleness_seconds": 0})
+        self.assertEqual(
+            routing.describe("analytics"),
+            {"read_preference": "secondaryPreferred", "max_staleness_seconds": 90}
+        )
+
+    def test_per_class_configuration(self):
+        with mock.patch.dict(os.environ, {
+            "READ_PREFERENCE_STATS": "nearest",
+            "READ_MAX_STALENESS_STATS": "300",
+            "READ_MAX_STALENESS_LIST": "30",
+            "READ_PREFERENCE_EXPORT": "secondary",
+            "READ_MAX_STALENESS_EXPORT": "0",
+        }):
+            routing = ReadRouting()
+
+        self.assertEqual(routing.describe("stats"), {"read_preference": "nearest", "max_staleness_seconds": 300})
+        # Below the server minimum: raised to it rather than rejected by the server
+        self.assertEqual(routing.describe("list")["max_staleness_seconds"], 90)
+        self.assertEqual(routing.describe("export"), {"read_preference": "secondary", "max_staleness_seconds": -1})
+
+        db = AsyncIOMotorClient("mongodb://localhost:1", connect=False)["fobi_test"]
+        self.assertEqual(routing.db(db, "stats").read_preference.max_staleness, 300)
+        self.assertIs(routing.db(db, "stats"), routing.db(db, "stats"))
+        self.assertEqual(db.read_preference, ReadPreference.PRIMARY)
+
+    @unittest.skipUnless(os.environ.get("MONGO_REPLSET_URL"), "set MONGO_REPLSET_URL to a replica set to run")
+    async def test_routed_reads_against_a_replica_set(self):
+        # e.g. mongod --replSet rs0 --port 27018, then rs.initiate() and
+        # MONGO_REPLSET_URL=mongodb://localhost:27018/?replicaSet=rs0
+        client = AsyncIOMotorClient(os.environ["MONGO_REPLSET_URL"])
+        db = client["fobi_read_routing_test"]
+        try:
+            await db.chatbots.insert_one({"chatbot_id": "bot_routing"})
+            routing = ReadRouting()
+            # A single-member set has no secondary: secondaryPreferred falls back to the primary
+            found = await routing.db(db, "list").chatbots.find_one({"chatbot_id": "bot_routing"})
+            self.assertIsNotNone(found)
+        finally:
+            await client.drop_database("fobi_read_routing_test")
+            client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+from services.schema_store import FormSchemaStore, form_key_from_url, schema_hash
+
+
+class TestFormSchemaStore(unittest.IsolatedAsyncioTestCase):
+
+    def test_form_urls_share_a_canonical_key(self):
+        urls = [
+            "https://docs.google.com/forms/d/e/1FAIpQLSabc/viewform",
+            "https://docs.google.com/forms/d/e/1FAIpQLSabc/viewform?usp=sf_link",
+            "https://docs.google.com/forms/u/0/d/e/1FAIpQLSabc/formResponse",
+        ]
+        self.assertEqual({form_key_from_url(u) for u in urls}, {"e/1FAIpQLSabc"})
+        self.assertEqual(form_key_from_url("https://docs.google.com/forms/d/1xYz/edit"), "d/1xYz")
+        self.assertIsNone(form_key_from_url("https://example.com/forms/d/e/abc"))
+
+    def test_hash_ignores_key_order(self):
+        self.assertEqual(
+            schema_hash({"title": "A", "questions": [{"id": "1", "type": "short_text"}]}),
+            schema_hash({"questions": [{"type": "short_text", "id": "1"}], "title": "A"})
+        )
+
+    async def test_short_links_resolve_once(self):
+        store = FormSchemaStore()
+        with patch("services.schema_store.form_parser.resolve_redirect", new_callable=AsyncMock) as resolve:
+            resolve.return_value = "https://docs.google.com/forms/d/e/1FAIpQLSabc/viewform?usp=send_form"
+            for _ in range(2):
+                form_key, fetch_url = await store.canonicalize("https://forms.gle/AbCdEf")
+            self.assertEqual(resolve.await_count, 1)
+        self.assertEqual(form_key, "e/1FAIpQLSabc")
+        self.assertEqual(fetch_url, "https://docs.google.com/forms/d/e/1FAIpQLSabc/viewform")
+
+    async def test_legacy_chatbots_use_embedded_schema(self):
+        store = FormSchemaStore()
+        schema = {"questions": [{"id": "1"}]}
+        self.assertEqual(await store.resolve(None, {"form_schema": schema}), schema)
+
+
+if __name__ == "__main__":
+    unittest.main()
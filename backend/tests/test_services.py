@@ -50,6 +50,65 @@ class TestServices(unittest.IsolatedAsyncioTestCase):
         self.assertIsNone(q3)
         print("[OK] Conversation completion detected")
 
+    async def test_chat_engine_merge_responses(self):
+        """Turns are merged into the history by question_id"""
+        history = [{"question_id": "q1", "answer": "Alice"}]
+        merged = chat_engine.merge_responses(history, [{"question_id": "q2", "answer": "Red"}])
+        self.assertEqual([r["question_id"] for r in merged], ["q1", "q2"])
+
+        merged = chat_engine.merge_responses(merged, [{"question_id": "q1", "answer": "Bob"}])
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(merged[0]["answer"], "Bob")
+        self.assertEqual(history, [{"question_id": "q1", "answer": "Alice"}])
+
+    async def test_chat_engine_validate_answers(self):
+        """A whole answer set is validated in one pass"""
+        schema = {
+            "questions": [
+                {"id": "q1", "title": "Name", "type": "short_text", "required": True},
+                {"id": "q2", "title": "Plan", "type": "dropdown", "options": ["Free", "Pro"], "required": False},
+                {"id": "q3", "title": "Channels", "type": "checkboxes", "options": ["Email", "Phone"], "required": True}
+            ]
+        }
+        errors = chat_engine.validate_answers(schema, [
+            {"question_id": "q2", "answer": "Enterprise"},
+            {"question_id": "q3", "answer": ["Email", "Fax"]},
+            {"question_id": "q9", "answer": "?"}
+        ], require_all=True)
+        self.assertEqual(
+            [(e["question_id"], e["error"]) for e in errors],
+            [
+                ("q2", "Answer must be one of the options"),
+                ("q3", "Not an option: Fax"),
+                ("q9", "Unknown question"),
+                ("q1", "This question is required")
+            ]
+        )
+
+        valid = [{"question_id": "q1", "answer": "Alice"}, {"question_id": "q3", "answer": ["Phone"]}]
+        self.assertEqual(chat_engine.validate_answers(schema, valid, require_all=True), [])
+
+    async def test_chat_engine_upcoming_questions(self):
+        """Lookahead stops after a question whose answer picks the next section"""
+        schema = {
+            "questions": [
+                {"id": "q1", "title": "Name", "type": "short_text"},
+                {"id": "q2", "title": "Plan", "type": "multiple_choice", "options": ["Free", "Pro"], "branches": True},
+                {"id": "q3", "title": "Company", "type": "short_text"},
+                {"id": "q4", "title": "Team size", "type": "short_text"}
+            ]
+        }
+        upcoming = chat_engine.get_upcoming_questions(schema, [], 5)
+        self.assertEqual([q["id"] for q in upcoming], ["q1", "q2"])
+        self.assertEqual(upcoming[0], chat_engine.get_next_question(schema, []))
+
+        history = [{"question_id": "q1", "answer": "Alice"}, {"question_id": "q2", "answer": "Pro"}]
+        self.assertEqual([q["id"] for q in chat_engine.get_upcoming_questions(schema, history, 1)], ["q3"])
+        self.assertEqual([q["id"] for q in chat_engine.get_upcoming_questions(schema, history, 5)], ["q3", "q4"])
+
+        history += [{"question_id": "q3", "answer": "Acme"}, {"question_id": "q4", "answer": "12"}]
+        self.assertEqual(chat_engine.get_upcoming_questions(schema, history, 5), [])
+
     async def test_form_parser_extraction(self):
         """Test extracting questions from raw mock data"""
         print("\nTesting Form Parser Extraction...")
@@ -104,8 +163,17 @@ class TestServices(unittest.IsolatedAsyncioTestCase):
                 self.assertEqual(q2["title"], "Preferred contact?")
                 self.assertEqual(q2["type"], "multiple_choice")
                 self.assertEqual(q2["options"], ["Email", "Phone"])
-                
-                print("[OK] Form parsing logic confirmed")
+                self.assertNotIn("branches", q2)
+
+        # Options carrying a go-to-section target make the question branch
+        mock_raw_data[1][1][1][4][0][1] = [["Email", None, 2, None], ["Phone", None, None, None]]
+        with patch.object(parser, 'fetch_form_html', return_value="<html>...</html>"):
+            with patch.object(parser, 'parse_public_data', return_value=mock_raw_data):
+                result = await parser.parse_form("http://fake.url")
+                self.assertTrue(result["questions"][1]["branches"])
+                self.assertNotIn("branches", result["questions"][0])
+
+        print("[OK] Form parsing logic confirmed")
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+from services.stats_reconcile import StatsReconciler
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._iter = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _Collection:
+    def __init__(self, docs=(), rows=(), events=None):
+        self.docs = list(docs)
+        self.rows = list(rows)
+        self.writes = []
+        self.events = events if events is not None else []
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        ids = pipeline[0]["$match"]["chatbot_id"]["$in"]
+        self.events.append(("aggregate", ids))
+        return _Cursor([row for row in self.rows if row["_id"] in ids])
+
+    def find(self, query, projection=None):
+        def read():
+            for doc in self.docs:
+                self.events.append(("read", doc["chatbot_id"]))
+                yield doc
+        return _Cursor(read())
+
+    async def find_one(self, query, projection=None, sort=None):
+        buckets = sorted(doc["bucket"] for doc in self.docs if doc["granularity"] == query["granularity"])
+        return {"bucket": buckets[0]} if buckets else None
+
+    async def bulk_write(self, operations, ordered=True):
+        self.writes.append([(op._filter, op._doc) for op in operations])
+        return SimpleNamespace(matched_count=len(operations))
+
+
+class _Db(dict):
+    def __init__(self, chatbots, conversation_rows, bucket_rows, buckets):
+        self.events = []
+        super().__init__(stats_buckets=_Collection(docs=buckets, rows=bucket_rows, events=self.events))
+        self.chatbots = _Collection(docs=chatbots, events=self.events)
+        self.conversations = _Collection(rows=conversation_rows, events=self.events)
+
+
+class TestStatsReconcile(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.db = _Db(
+            chatbots=[
+                # Double-counted completions, created before the time series existed
+                {"_id": 1, "chatbot_id": "bot_old", "created_at": datetime(2025, 1, 1),
+                 "stats": {"total_views": 40, "total_conversations": 12, "completion_rate": 0.0}},
+                # Views come from the buckets; its conversations were never counted
+                {"_id": 2, "chatbot_id": "bot_new", "created_at": datetime(2026, 3, 1),
+                 "stats": {"total_views": 20, "total_conversations": 0}},
+                # Already right
+                {"_id": 3, "chatbot_id": "bot_ok", "created_at": datetime(2026, 3, 2),
+                 "stats": {"total_views": 0, "total_conversations": 0, "completion_rate": 0.0}},
+            ],
+            conversation_rows=[
+                {"_id": "bot_old", "conversations": 10, "completed": 8},
+                {"_id": "bot_new", "conversations": 5, "completed": 3},
+            ],
+            bucket_rows=[
+                {"_id": "bot_old", "views": 7},
+                {"_id": "bot_new", "views": 25},
+            ],
+            buckets=[
+                {"granularity": "hour", "bucket": datetime(2026, 3, 1, 10)},
+                {"granularity": "day", "bucket": datetime(2026, 2, 1)},
+            ]
+        )
+
+    async def test_recomputes_counters_and_reports_drift(self):
+        report = await StatsReconciler().reconcile(self.db, batch_size=1)
+
+        self.assertEqual((report["chatbots"], report["corrected"], report["skipped"]), (3, 2, 0))
+        self.assertEqual(report["drift"]["total_conversations"], {"chatbots": 2, "total": 7, "max": 4})
+        self.assertEqual(report["drift"]["total_views"], {"chatbots": 1, "total": 5, "max": 5})
+
+        (old,), (new,) = self.db.chatbots.writes
+        self.assertEqual(old[1], {
+            "$set": {"stats.total_conversations": 8, "stats.completion_rate": 20.0},
+            "$max": {"stats.total_views": 40}
+        })
+        self.assertEqual(new[1], {
+            "$set": {"stats.total_conversations": 3, "stats.completion_rate": 12.0},
+            "$max": {"stats.total_views": 25}
+        })
+        # Compare-and-set on the completion counters read, including one that did not exist
+        self.assertEqual(new[0], {"_id": 2, "stats.total_conversations": 0, "stats.completion_rate": {"$exists": False}})
+
+    async def test_counters_are_read_before_their_source_is_aggregated(self):
+        await StatsReconciler().reconcile(self.db, batch_size=2)
+        self.assertEqual(self.db.events, [
+            ("read", "bot_old"), ("read", "bot_new"),
+            ("aggregate", ["bot_old", "bot_new"]), ("aggregate", ["bot_old", "bot_new"]),
+            ("read", "bot_ok"),
+            ("aggregate", ["bot_ok"]), ("aggregate", ["bot_ok"])
+        ])
+
+    async def test_views_are_never_lowered(self):
+        # The counter is bumped before the bucket: a bucket behind it is an open in flight
+        self.db.chatbots.docs[1]["stats"]["total_views"] = 30
+        report = await StatsReconciler().reconcile(self.db)
+        self.assertEqual(report["drift"]["total_views"]["chatbots"], 0)
+        (_, new), = self.db.chatbots.writes
+        self.assertEqual(new[1]["$max"], {"stats.total_views": 30})
+        self.assertEqual(new[1]["$set"]["stats.completion_rate"], 10.0)
+
+    async def test_dry_run_writes_nothing(self):
+        report = await StatsReconciler().reconcile(self.db, dry_run=True)
+        self.assertEqual(report["corrected"], 2)
+        self.assertEqual(self.db.chatbots.writes, [])
+        self.assertEqual([c["chatbot_id"] for c in report["largest"]], ["bot_old", "bot_new"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from pymongo.errors import DuplicateKeyError
+
+from services.stats_series import StatsSeries, bucket_start, naive_utc
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _Collection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        granularities = query["granularity"]["$in"]
+        return _Cursor([d for d in self.docs if d["granularity"] in granularities])
+
+
+class _Aggregation:
+    def __init__(self, calls, pipeline):
+        calls.append(("aggregate", pipeline))
+
+    async def to_list(self, length):
+        return []
+
+
+class _Buckets:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def find_one(self, query, projection=None):
+        return {"_id": "bot_a:hour:2026010100"}
+
+    def aggregate(self, pipeline):
+        return _Aggregation(self.calls, pipeline)
+
+    async def delete_many(self, query):
+        self.calls.append(("delete_many", query))
+        return SimpleNamespace(deleted_count=24)
+
+
+class _Leases:
+    """One lease document, as a unique _id makes it behave on upsert"""
+
+    def __init__(self):
+        self.doc = None
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        if self.doc is not None and self.doc["lease_until"] > query["lease_until"]["$lte"]:
+            raise DuplicateKeyError("_id_")
+        self.doc = {"_id": "compaction", **update["$set"]}
+        return self.doc
+
+    async def update_one(self, query, update):
+        if self.doc is not None and self.doc["owner"] == query["owner"]:
+            self.doc.update(update["$set"])
+
+
+class TestStatsSeries(unittest.IsolatedAsyncioTestCase):
+
+    def test_bucket_start(self):
+        moment = datetime(2026, 3, 5, 14, 37, 12)  # a Thursday
+        self.assertEqual(bucket_start(moment, "hour"), datetime(2026, 3, 5, 14))
+        self.assertEqual(bucket_start(moment, "day"), datetime(2026, 3, 5))
+        self.assertEqual(bucket_start(moment, "week"), datetime(2026, 3, 2))
+
+    async def test_day_series_merges_hourly_and_compacted_buckets(self):
+        docs = [
+            {"granularity": "day", "bucket": datetime(2026, 3, 1), "counts": {"views": 10, "completions": 2}},
+            {"granularity": "hour", "bucket": datetime(2026, 3, 2, 9), "counts": {"views": 3}},
+            {"granularity": "hour", "bucket": datetime(2026, 3, 2, 17), "counts": {"views": 4, "answers": 6}},
+        ]
+        collection = _Collection(docs)
+        series = await StatsSeries().get_series(
+            {StatsSeries.COLLECTION: collection}, "bot_a", "day", datetime(2026, 3, 1), datetime(2026, 3, 4)
+        )
+
+        self.assertEqual([p["bucket"].day for p in series], [1, 2, 3])
+        self.assertEqual(series[0]["views"], 10)
+        self.assertEqual(series[1], {"bucket": datetime(2026, 3, 2), "views": 7, "answers": 6, "completions": 0})
+        self.assertEqual(series[2]["views"], 0)
+
+    async def test_aware_range_matches_naive_utc_buckets(self):
+        self.assertEqual(naive_utc(datetime(2026, 3, 1, 2, tzinfo=timezone(timedelta(hours=2)))), datetime(2026, 3, 1))
+        collection = _Collection([{"granularity": "hour", "bucket": datetime(2026, 3, 1, 1), "counts": {"views": 5}}])
+        series = await StatsSeries().get_series(
+            {StatsSeries.COLLECTION: collection}, "bot_a", "hour",
+            datetime(2026, 3, 1, tzinfo=timezone.utc), datetime(2026, 3, 1, 3, tzinfo=timezone.utc)
+        )
+        self.assertEqual([p["views"] for p in series], [0, 5, 0])
+        self.assertIsNone(series[0]["bucket"].tzinfo)
+
+    async def test_compaction_runs_in_one_process_at_a_time(self):
+        calls = []
+        db = {StatsSeries.COLLECTION: _Buckets(calls), StatsSeries.LEASES: _Leases()}
+        first, second = StatsSeries(), StatsSeries()
+
+        self.assertTrue(await second.acquire_lease(db, datetime.utcnow()))
+        self.assertEqual(await first.compact(db), 0)
+        self.assertEqual(calls, [])
+
+        await second.release_lease(db)
+        self.assertEqual(await first.compact(db, datetime.utcnow() + timedelta(seconds=1)), 24)
+        self.assertEqual([call[0] for call in calls], ["aggregate", "delete_many"])
+        # Released again for the next pass
+        self.assertTrue(await second.acquire_lease(db, datetime.utcnow() + timedelta(seconds=2)))
+
+    def test_merge_only_adds_hours_the_day_bucket_does_not_list(self):
+        merge = StatsSeries().merge_pipeline({"granularity": "hour"})[-1]["$merge"]
+        unmerged = merge["whenMatched"][0]["$set"]["_unmerged"]["$filter"]
+        self.assertEqual(unmerged["input"], "$$new.hours")
+        self.assertIn({"$ifNull": ["$hours.id", []]}, unmerged["cond"]["$not"][0]["$in"])
+
+    async def test_rejects_oversized_ranges(self):
+        series = StatsSeries()
+        series.max_points = 24
+        with self.assertRaises(ValueError):
+            await series.get_series({}, "bot_a", "hour", datetime(2026, 3, 1), datetime(2026, 3, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
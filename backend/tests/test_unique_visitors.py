@@ -0,0 +1,133 @@
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+from pymongo.errors import DuplicateKeyError
+
+from services.unique_visitors import (
+    REGISTERS, UniqueVisitors, client_address, estimate, register_update, visitor_fingerprint
+)
+
+
+def _sketch(ids):
+    registers = np.zeros(REGISTERS, dtype=np.uint8)
+    for visitor in ids:
+        index, rank = register_update(visitor_fingerprint({"visitor_id": visitor}))
+        registers[index] = max(registers[index], rank)
+    return registers
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _Sketches:
+    """Just enough of a collection for the versioned merge"""
+
+    def __init__(self):
+        self.docs = {}
+        self.conflicts = 0
+
+    async def find_one(self, query, projection=None):
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc else None
+
+    async def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def update_one(self, query, update):
+        doc = self.docs[query["_id"]]
+        if self.conflicts:
+            # Another worker merged first
+            self.conflicts -= 1
+            doc["version"] += 1
+            return SimpleNamespace(modified_count=0)
+        if doc["version"] != query["version"]:
+            return SimpleNamespace(modified_count=0)
+        doc.update(update["$set"])
+        doc["version"] += update["$inc"]["version"]
+        return SimpleNamespace(modified_count=1)
+
+    def find(self, query, projection=None):
+        if "_id" in query:
+            return _Cursor([d for d in self.docs.values() if d["_id"] == query["_id"]])
+        return _Cursor([
+            d for d in self.docs.values()
+            if d["chatbot_id"] == query["chatbot_id"] and d["kind"] == query["kind"] and d["day"] is not None
+            and query["day"].get("$gte", d["day"]) <= d["day"] < query["day"].get("$lt", datetime.max)
+        ])
+
+
+class TestUniqueVisitors(unittest.IsolatedAsyncioTestCase):
+
+    def test_estimate_is_within_a_few_percent(self):
+        for n in (50, 2000, 50000):
+            error = abs(estimate(_sketch(range(n))) - n) / n
+            self.assertLess(error, 0.05, n)
+
+    def test_sketches_merge_to_the_union(self):
+        merged = np.maximum(_sketch(range(0, 30000)), _sketch(range(20000, 50000)))
+        self.assertTrue(np.array_equal(merged, _sketch(range(50000))))
+
+    def test_fingerprint_prefers_user_data_then_request(self):
+        request = SimpleNamespace(
+            headers={"x-forwarded-for": "203.0.113.7, 10.0.0.1", "user-agent": "Firefox"},
+            client=SimpleNamespace(host="10.0.0.1")
+        )
+        self.assertEqual(
+            visitor_fingerprint({"email": " Ana@Example.com"}, request),
+            visitor_fingerprint({"email": "ana@example.com"})
+        )
+        self.assertEqual(visitor_fingerprint({}, request), visitor_fingerprint(None, request))
+        self.assertNotEqual(visitor_fingerprint({}, request), visitor_fingerprint({"visitor_id": "v1"}, request))
+        self.assertIsNone(visitor_fingerprint({}, None))
+
+    def test_client_address_uses_the_hop_our_proxy_appended(self):
+        request = SimpleNamespace(
+            headers={"x-forwarded-for": "198.51.100.1, 203.0.113.7, 10.0.0.1"},
+            client=SimpleNamespace(host="10.0.0.2")
+        )
+        # The first entry is whatever the client sent
+        self.assertEqual(client_address(request, trusted_proxies=0), "10.0.0.2")
+        self.assertEqual(client_address(request, trusted_proxies=1), "10.0.0.1")
+        self.assertEqual(client_address(request, trusted_proxies=2), "203.0.113.7")
+        self.assertEqual(client_address(request, trusted_proxies=4), "10.0.0.2")
+
+    async def test_workers_flush_into_shared_sketches(self):
+        db = {"visitor_sketches": _Sketches()}
+        first, second = UniqueVisitors(), UniqueVisitors()
+        jan_1, jan_2 = datetime(2026, 1, 1, 9), datetime(2026, 1, 2, 9)
+        for n in range(1000):
+            first.add("bot_1", "visitors", visitor_fingerprint({"visitor_id": n}), at=jan_1)
+            # Half of them come back the next day through another worker
+            second.add("bot_1", "visitors", visitor_fingerprint({"visitor_id": n + 500}), at=jan_2)
+
+        await first.flush(db)
+        db["visitor_sketches"].conflicts = 1
+        await second.flush(db)
+
+        self.assertEqual(first._pending, {})
+        self.assertEqual(second._pending, {})
+        total = await first.count(db, "bot_1", "visitors")
+        self.assertLess(abs(total - 1500) / 1500, 0.05)
+        day_two = await first.count(db, "bot_1", "visitors", datetime(2026, 1, 2), datetime(2026, 1, 3))
+        self.assertLess(abs(day_two - 1000) / 1000, 0.05)
+        self.assertEqual(await first.count(db, "bot_2", "visitors"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
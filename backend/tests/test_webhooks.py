@@ -0,0 +1,190 @@
+import json
+import time
+import unittest
+from datetime import datetime
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from services.http_client import HttpClient
+from services.webhooks import (
+    SIGNATURE_HEADER, PublicResolver, WebhookDelivery, WebhookUrlError, check_webhook_url, is_public_address, sign,
+    verify_signature
+)
+
+SECRET = "whsec_test"
+SCHEMA = {"questions": [{"id": "q1", "title": "Your name?"}]}
+
+
+def _conversation(n, attempts=0):
+    return {
+        "_id": n,
+        "conversation_id": f"conv_{n}",
+        "chatbot_id": "bot_1",
+        "completed_at": datetime(2026, 1, 1, 12, 0, n),
+        "question_ids": ["q1"],
+        "answers": [f"user {n}"],
+        "outbox": {
+            "event_id": f"evt_{n}",
+            "type": "conversation.completed",
+            "chatbot_id": "bot_1",
+            "created_at": datetime(2026, 1, 1, 12, 0, n),
+            "attempts": attempts
+        }
+    }
+
+
+class _Collection:
+    def __init__(self):
+        self.calls = []
+
+    async def bulk_write(self, operations, ordered=True):
+        self.calls.append(("bulk_write", [(op._filter, op._doc) for op in operations]))
+
+    async def update_many(self, query, update):
+        self.calls.append(("update_many", query, update))
+
+    async def insert_many(self, docs, ordered=True):
+        self.calls.append(("insert_many", docs))
+
+
+class _Db(dict):
+    def __init__(self):
+        super().__init__(webhook_dead_letters=_Collection())
+        self.conversations = _Collection()
+
+
+class TestWebhooks(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.received = []
+        self.status = 200
+
+        async def receive(request):
+            self.received.append((request.headers.get(SIGNATURE_HEADER), await request.read()))
+            return web.Response(status=self.status)
+
+        async def redirect(request):
+            raise web.HTTPTemporaryRedirect("/hooks")
+
+        app = web.Application()
+        app.router.add_post("/hooks", receive)
+        app.router.add_post("/moved", redirect)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.client = HttpClient()
+        self.delivery = WebhookDelivery(client=self.client)
+        # The test receiver listens on loopback
+        self.delivery.allow_private = True
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+
+    async def test_internal_addresses_are_refused(self):
+        for address in ("127.0.0.1", "10.1.2.3", "192.168.0.10", "169.254.169.254", "100.64.0.1",
+                        "::1", "fe80::1%eth0", "::ffff:10.0.0.1", "224.0.0.1", "0.0.0.0"):
+            self.assertFalse(is_public_address(address), address)
+        self.assertTrue(is_public_address("93.184.216.34"))
+
+        with self.assertRaises(WebhookUrlError):
+            await check_webhook_url("http://169.254.169.254/latest/meta-data/")
+        with self.assertRaises(WebhookUrlError):
+            await check_webhook_url("ftp://example.com/hooks")
+
+        # Checked again at send time, before any request is made
+        self.delivery.allow_private = False
+        error = await self.delivery.send(str(self.server.make_url("/hooks")), SECRET, b"{}")
+        self.assertIn("non-public address", error)
+        self.assertEqual(self.received, [])
+
+    async def test_connections_only_go_to_public_addresses(self):
+        # Resolving again after the check must not reach an internal address
+        pinned = HttpClient(resolver=PublicResolver)
+        try:
+            with self.assertRaises(WebhookUrlError):
+                await pinned.request("POST", f"http://localhost:{self.server.port}/hooks", retries=0)
+        finally:
+            await pinned.close()
+        self.assertEqual(self.received, [])
+
+    async def test_redirects_are_failed_attempts(self):
+        error = await self.delivery.send(str(self.server.make_url("/moved")), SECRET, b"{}")
+        self.assertEqual(error, "HTTP 307 (redirects are not followed)")
+        self.assertEqual(self.received, [])
+
+    def test_signature_round_trip(self):
+        body = b'{"events":[]}'
+        header = sign(SECRET, int(time.time()), body)
+        self.assertTrue(verify_signature(SECRET, header, body))
+        self.assertFalse(verify_signature(SECRET, header, body + b" "))
+        self.assertFalse(verify_signature("whsec_other", header, body))
+        self.assertFalse(verify_signature(SECRET, sign(SECRET, int(time.time()) - 3600, body), body))
+
+    async def test_delivers_a_signed_batch_to_a_local_receiver(self):
+        batch = [_conversation(1), _conversation(2)]
+        body = self.delivery.build_body(batch, SCHEMA)
+
+        error = await self.delivery.send(str(self.server.make_url("/hooks")), SECRET, body)
+
+        self.assertIsNone(error)
+        header, received = self.received[0]
+        self.assertTrue(verify_signature(SECRET, header, received))
+        events = json.loads(received)["events"]
+        self.assertEqual([e["id"] for e in events], ["evt_1", "evt_2"])
+        self.assertEqual(
+            events[0]["data"]["responses"],
+            [{"question_id": "q1", "answer": "user 1", "question": "Your name?"}]
+        )
+
+    async def test_failed_delivery_is_reported_without_inline_retries(self):
+        self.status = 503
+        error = await self.delivery.send(str(self.server.make_url("/hooks")), SECRET, b"{}")
+        self.assertEqual(error, "HTTP 503")
+        self.assertEqual(len(self.received), 1)
+
+    async def test_unexpected_errors_count_as_failed_attempts(self):
+        self.delivery.db = db = _Db()
+
+        class _Chatbots:
+            async def find_one(self, query, projection):
+                # Secret missing from a hand-edited document
+                return {"webhook": {"enabled": True, "url": "http://x"}, "form_schema": SCHEMA}
+
+        db.chatbots = _Chatbots()
+        await self.delivery.deliver([_conversation(1)])
+
+        (call, retried), = db.conversations.calls
+        self.assertEqual(call, "bulk_write")
+        self.assertEqual(retried[0][1]["$set"]["outbox.attempts"], 1)
+        self.assertIn("KeyError", retried[0][1]["$set"]["outbox.last_error"])
+
+    async def test_failures_back_off_then_dead_letter(self):
+        self.delivery.db = db = _Db()
+        self.delivery.max_attempts = 3
+        self.delivery.backoff_base = 10
+
+        batch = [_conversation(1, attempts=0), _conversation(2, attempts=2)]
+        await self.delivery._failed(batch, "http://x", "HTTP 500")
+
+        (_, retried), = db.conversations.calls[:1]
+        self.assertEqual(len(retried), 1)
+        update = retried[0][1]["$set"]
+        self.assertEqual(update["outbox.attempts"], 1)
+        delay = (update["outbox.next_attempt_at"] - datetime.utcnow()).total_seconds()
+        self.assertTrue(4 <= delay <= 10)
+
+        (_, dead), = db["webhook_dead_letters"].calls
+        self.assertEqual([(d["_id"], d["attempts"], d["error"]) for d in dead], [("evt_2", 3, "HTTP 500")])
+        self.assertEqual(db.conversations.calls[1], ("update_many", {"_id": {"$in": [2]}}, {"$unset": {"outbox": ""}}))
+
+    def test_outbox_entry_only_for_enabled_webhooks(self):
+        self.assertIsNone(self.delivery.outbox_entry("bot_1", None))
+        self.assertIsNone(self.delivery.outbox_entry("bot_1", {"enabled": False}))
+        entry = self.delivery.outbox_entry("bot_1", {"enabled": True})
+        self.assertEqual((entry["chatbot_id"], entry["attempts"]), ("bot_1", 0))
+        self.assertEqual(entry["next_attempt_at"], entry["created_at"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,6 +8,7 @@ import requests
 import json
 import sys
 import os
+import time
 from datetime import datetime
 
 # Get backend URL from frontend .env file
@@ -162,9 +163,17 @@ def test_create_chatbot():
             timeout=10
         )
         
-        if response.status_code == 200:
+        if response.status_code == 202:
             data = response.json()
-            if data.get("success") and data.get("chatbot_id"):
+            print_info(f"Creation job queued: {data.get('job_id')}")
+            # Creation runs in the background; poll the job until it finishes
+            for _ in range(30):
+                job = requests.get(f"{BASE_URL}/api/chatbots/jobs/{data.get('job_id')}", timeout=10).json()
+                if job.get("status") in ("succeeded", "failed"):
+                    break
+                time.sleep(1)
+            data = job
+            if data.get("status") == "succeeded" and data.get("chatbot_id"):
                 created_chatbot_id = data["chatbot_id"]
                 print_success(f"POST /api/chatbots - Chatbot created with ID: {created_chatbot_id}")
                 
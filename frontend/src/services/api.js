@@ -10,10 +10,42 @@ const api = axios.create({
   },
 });
 
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_TIMEOUT_MS = 60000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Poll a chatbot creation job until it finishes. Resolves with the finished
+// job response; rejects like an axios error when the job fails.
+const waitForJob = async (jobId) => {
+  const deadline = Date.now() + JOB_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    const response = await api.get(`/chatbots/jobs/${jobId}`);
+    if (response.data.status === 'succeeded') {
+      return response;
+    }
+    if (response.data.status === 'failed') {
+      const error = new Error(response.data.error);
+      error.response = { data: { detail: response.data.error } };
+      throw error;
+    }
+    await sleep(JOB_POLL_INTERVAL_MS);
+  }
+  const error = new Error('Timed out waiting for chatbot creation');
+  error.response = { data: { detail: 'Chatbot creation is taking longer than expected. Please check your dashboard shortly.' } };
+  throw error;
+};
+
 // Chatbot APIs
 export const chatbotAPI = {
-  create: (data) => api.post('/chatbots', data),
+  // Creation runs as a background job: queue it, then wait for the result
+  create: async (data) => {
+    const response = await api.post('/chatbots', data);
+    return waitForJob(response.data.job_id);
+  },
+  getJob: (jobId) => api.get(`/chatbots/jobs/${jobId}`),
   getAll: (params) => api.get('/chatbots', { params }),
+  search: (q, params) => api.get('/chatbots/search', { params: { q, ...params } }),
   getById: (id) => api.get(`/chatbots/${id}`),
   update: (id, data) => api.put(`/chatbots/${id}`, data),
   delete: (id) => api.delete(`/chatbots/${id}`),